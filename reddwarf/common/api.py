@@ -42,6 +42,7 @@ class API(wsgi.Router):
         instance_resource = InstanceController().create_resource()
         path = "/{tenant_id}/instances"
         mapper.resource("instance", path, controller=instance_resource,
+                        collection={'changes': 'GET'},
                         member={'action': 'POST'})
 
     def _flavor_router(self, mapper):
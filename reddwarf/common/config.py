@@ -16,7 +16,9 @@
 #    under the License.
 """Routines for configuring Reddwarf."""
 
+import logging
 import re
+import signal
 
 from reddwarf.openstack.common import config as openstack_config
 
@@ -27,6 +29,9 @@ add_common_options = openstack_config.add_common_options
 setup_logging = openstack_config.setup_logging
 
 
+LOG = logging.getLogger(__name__)
+
+
 def _to_list(value):
     items = value.split(',')
     trimmed_list = [item.strip() for item in items]
@@ -41,34 +46,131 @@ def get_option(options, option, **kwargs):
         return openstack_config.get_option(options, option, **kwargs)
 
 
+class ConfigValues(dict):
+    """The raw option values, which drop Config's parsed values on change."""
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        Config.clear_cache()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        Config.clear_cache()
+
+    def clear(self):
+        dict.clear(self)
+        Config.clear_cache()
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        Config.clear_cache()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        Config.clear_cache()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = dict.setdefault(self, key, default)
+        Config.clear_cache()
+        return value
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        Config.clear_cache()
+
+
 class Config(object):
 
-    instance = {}
+    instance = ConfigValues()
+
+    # Parsed values keyed by (option, type, default). Options don't change
+    # between loads, so each is only parsed once rather than on every get.
+    _cache = {}
+
+    # How each loaded config file was found, so reload can read them again.
+    _sources = []
+
+    # Called after each reload, to drop anything read from the old config.
+    _reload_hooks = []
 
     @classmethod
     def load_paste_app(cls, *args, **kwargs):
         conf, app = openstack_config.load_paste_app(*args, **kwargs)
         cls.instance.update(conf)
+        cls._add_source(cls._read_paste_config, args, kwargs)
         return conf, app
 
     @classmethod
     def load_paste_config(cls, *args, **kwargs):
         conf_file, conf = openstack_config.load_paste_config(*args, **kwargs)
         cls.instance.update(conf)
+        cls._add_source(cls._read_paste_config, args, kwargs)
+        return conf
+
+    @classmethod
+    def _add_source(cls, read, args, kwargs):
+        # The same files are often loaded more than once, but only need to
+        # be read once per reload.
+        source = (read, args, kwargs)
+        if source not in cls._sources:
+            cls._sources.append(source)
+
+    @staticmethod
+    def _read_paste_config(*args, **kwargs):
+        conf_file, conf = openstack_config.load_paste_config(*args, **kwargs)
         return conf
 
     @classmethod
     def append_to_config_values(cls, *args):
+        cls.instance.update(cls._read_config_values(*args))
+        cls._add_source(cls._read_config_values, args, {})
+
+    @staticmethod
+    def _read_config_values(*args):
         config_file = openstack_config.find_config_file(*args)
         if not config_file:
             raise RuntimeError("Unable to locate any configuration file. "
-                               "Cannot load application %s" % app_name)
+                               "Cannot load application %s" % args[0])
         # Now take the conf file values and append them to the current conf
+        values = {}
         with open(config_file, 'r') as conf:
             for line in conf.readlines():
                     m = re.match("\s*([^#]\S+)\s*=\s*(\S+)\s*", line)
                     if m:
-                        cls.instance[m.group(1)] = m.group(2)
+                        values[m.group(1)] = m.group(2)
+        return values
+
+    @classmethod
+    def reload(cls):
+        """Reads every loaded config file again and replaces the values."""
+        values = {}
+        for read, args, kwargs in cls._sources:
+            values.update(read(*args, **kwargs))
+        dict.clear(cls.instance)
+        cls.instance.update(values)
+        LOG.info(_("Reloaded %d config values.") % len(values))
+        for hook in cls._reload_hooks:
+            hook()
+
+    @classmethod
+    def add_reload_hook(cls, hook):
+        cls._reload_hooks.append(hook)
+
+    @classmethod
+    def reload_on_sighup(cls):
+        """Makes the process reload its config when it gets a SIGHUP."""
+        def handler(signum, frame):
+            try:
+                cls.reload()
+            except Exception:
+                LOG.exception(_("Error reloading the config."))
+        signal.signal(signal.SIGHUP, handler)
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
 
     @classmethod
     def write_config_values(cls, *args, **kwargs):
@@ -86,16 +188,32 @@ class Config(object):
 
     @classmethod
     def get(cls, key, default=None, **kwargs):
+        type_ = kwargs.get('type', 'str')
+        try:
+            return cls._cache[(key, type_, default)]
+        except KeyError:
+            pass
+        except TypeError:
+            # The default can't be hashed, so it can't be cached either.
+            kwargs['default'] = default
+            return get_option(cls.instance, key, **kwargs)
         # We always use a default, even if its None.
         kwargs['default'] = default
-        return get_option(cls.instance, key, **kwargs)
+        value = get_option(cls.instance, key, **kwargs)
+        if type_ != 'list':
+            # Callers may change lists, so those are parsed every time.
+            cls._cache[(key, type_, default)] = value
+        return value
 
 
 def create_type_func(type):
     @classmethod
     def get(cls, key, default=None, **kwargs):
-        kwargs['type'] = type
-        return cls.get(key, default, **kwargs)
+        try:
+            return cls._cache[(key, type, default)]
+        except (KeyError, TypeError):
+            kwargs['type'] = type
+            return cls.get(key, default, **kwargs)
     return get
 
 Config.get_bool = create_type_func('bool')
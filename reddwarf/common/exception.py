@@ -176,6 +176,11 @@ class ModelNotFoundError(NotFound):
     message = _("Not Found")
 
 
+class ModelVersionConflict(ReddwarfError):
+
+    message = _("%(model_name)s %(id)s was changed by another request.")
+
+
 class UpdateGuestError(ReddwarfError):
 
     message = _("Failed to update instances")
@@ -15,35 +15,80 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import datetime
+import json
 import urllib
 import urlparse
-from xml.dom import minidom
+
+
+MARKER_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def encode_marker(values, direction='next'):
+    """Returns an opaque marker for a row's sort key values.
+
+    Following the marker with direction 'next' gives the rows after the row,
+    and with 'previous' the rows before it.
+
+    """
+    encoded = []
+    for value in values:
+        if isinstance(value, datetime.datetime):
+            value = {'time': value.strftime(MARKER_TIME_FORMAT)}
+        encoded.append(value)
+    data = json.dumps([direction, encoded], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def decode_marker(marker):
+    """Returns the (direction, values) of a marker from encode_marker.
+
+    Returns None for anything else, such as the plain ids used as markers
+    by older releases.
+
+    """
+    try:
+        marker = str(marker)
+        data = base64.urlsafe_b64decode(marker + '=' * (-len(marker) % 4))
+        direction, encoded = json.loads(data)
+        values = []
+        for value in encoded:
+            if isinstance(value, dict):
+                value = datetime.datetime.strptime(value['time'],
+                                                   MARKER_TIME_FORMAT)
+            values.append(value)
+    except (TypeError, ValueError, KeyError, UnicodeError):
+        return None
+    if direction not in ('next', 'previous'):
+        return None
+    return direction, values
 
 
 class PaginatedDataView(object):
 
     def __init__(self, collection_type, collection, current_page_url,
-                 next_page_marker=None):
+                 next_page_marker=None, previous_page_marker=None,
+                 total=None):
         self.collection_type = collection_type
         self.collection = collection
         self.current_page_url = current_page_url
         self.next_page_marker = next_page_marker
+        self.previous_page_marker = previous_page_marker
+        self.total = total
 
     def data(self):
-        return {self.collection_type: self.collection,
-                'links': self._links,
+        data = {self.collection_type: self.collection,
+                'links': self._links(),
                 }
+        if self.total is not None:
+            data['total'] = self.total
+        return data
 
     def _links(self):
-        if not self.next_page_marker:
-            return []
-        app_url = AppUrl(self.current_page_url)
-        next_url = app_url.change_query_params(marker=self.next_page_marker)
-        next_link = {
-            'rel': 'next',
-            'href': str(next_url),
-        }
-        return [next_link]
+        return create_page_links(self.current_page_url,
+                                 self.next_page_marker,
+                                 self.previous_page_marker)
 
 
 class SimplePaginatedDataView(object):
@@ -51,25 +96,40 @@ class SimplePaginatedDataView(object):
     # we don't have a collection query object to create a view on.
     # In that case, we have to supply the URL and collection manually.
 
-    def __init__(self, url, name, view, marker):
+    def __init__(self, url, name, view, marker, previous_marker=None,
+                 total=None):
         self.url = url
         self.name = name
         self.view = view
         self.marker = marker
+        self.previous_marker = previous_marker
+        self.total = total
 
     def data(self):
-        if not self.marker:
+        if not (self.marker or self.previous_marker or
+                self.total is not None):
             return self.view.data()
 
-        app_url = AppUrl(self.url)
-        next_url = str(app_url.change_query_params(marker=self.marker))
-        next_link = {'rel': 'next',
-                     'href': next_url}
         view_data = {self.name: self.view.data()[self.name],
-                     'links': [next_link]}
+                     'links': create_page_links(self.url, self.marker,
+                                                self.previous_marker)}
+        if self.total is not None:
+            view_data['total'] = self.total
         return view_data
 
 
+def create_page_links(url, next_marker, previous_marker=None):
+    """Returns the next and previous links for a page of a collection."""
+    links = []
+    for rel, marker in (('next', next_marker), ('previous', previous_marker)):
+        if marker:
+            app_url = AppUrl(url)
+            links.append({'rel': rel,
+                          'href': str(app_url.change_query_params(
+                              marker=marker))})
+    return links
+
+
 class AppUrl(object):
 
     def __init__(self, url):
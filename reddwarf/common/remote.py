@@ -15,6 +15,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+import urlparse
+import weakref
+
+from eventlet import greenthread
+
 from reddwarf.common import config
 from novaclient.v1_1.client import Client
 
@@ -22,6 +28,130 @@ from novaclient.v1_1.client import Client
 CONFIG = config.Config
 
 
+def client_cache_ttl():
+    """Seconds a Nova client is reused for, or zero to always make one."""
+    return CONFIG.get_int('remote_client_cache_ttl', default=300)
+
+
+def client_cache_size():
+    """Most idle Nova clients, and so open connections, kept for each host."""
+    return CONFIG.get_int('remote_client_cache_size', default=50)
+
+
+class ClientPool(object):
+    """Lends out Nova clients, along with their HTTP connections, for reuse.
+
+    Each novaclient Client keeps its connection to Nova open between calls,
+    so lending the same one out again saves setting up a new connection.
+    Clients are kept for each endpoint and set of credentials. A client
+    can't make two calls at once, so it's checked out to one green thread,
+    which gets the same client for every call it makes, and checked back in
+    once that green thread is gone for the next one to use. Idle clients
+    are dropped once they're older than the ttl, and each host keeps at most
+    the pool size of them.
+
+    """
+
+    def __init__(self):
+        # Maps each key to a list of idle (client, host, expires) tuples.
+        self.idle = {}
+        # Maps each green thread to the entries checked out to it, by key.
+        self.lent = weakref.WeakKeyDictionary()
+        # Weak references that check in a green thread's clients once it
+        # has been collected.
+        self._watches = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, host, ttl, create):
+        borrowed = self._borrowed(greenthread.getcurrent())
+        entry = borrowed.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+        entry = self._check_out(key, time.time())
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry = (create(), host, time.time() + ttl)
+        borrowed[key] = entry
+        return entry[0]
+
+    def _borrowed(self, thread):
+        borrowed = self.lent.get(thread)
+        if borrowed is None:
+            borrowed = self.lent[thread] = {}
+
+            def check_in(watch):
+                self._watches.discard(watch)
+                self._check_in(borrowed)
+            self._watches.add(weakref.ref(thread, check_in))
+        return borrowed
+
+    def _check_out(self, key, now):
+        entries = self.idle.get(key, [])
+        while entries:
+            entry = entries.pop()
+            if entry[2] > now:
+                return entry
+            self.evictions += 1
+        return None
+
+    def _check_in(self, borrowed):
+        now = time.time()
+        for key, entry in borrowed.iteritems():
+            if entry[2] <= now or self._idle_count(entry[1]) >= \
+                    client_cache_size():
+                self.evictions += 1
+                continue
+            self.idle.setdefault(key, []).append(entry)
+        borrowed.clear()
+
+    def _idle_count(self, host):
+        return sum(1 for entries in self.idle.itervalues()
+                   for client, entry_host, expires in entries
+                   if entry_host == host)
+
+    def clear(self):
+        self.idle.clear()
+        self.lent.clear()
+
+    def stats(self):
+        """Returns the hit rate and how many idle clients each host has."""
+        lookups = self.hits + self.misses
+        hosts = {}
+        for entries in self.idle.itervalues():
+            for client, host, expires in entries:
+                hosts[host] = hosts.get(host, 0) + 1
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'size': sum(hosts.values()),
+            'lent': sum(len(borrowed) for borrowed in self.lent.values()),
+            'hosts': hosts,
+        }
+
+
+CLIENT_POOL = ClientPool()
+
+
+def client_cache_stats():
+    return CLIENT_POOL.stats()
+
+
+def _cached_client(endpoint, key, create):
+    """Returns a pooled client for the endpoint and key, or a new one."""
+    ttl = client_cache_ttl()
+    if ttl <= 0:
+        return create()
+    return CLIENT_POOL.get((endpoint,) + key,
+                           urlparse.urlparse(endpoint).netloc, ttl, create)
+
+
 def create_dns_client(context):
     from reddwarf.dns.manager import DnsManager
     return DnsManager()
@@ -36,12 +166,39 @@ def create_nova_client(context):
     COMPUTE_URL = CONFIG.get('nova_compute_url', 'http://localhost:8774/v2')
     PROXY_AUTH_URL = CONFIG.get('reddwarf_auth_url',
                                 'http://0.0.0.0:5000/v2.0')
-    client = Client(context.user, context.auth_tok, project_id=context.tenant,
-                    auth_url=PROXY_AUTH_URL)
-    client.client.auth_token = context.auth_tok
-    client.client.management_url = "%s/%s/" % (COMPUTE_URL, context.tenant)
+    management_url = "%s/%s/" % (COMPUTE_URL, context.tenant)
+
+    def create():
+        client = Client(context.user, context.auth_tok,
+                        project_id=context.tenant, auth_url=PROXY_AUTH_URL)
+        client.client.auth_token = context.auth_tok
+        client.client.management_url = management_url
+        return client
+
+    return _cached_client(management_url,
+                          (context.user, context.tenant, context.auth_tok),
+                          create)
+
+
+def create_admin_nova_client(context):
+    """Creates a Nova client which logs in as the Reddwarf proxy admin.
+
+    This is for work done outside of any user's request, such as periodic
+    tasks, so rather than reusing a token it authenticates with the admin
+    credentials and finds Nova's endpoint in the service catalog.
+
+    """
+    PROXY_AUTH_URL = CONFIG.get('reddwarf_auth_url',
+                                'http://0.0.0.0:5000/v2.0')
+    user = CONFIG.get('reddwarf_proxy_admin_user')
+    tenant = CONFIG.get('reddwarf_proxy_admin_tenant_name')
 
-    return client
+    def create():
+        return Client(user, CONFIG.get('reddwarf_proxy_admin_pass'),
+                      project_id=tenant, auth_url=PROXY_AUTH_URL)
+
+    # The client logs in again by itself if its token expires.
+    return _cached_client(PROXY_AUTH_URL, (user, tenant), create)
 
 
 def create_nova_volume_client(context):
@@ -50,12 +207,18 @@ def create_nova_volume_client(context):
     VOLUME_URL = CONFIG.get('nova_volume_url', 'http://localhost:8776/v2')
     PROXY_AUTH_URL = CONFIG.get('reddwarf_auth_url',
                                 'http://0.0.0.0:5000/v2.0')
-    client = Client(context.user, context.auth_tok,
-                    project_id=context.tenant, auth_url=PROXY_AUTH_URL)
-    client.client.auth_token = context.auth_tok
-    client.client.management_url = "%s/%s/" % (VOLUME_URL, context.tenant)
+    management_url = "%s/%s/" % (VOLUME_URL, context.tenant)
+
+    def create():
+        client = Client(context.user, context.auth_tok,
+                        project_id=context.tenant, auth_url=PROXY_AUTH_URL)
+        client.client.auth_token = context.auth_tok
+        client.client.management_url = management_url
+        return client
 
-    return client
+    return _cached_client(management_url,
+                          (context.user, context.tenant, context.auth_tok),
+                          create)
 
 
 if CONFIG.get("remote_implementation", "real") == "fake":
@@ -71,5 +234,8 @@ if CONFIG.get("remote_implementation", "real") == "fake":
     def create_nova_client(context):
         return fake_create_nova_client(context)
 
+    def create_admin_nova_client(context):
+        return fake_create_nova_client(context)
+
     def create_nova_volume_client(context):
         return fake_create_nova_volume_client(context)
@@ -29,6 +29,7 @@ import eventlet
 import greenlet
 from eventlet import greenthread
 
+from reddwarf import db
 from reddwarf.common import config
 from reddwarf.openstack.common import rpc
 from reddwarf.common import utils
@@ -127,6 +128,9 @@ class Service(object):
 
         self.conn.create_consumer(self.topic, self, fanout=True)
 
+        # Let the manager listen for anything else it needs.
+        self.manager.create_consumers(self.conn)
+
         # Consume from all consumers in a thread
         self.conn.consume_in_thread()
         if self.report_interval:
@@ -195,6 +199,14 @@ class Manager(object):
         """
         pass
 
+    def create_consumers(self, conn):
+        """Declare any consumers beyond the service's own rpc topics.
+
+        Child classes should override this method.
+
+        """
+        pass
+
     #TODO(tim.simpson): Rename this to "execute" or something clearer.
     def wrapper(self, method, context, *args, **kwargs):
         """Maps the respective manager method with a task counter."""
@@ -208,7 +220,8 @@ class Manager(object):
             LOG.info(str('*' * 80))
             LOG.info("Running method %s..." % method)
             LOG.info(str('*' * 80))
-            result = func(context, *args, **kwargs)
+            with db.db_api.unit_of_work():
+                result = func(context, *args, **kwargs)
             LOG.info("Finished method %s." % method)
             return result
         except Exception as e:
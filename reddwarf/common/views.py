@@ -40,3 +40,17 @@ def create_links(resource_path, request, id):
             "rel": "bookmark"
         }
     ]
+
+
+def get_fields(request):
+    """Returns the fields asked for with ?fields=, or None for all of them.
+
+    Views given the fields only build those, and loaders given them skip
+    the calls to Nova and the guest which only the others need.
+
+    """
+    fields = request.GET.get('fields')
+    if not fields:
+        return None
+    return frozenset(field.strip() for field in fields.split(",")
+                     if field.strip())
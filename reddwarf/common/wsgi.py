@@ -17,19 +17,25 @@
 """I totally stole most of this from melange, thx guys!!!"""
 
 import eventlet.wsgi
+import hashlib
+import json
 import logging
 import paste.urlmap
 import re
+import sys
 import traceback
 import webob
 import webob.dec
 import webob.exc
-from xml.dom import minidom
+from xml.parsers import expat
 
+from reddwarf import db
 from reddwarf.common import context as rd_context
 from reddwarf.common import config
 from reddwarf.common import exception
 from reddwarf.common import utils
+from reddwarf.common import xmlcodec
+from reddwarf.openstack.common import exception as openstack_exception
 from reddwarf.openstack.common import wsgi as openstack_wsgi
 
 CONTEXT_KEY = 'reddwarf.context'
@@ -38,7 +44,6 @@ Server = openstack_wsgi.Server
 Debug = openstack_wsgi.Debug
 Middleware = openstack_wsgi.Middleware
 JSONDictSerializer = openstack_wsgi.JSONDictSerializer
-XMLDictSerializer = openstack_wsgi.XMLDictSerializer
 XMLDeserializer = openstack_wsgi.XMLDeserializer
 RequestDeserializer = openstack_wsgi.RequestDeserializer
 
@@ -46,6 +51,9 @@ eventlet.patcher.monkey_patch(all=False, socket=True)
 
 LOG = logging.getLogger('reddwarf.common.wsgi')
 
+# Streamed JSON lists are written this many items at a time.
+STREAM_BATCH_SIZE = 500
+
 XMLNS = 'http://docs.openstack.org/database/api/v1.0'
 CUSTOM_PLURALS_METADATA = {'databases': '', 'users': ''}
 CUSTOM_SERIALIZER_METADATA = {
@@ -73,6 +81,7 @@ CUSTOM_SERIALIZER_METADATA = {
     },
     'flavor': {'id': '', 'ram': '', 'name': ''},
     'link': {'href': '', 'rel': ''},
+    'error': {'code': '', 'message': ''},
     'database': {'name': ''},
     'user': {'name': '', 'password': ''},
     'account': {'id': ''},
@@ -172,9 +181,10 @@ class Result(object):
 
     """
 
-    def __init__(self, data, status=200):
+    def __init__(self, data, status=200, etag=None):
         self._data = data
         self.status = status
+        self.etag = etag
 
     def data(self, serialization_type):
         """Return an appropriate serialized type for the body.
@@ -192,6 +202,41 @@ class Result(object):
         return self._data
 
 
+class StreamedList(object):
+    """A list in a response dict whose items are made as it's written.
+
+    Views put one in place of a long list, at the top level of the dict,
+    so the items don't all have to be held at once. JSON responses write
+    them a chunk at a time with ReddwarfJSONDictSerializer, giving the same
+    body as the whole list would. Other content types are given the whole
+    list. Since the items are made after the action returns, making them
+    mustn't raise errors meant for the client. The request's unit of work
+    lasts until they're written.
+
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @staticmethod
+    def contained_in(data):
+        return (type(data) is dict and
+                any(isinstance(value, StreamedList)
+                    for value in data.values()))
+
+    @staticmethod
+    def materialize(data):
+        """Returns a copy of a response dict with its StreamedLists listed."""
+        data = data.copy()
+        for key, value in data.items():
+            if isinstance(value, StreamedList):
+                data[key] = [item for item in value]
+        return data
+
+
 class Resource(openstack_wsgi.Resource):
 
     def __init__(self, controller, deserializer, serializer,
@@ -208,12 +253,17 @@ class Resource(openstack_wsgi.Resource):
         if getattr(self.controller, action, None) is None:
             return Fault(webob.exc.HTTPNotFound())
         try:
+            etag = self._get_etag(action, request, **action_args)
+            if etag is not None and etag in request.if_none_match:
+                return Result(None, 304, etag=etag)
             result = super(Resource, self).execute_action(
                 action,
                 request,
                 **action_args)
             if type(result) is dict:
                 result = Result(result)
+            if etag is not None and isinstance(result, Result):
+                result.etag = etag
             return result
 
         except exception.ReddwarfError as reddwarf_error:
@@ -229,6 +279,26 @@ class Resource(openstack_wsgi.Resource):
                 str(error),
                 request=request))
 
+    def _get_etag(self, action, request, **action_args):
+        """Returns an ETag for the action's response, if it supports one.
+
+        Controllers support conditional requests for an action by defining
+        "<action>_version", which takes the same arguments as the action and
+        returns a value which changes whenever its response would, or None.
+        Since that's checked before the action runs, a matching
+        If-None-Match header is answered without doing any of its work.
+
+        """
+        version_method = getattr(self.controller, "%s_version" % action, None)
+        if version_method is None:
+            return None
+        version = version_method(request, **action_args)
+        if version is None:
+            return None
+        key = "%s %s %s" % (request.best_match_content_type(), request.url,
+                            version)
+        return hashlib.md5(key).hexdigest()
+
     def _get_http_error(self, error):
         return self.model_exception_map.get(type(error),
                                             webob.exc.HTTPBadRequest)
@@ -290,7 +360,9 @@ class Controller(object):
             exception.ComputeInstanceNotFound,
             exception.ModelNotFoundError,
         ],
-        webob.exc.HTTPConflict: [],
+        webob.exc.HTTPConflict: [
+            exception.ModelVersionConflict,
+        ],
         webob.exc.HTTPRequestEntityTooLarge: [
             exception.OverLimit,
             exception.QuotaExceeded,
@@ -310,7 +382,10 @@ class Controller(object):
 
     def create_resource(self):
         serializer = ReddwarfResponseSerializer(
-            body_serializers={'application/xml': ReddwarfXMLDictSerializer()})
+            body_serializers={
+                'application/xml': ReddwarfXMLDictSerializer(),
+                'application/json': ReddwarfJSONDictSerializer(),
+            })
         return Resource(
             self,
             ReddwarfRequestDeserializer(),
@@ -353,15 +428,89 @@ class ReddwarfXMLDeserializer(XMLDeserializer):
         metadata['plurals'] = CUSTOM_PLURALS_METADATA
         super(ReddwarfXMLDeserializer, self).__init__(metadata)
 
-    def default(self, datastring):
-        # Sanitize the newlines
-        # hub-cap: This feels wrong but minidom keeps the newlines
-        # and spaces as childNodes which is expected behavior.
-        return {'body': self._from_xml(re.sub(r'((?<=>)\s+)*\n*(\s+(?=<))*',
-                                       '', datastring))}
+    def _from_xml(self, datastring):
+        # Newlines and the whitespace between tags are dropped as it's read.
+        plurals = set(self.metadata.get('plurals', {}))
+        try:
+            return xmlcodec.parse(datastring, plurals)
+        except (xmlcodec.ParseError, expat.ExpatError):
+            msg = _("cannot understand XML")
+            raise openstack_exception.MalformedRequestBody(reason=msg)
+
+
+class XMLDictSerializer(openstack_wsgi.XMLDictSerializer):
+    """Writes the same documents as openstack.common.wsgi's, with xmlcodec.
+
+    Subclasses build ElementTree elements with _to_xml_element rather than
+    minidom nodes with _to_xml_node.
+
+    """
+
+    def default(self, data):
+        # We expect data to contain a single key which is the XML root.
+        root_key = data.keys()[0]
+        node = self._to_xml_element(self.metadata, root_key, data[root_key])
+        return self.to_xml_string(node)
+
+    def to_xml_string(self, node, has_atom=False):
+        self._add_xmlns(node, has_atom)
+        return xmlcodec.tostring(node)
+
+    def _add_xmlns(self, node, has_atom=False):
+        if self.xmlns is not None:
+            node.set('xmlns', self.xmlns)
+        if has_atom:
+            node.set('xmlns:atom', "http://www.w3.org/2005/Atom")
 
+    def _to_xml_element(self, metadata, nodename, data, parent=None):
+        """Recursive method to convert data members to XML elements."""
+        if parent is None:
+            result = xmlcodec.Element(nodename)
+        else:
+            result = xmlcodec.SubElement(parent, nodename)
+
+        xmlns = metadata.get('xmlns', None)
+        if xmlns:
+            result.set('xmlns', xmlns)
+
+        if type(data) is list:
+            collections = metadata.get('list_collections', {})
+            if nodename in collections:
+                metadata = collections[nodename]
+                for item in data:
+                    node = xmlcodec.SubElement(result, metadata['item_name'])
+                    node.set(metadata['item_key'], str(item))
+                return result
+            singular = metadata.get('plurals', {}).get(nodename, None)
+            if singular is None:
+                if nodename.endswith('s'):
+                    singular = nodename[:-1]
+                else:
+                    singular = 'item'
+            for item in data:
+                self._to_xml_element(metadata, singular, item, result)
+        elif type(data) is dict:
+            collections = metadata.get('dict_collections', {})
+            if nodename in collections:
+                metadata = collections[nodename]
+                for k, v in data.items():
+                    node = xmlcodec.SubElement(result, metadata['item_name'])
+                    node.set(metadata['item_key'], str(k))
+                    node.text = str(v)
+                return result
+            attrs = metadata.get('attributes', {}).get(nodename, {})
+            for k, v in data.items():
+                if k in attrs:
+                    result.set(k, str(v))
+                else:
+                    self._to_xml_element(metadata, k, v, result)
+        else:
+            # Type is atom
+            result.text = str(data)
+        return result
 
-class ReddwarfXMLDictSerializer(openstack_wsgi.XMLDictSerializer):
+
+class ReddwarfXMLDictSerializer(XMLDictSerializer):
 
     def __init__(self, metadata=None, xmlns=None):
         super(ReddwarfXMLDictSerializer, self).__init__(metadata, XMLNS)
@@ -370,11 +519,14 @@ class ReddwarfXMLDictSerializer(openstack_wsgi.XMLDictSerializer):
         # We expect data to be a dictionary containing a single key as the XML
         # root, or two keys, the later being "links."
         # We expect data to contain a single key which is the XML root,
+        # and a paginated collection's "total" becomes an attribute of it.
         has_links = False
         root_key = None
         for key in data:
             if key == "links":
                 has_links = True
+            elif key == "total":
+                continue
             elif root_key is None:
                 root_key = key
             else:
@@ -385,24 +537,81 @@ class ReddwarfXMLDictSerializer(openstack_wsgi.XMLDictSerializer):
             msg = "Missing root key in dict: %s" % data
             LOG.error(msg)
             raise RuntimeError(msg)
-        doc = minidom.Document()
-        node = self._to_xml_node(doc, self.metadata, root_key, data[root_key])
+        node = self._to_xml_element(self.metadata, root_key, data[root_key])
+        if 'total' in data:
+            node.set('total', str(data['total']))
         if has_links:
             # Create a links element, and mix it into the node element.
-            links_node = self._to_xml_node(doc, self.metadata,
-                                           'links', data['links'])
-            node.appendChild(links_node)
+            self._to_xml_element(self.metadata, 'links', data['links'], node)
         return self.to_xml_string(node)
 
-    def _to_xml_node(self, doc, metadata, nodename, data):
+    def _to_xml_element(self, metadata, nodename, data, parent=None):
         metadata['attributes'] = CUSTOM_SERIALIZER_METADATA
         if hasattr(data, "to_xml"):
-            return data.to_xml()
-        return super(ReddwarfXMLDictSerializer, self)._to_xml_node(
-            doc,
+            element = data.to_xml()
+            if parent is not None:
+                parent.append(element)
+            return element
+        return super(ReddwarfXMLDictSerializer, self)._to_xml_element(
             metadata,
             nodename,
-            data)
+            data,
+            parent)
+
+
+class ReddwarfJSONDictSerializer(JSONDictSerializer):
+    """A JSONDictSerializer which writes StreamedLists incrementally."""
+
+    def default(self, data):
+        return "".join(self.iterserialize(data))
+
+    def iterserialize(self, data):
+        """Yields the body for a response dict a chunk at a time.
+
+        The dict is written with a placeholder for each StreamedList, and
+        then the list's items are written in its place as they're made.
+
+        """
+        if not StreamedList.contained_in(data):
+            yield super(ReddwarfJSONDictSerializer, self).default(data)
+            return
+        envelope = data.copy()
+        streamed = {}
+        for key, value in data.items():
+            if isinstance(value, StreamedList):
+                placeholder = "streamed-list-%d" % id(value)
+                envelope[key] = placeholder
+                streamed[json.dumps(placeholder)] = value
+        body = super(ReddwarfJSONDictSerializer, self).default(envelope)
+        start = 0
+        for position, placeholder in sorted((body.index(placeholder),
+                                             placeholder)
+                                            for placeholder in streamed):
+            yield body[start:position]
+            for chunk in self._iterlist(streamed[placeholder]):
+                yield chunk
+            start = position + len(placeholder)
+        yield body[start:]
+
+    def _iterlist(self, items):
+        # Each batch is written as a list, then joined to the others with
+        # the ", " json.dumps separates list items with.
+        separator = "["
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == STREAM_BATCH_SIZE:
+                yield separator + self._dumps_items(batch)
+                separator = ", "
+                batch = []
+        if batch:
+            yield separator + self._dumps_items(batch)
+        elif separator == "[":
+            yield separator
+        yield "]"
+
+    def _dumps_items(self, batch):
+        return super(ReddwarfJSONDictSerializer, self).default(batch)[1:-1]
 
 
 class ReddwarfResponseSerializer(openstack_wsgi.ResponseSerializer):
@@ -412,11 +621,20 @@ class ReddwarfResponseSerializer(openstack_wsgi.ResponseSerializer):
 
         If the "data" argument is the Result class, its data
         method is called and *that* is passed to the superclass implementation
-        instead of the actual data.
+        instead of the actual data. A dict holding a StreamedList becomes the
+        response's app_iter instead if the content type's serializer can
+        write it incrementally.
 
         """
         if isinstance(data, Result):
             data = data.data(content_type)
+        if StreamedList.contained_in(data):
+            serializer = self.get_body_serializer(content_type)
+            if hasattr(serializer, "iterserialize"):
+                response.headers['Content-Type'] = content_type
+                response.app_iter = serializer.iterserialize(data)
+                return
+            data = StreamedList.materialize(data)
         super(ReddwarfResponseSerializer, self).serialize_body(
             response,
             data,
@@ -430,6 +648,8 @@ class ReddwarfResponseSerializer(openstack_wsgi.ResponseSerializer):
             action)
         if isinstance(data, Result):
             response.status = data.status
+            if data.etag is not None:
+                response.etag = data.etag
 
 
 class Fault(webob.exc.HTTPException):
@@ -493,7 +713,7 @@ class Fault(webob.exc.HTTPException):
         metadata = {'attributes': {fault_name: 'code'}}
         content_type = req.best_match_content_type()
         serializer = {
-            'application/xml': openstack_wsgi.XMLDictSerializer(metadata),
+            'application/xml': XMLDictSerializer(metadata),
             'application/json': openstack_wsgi.JSONDictSerializer(),
         }[content_type]
 
@@ -540,6 +760,55 @@ class ContextMiddleware(openstack_wsgi.Middleware):
         return _factory
 
 
+class UnitOfWorkMiddleware(openstack_wsgi.Middleware):
+    """Runs each request in a database unit of work.
+
+    The request's db calls share its session, though each save is still
+    committed on its own. A streamed body is made after the app returns,
+    so then the unit of work lasts until the server closes the body.
+
+    """
+
+    @webob.dec.wsgify(RequestClass=openstack_wsgi.Request)
+    def __call__(self, req):
+        unit = db.db_api.unit_of_work()
+        unit.__enter__()
+        try:
+            resp = req.get_response(self.application)
+        except Exception:
+            unit.__exit__(*sys.exc_info())
+            raise
+        if isinstance(resp.app_iter, (list, tuple)):
+            unit.__exit__(None, None, None)
+        else:
+            resp.app_iter = UnitOfWorkAppIter(resp.app_iter, unit)
+        return resp
+
+    @classmethod
+    def factory(cls, global_config, **local_config):
+        def _factory(app):
+            return cls(app)
+        return _factory
+
+
+class UnitOfWorkAppIter(object):
+    """A response body which ends a unit of work once it's closed."""
+
+    def __init__(self, app_iter, unit):
+        self.app_iter = app_iter
+        self.unit = unit
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self.unit.__exit__(None, None, None)
+
+
 class FaultWrapper(openstack_wsgi.Middleware):
     """Calls down the middleware stack, making exceptions into faults."""
 
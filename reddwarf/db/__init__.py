@@ -17,8 +17,10 @@
 
 import optparse
 
-from reddwarf.common import utils
 from reddwarf.common import config
+from reddwarf.common import exception
+from reddwarf.common import pagination
+from reddwarf.common import utils
 
 
 db_api = utils.import_object(
@@ -55,14 +57,27 @@ class Query(object):
     def delete(self):
         db_api.delete_all(self._query_func, self._model, **self._conditions)
 
-    def limit(self, limit=200, marker=None, marker_column=None):
+    def limit(self, limit=200, marker=None, marker_column=None,
+              sort_keys=None, sort_dir='asc', columns=None):
+        """Returns up to limit rows after the marker.
+
+        Without sort_keys the rows are ordered by the marker column, id by
+        default, and the marker is a value of it. With them the rows are
+        ordered by those columns and the marker is the list of their values
+        for the last row seen. If columns are given, tuples of just those
+        columns are returned instead of models.
+
+        """
         return db_api.find_all_by_limit(
             self._query_func,
             self._model,
             self._conditions,
             limit=limit,
             marker=marker,
-            marker_column=marker_column)
+            marker_column=marker_column,
+            sort_keys=sort_keys,
+            sort_dir=sort_dir,
+            columns=columns)
 
     def paginated_collection(self, limit=200, marker=None, marker_column=None):
         collection = self.limit(int(limit) + 1, marker, marker_column)
@@ -70,6 +85,105 @@ class Query(object):
             return (collection[0:-1], collection[-2]['id'])
         return (collection, None)
 
+    def paginate(self, limit=200, marker=None, sort_keys=('id',),
+                 sort_dir='asc', with_count=False, columns=None):
+        """Returns a Page of rows ordered by the sort keys.
+
+        Pages are found by seeking past the sort key values of the marker's
+        row rather than with an offset, so given an index on the conditions
+        and sort keys every page costs the same. The last key should be
+        unique so the order is stable. Markers come from the pages and can
+        be followed either way; a marker that isn't one is taken as the id
+        of the last row seen. The total number of matching rows is only
+        counted if with_count is set.
+
+        """
+        limit = int(limit)
+        sort_keys = list(sort_keys)
+        direction, values = self._decode_marker(marker, sort_keys)
+        if direction == 'previous':
+            fetch_dir = 'asc' if sort_dir == 'desc' else 'desc'
+        else:
+            fetch_dir = sort_dir
+        if columns is not None:
+            columns = list(columns) + [key for key in sort_keys
+                                       if key not in columns]
+        rows = self.limit(limit + 1, values, sort_keys=sort_keys,
+                          sort_dir=fetch_dir, columns=columns)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        def marker_for(row, direction):
+            return pagination.encode_marker(
+                [getattr(row, key) for key in sort_keys], direction)
+
+        next_marker = None
+        previous_marker = None
+        if direction == 'previous':
+            rows.reverse()
+            if rows:
+                next_marker = marker_for(rows[-1], 'next')
+                if has_more:
+                    previous_marker = marker_for(rows[0], 'previous')
+        else:
+            if has_more:
+                next_marker = marker_for(rows[-1], 'next')
+            if rows and values is not None:
+                previous_marker = marker_for(rows[0], 'previous')
+        total = self.count() if with_count else None
+        return Page(rows, next_marker, previous_marker, total)
+
+    def batches(self, size, sort_keys=('id',), sort_dir='asc',
+                columns=None):
+        """Yields lists of up to size rows ordered by the sort keys.
+
+        Each list is read with its own query, seeking past the last row of
+        the one before as paginate does, so going through every row never
+        holds more than one list of them. The last key should be unique.
+
+        """
+        sort_keys = list(sort_keys)
+        if columns is not None:
+            columns = list(columns) + [key for key in sort_keys
+                                       if key not in columns]
+        values = None
+        while True:
+            rows = self.limit(size, values, sort_keys=sort_keys,
+                              sort_dir=sort_dir, columns=columns)
+            if rows:
+                yield rows
+            if len(rows) < size:
+                return
+            values = [getattr(rows[-1], key) for key in sort_keys]
+
+    def _decode_marker(self, marker, sort_keys):
+        if not marker:
+            return 'next', None
+        decoded = pagination.decode_marker(marker)
+        if decoded is not None and len(decoded[1]) == len(sort_keys):
+            return decoded
+        rows = db_api.find_all_values(self._model, sort_keys, id=marker)
+        if not rows:
+            raise exception.BadRequest(_("Invalid marker: %s") % marker)
+        return 'next', list(rows[0])
+
+
+class Page(object):
+    """One page of rows with the markers of the pages on either side."""
+
+    def __init__(self, items, next_marker=None, previous_marker=None,
+                 total=None):
+        self.items = items
+        self.next_marker = next_marker
+        self.previous_marker = previous_marker
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
 
 class Queryable(object):
 
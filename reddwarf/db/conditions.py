@@ -0,0 +1,84 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Conditions on a column other than equality.
+
+Given as the value of a column in a model's query conditions, the db api
+turns each into the WHERE clause for that column, so listings can filter on
+more than exact values without loading rows they won't show.
+
+"""
+
+
+class Condition(object):
+    pass
+
+
+class StartsWith(Condition):
+    """Values beginning with the prefix."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+
+class AtLeast(Condition):
+    """Values greater than or equal to the value."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Before(Condition):
+    """Values less than the value."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class OneOf(Condition):
+    """Values equal to any of the values."""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class NoneOf(Condition):
+    """Values equal to none of the values, or no value at all."""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class InSelect(Condition):
+    """Values of a model's column in the rows matching the conditions."""
+
+    def __init__(self, model, column, **conditions):
+        self.model = model
+        self.column = column
+        self.conditions = conditions
+
+
+class Either(Condition):
+    """Rows matching all of the conditions in any one of the dicts.
+
+    Unlike the others this is on the row rather than one column, so the
+    name it's given under is only a label.
+
+    """
+
+    def __init__(self, *alternatives):
+        self.alternatives = alternatives
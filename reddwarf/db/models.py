@@ -23,19 +23,89 @@ from reddwarf.common import utils
 
 LOG = logging.getLogger(__name__)
 
+# Keeps IN clauses under the bind parameter limits of the backing database.
+FIND_ALL_IN_BATCH_SIZE = 500
+
 
 class DatabaseModelBase(models.ModelBase):
     _auto_generated_attrs = ['id']
+    # Versioned models have a version column which goes up on each save.
+    _versioned = False
 
     @classmethod
     def create(cls, **values):
-        values['id'] = utils.generate_uuid()
-        values['created'] = utils.utcnow()
+        values = cls._values_for_create(values)
         instance = cls(**values).save()
         if not instance.is_valid():
             raise exception.InvalidModelError(errors=instance.errors)
         return instance
 
+    @classmethod
+    def create_many(cls, rows):
+        """Creates a model for each dict of values, in one transaction.
+
+        Every model is built and validated before anything is written, and
+        then the rows are written with one multi-row INSERT per set of
+        columns rather than a flush each.
+
+        """
+        # The rows are stamped as updated, as save() does for create().
+        now = utils.utcnow()
+        models = [cls(**cls._values_for_create(dict(values, updated=now)))
+                  for values in rows]
+        return db.db_api.create_many(cls, models)
+
+    @classmethod
+    def update_many(cls, conditions, values):
+        """Applies values[n] to the rows matching conditions[n], for each n.
+
+        Updates setting the same columns share a statement run with
+        executemany, all in one transaction. Returns the number of rows
+        changed.
+
+        """
+        conditions = [cls._process_conditions(dict(where))
+                      for where in conditions]
+        now = utils.utcnow()
+        values = [dict(cls._process_values(changes), updated=now)
+                  for changes in values]
+        return db.db_api.update_many(cls, conditions, values)
+
+    @classmethod
+    def upsert_many(cls, rows, keys=('id',)):
+        """Updates the rows matching each dict's keys or creates new ones.
+
+        The existing rows are found with one query per batch of rows, and
+        then updated and created in bulk in one transaction. Raises
+        DBConstraintError if a row is created by someone else in between.
+
+        """
+        keys = list(keys)
+        with db.db_api.transaction():
+            existing = set()
+            for start in range(0, len(rows), FIND_ALL_IN_BATCH_SIZE):
+                batch = rows[start:start + FIND_ALL_IN_BATCH_SIZE]
+                existing.update(db.db_api.find_existing_keys(cls, keys,
+                                                             batch))
+            updates = [row for row in rows
+                       if tuple(row[key] for key in keys) in existing]
+            created = [row for row in rows
+                       if tuple(row[key] for key in keys) not in existing]
+            cls.update_many([dict((key, row[key]) for key in keys)
+                             for row in updates],
+                            [dict((name, value)
+                                  for name, value in row.iteritems()
+                                  if name not in keys)
+                             for row in updates])
+            cls.create_many(created)
+
+    @classmethod
+    def _values_for_create(cls, values):
+        """Override in inheritors whose rows get ids another way."""
+        values.setdefault('id', utils.generate_uuid())
+        values['created'] = utils.utcnow()
+        return values
+
     def save(self):
         if not self.is_valid():
             raise exception.InvalidModelError(errors=self.errors)
@@ -76,17 +146,150 @@ class DatabaseModelBase(models.ModelBase):
     def find_all(cls, **kwargs):
         return db.db_query.find_all(cls, **cls._process_conditions(kwargs))
 
+    @classmethod
+    def find_all_in(cls, column, values, columns=None, **kwargs):
+        """Returns a list of every model whose column is one of the values.
+
+        This lets list views load rows for a whole page of instances with a
+        single query instead of calling find_by once per instance. If columns
+        are given, named tuples of just those columns are returned instead.
+
+        """
+        values = list(set(values))
+        conditions = cls._process_conditions(kwargs)
+        models = []
+        for start in range(0, len(values), FIND_ALL_IN_BATCH_SIZE):
+            batch = values[start:start + FIND_ALL_IN_BATCH_SIZE]
+            models.extend(db.db_api.find_all_in(cls, column, batch,
+                                                columns=columns,
+                                                **conditions))
+        return models
+
+    @classmethod
+    def update_all_in(cls, column, in_values, values, **kwargs):
+        """Sets values on every row whose column is one of in_values.
+
+        The rows are changed with UPDATE statements rather than by loading
+        and saving each model, so any models already loaded are left stale.
+        Returns the number of rows changed.
+
+        """
+        in_values = list(set(in_values))
+        values = dict(values, updated=utils.utcnow())
+        conditions = cls._process_conditions(kwargs)
+        count = 0
+        for start in range(0, len(in_values), FIND_ALL_IN_BATCH_SIZE):
+            batch = in_values[start:start + FIND_ALL_IN_BATCH_SIZE]
+            count += db.db_api.update_all_in(cls, column, batch, values,
+                                             **conditions)
+        return count
+
+    @classmethod
+    def find_all_values(cls, columns, limit=None, marker=None, **kwargs):
+        """Returns named tuples of just the given columns for matching rows.
+
+        If limit is given the rows are ordered by id and start after the
+        marker, as with paginated collections.
+
+        """
+        return db.db_api.find_all_values(cls, columns, limit=limit,
+                                         marker=marker,
+                                         **cls._process_conditions(kwargs))
+
+    @classmethod
+    def update_where(cls, id, expected_version, **values):
+        """Updates a row with one UPDATE if it still has expected_version.
+
+        The row's version goes up by one. Raises ModelVersionConflict,
+        changing nothing, if the row has been saved since that version.
+        Returns the column values written.
+
+        """
+        values = dict(cls._process_values(values), updated=utils.utcnow())
+        if not db.db_api.update_where(cls, id, expected_version, values):
+            raise exception.ModelVersionConflict(model_name=cls.__name__,
+                                                 id=id)
+        return values
+
+    def update_versioned(self, **values):
+        """Saves values with update_where and sets them on the model.
+
+        The expected version is the one the model was loaded with, so this
+        doesn't read the row first.
+
+        """
+        version = db.db_api.loaded_value(self, 'version')
+        values = self.update_where(self.id, version, **values)
+        values['version'] = (version or 0) + 1
+        db.db_api.set_loaded_values(self, values)
+
+    @classmethod
+    def increment_version(cls, **kwargs):
+        """Bumps the version of matching rows without loading them."""
+        db.db_api.increment_version(cls, **cls._process_conditions(kwargs))
+
+    @classmethod
+    def find_max(cls, column, **kwargs):
+        """Returns the largest value of the column for matching rows."""
+        return db.db_api.find_max(cls, column,
+                                  **cls._process_conditions(kwargs))
+
+    @classmethod
+    def find_sum(cls, column, **kwargs):
+        """Returns the total of the column for matching rows, or None."""
+        return db.db_api.find_sum(cls, column,
+                                  **cls._process_conditions(kwargs))
+
+    @classmethod
+    def increment(cls, amounts, limit=None, limit_columns=(), **kwargs):
+        """Adds to columns of matching rows without loading them.
+
+        If limit is given, rows are only changed if the sum of the
+        limit_columns would stay at or under it afterwards. Returns the
+        number of rows changed.
+
+        """
+        return db.db_api.increment(cls, amounts, limit=limit,
+                                   limit_columns=limit_columns,
+                                   **cls._process_conditions(kwargs))
+
+    @classmethod
+    def delete_where(cls, **kwargs):
+        """Deletes matching rows without loading them.
+
+        Returns the number of rows deleted.
+
+        """
+        return db.db_api.delete_where(cls, **cls._process_conditions(kwargs))
+
+    @classmethod
+    def delete_all_before(cls, column, value, **kwargs):
+        """Deletes matching rows whose column is less than the value.
+
+        Returns the number of rows deleted.
+
+        """
+        return db.db_api.delete_all_before(cls, column, value,
+                                           **cls._process_conditions(kwargs))
+
     @classmethod
     def _process_conditions(cls, raw_conditions):
         """Override in inheritors to format/modify any conditions."""
         return raw_conditions
 
+    @classmethod
+    def _process_values(cls, raw_values):
+        """Override in inheritors to turn values into column values."""
+        return raw_values
+
     @classmethod
     def find_by_pagination(cls, collection_type, collection_query,
                            paginated_url, **kwargs):
-        elements, next_marker = collection_query.paginated_collection(**kwargs)
+        page = collection_query.paginate(**kwargs)
 
         return pagination.PaginatedDataView(collection_type,
-                                            elements,
+                                            page.items,
                                             paginated_url,
-                                            next_marker)
+                                            page.next_marker,
+                                            page.previous_marker,
+                                            page.total)
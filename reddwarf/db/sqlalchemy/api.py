@@ -15,13 +15,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import contextlib
+
 import sqlalchemy.exc
 from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import func
+from sqlalchemy import null
 from sqlalchemy import or_
+from sqlalchemy.orm import attributes
 from sqlalchemy.orm import aliased
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.util import identity_key
 
 from reddwarf.common import exception
 from reddwarf.common import utils
+from reddwarf.db import conditions as db_conditions
 from reddwarf.db.sqlalchemy import migration
 from reddwarf.db.sqlalchemy import mappers
 from reddwarf.db.sqlalchemy import session
@@ -40,19 +50,57 @@ def find_all(model, **conditions):
 
 
 def find_all_by_limit(query_func, model, conditions, limit, marker=None,
-                      marker_column=None):
-    return _limits(query_func, model, conditions, limit, marker,
-                   marker_column).all()
+                      marker_column=None, sort_keys=None, sort_dir='asc',
+                      columns=None):
+    query = _limits(query_func, model, conditions, limit, marker,
+                    marker_column, sort_keys, sort_dir)
+    if columns:
+        return _project(query, model, columns)
+    return query.all()
+
+
+def find_all_in(model, column, values, columns=None, **conditions):
+    query = _query_by(model, **conditions)
+    query = query.filter(getattr(model, column).in_(values))
+    if columns:
+        return _project(query, model, columns)
+    return query.all()
+
+
+def find_all_values(model, columns, limit=None, marker=None, **conditions):
+    query = _query_by(model, **conditions)
+    if limit is not None:
+        if marker:
+            query = query.filter(model.id > marker)
+        query = query.order_by(model.id).limit(limit)
+    return _project(query, model, columns)
 
 
 def find_by(model, **kwargs):
+    if 'id' in kwargs and session.in_unit_of_work():
+        # The unit of work may have loaded it already.
+        key = identity_key(model, kwargs['id'])
+        instance = session.get_read_session().identity_map.get(key)
+        if instance is not None and all(getattr(instance, name) == value
+                                        for name, value in kwargs.items()):
+            return instance
     return _query_by(model, **kwargs).first()
 
 
 def save(model):
     try:
-        db_session = session.get_session()
-        model = db_session.merge(model)
+        db_session = session.get_write_session()
+        is_new = attributes.instance_state(model).key is None
+        if is_new:
+            # Merging a new model would look for its row first.
+            db_session.add(model)
+        else:
+            model = db_session.merge(model)
+        if getattr(model, '_versioned', False):
+            if is_new:
+                model.version = 1
+            else:
+                model.version = _next_version(model.__class__)
         db_session.flush()
         return model
     except sqlalchemy.exc.IntegrityError as error:
@@ -60,15 +108,97 @@ def save(model):
                                           error=str(error.orig))
 
 
+def create_many(model, instances):
+    if not instances:
+        return instances
+    mapper = class_mapper(model)
+    table = mapper.mapped_table
+    columns = set(table.c.keys())
+    # Rows setting the same columns share an executemany.
+    groups = {}
+    for instance in instances:
+        row = dict((name, value) for name, value
+                   in attributes.instance_state(instance).dict.iteritems()
+                   if name in columns)
+        if getattr(model, '_versioned', False):
+            row['version'] = 1
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    with transaction() as db_session:
+        for rows in groups.itervalues():
+            _execute(model, db_session, table.insert(), rows)
+    for instance in instances:
+        # They're rows now, so saving them again has to update them.
+        attributes.instance_state(instance).key = \
+            mapper.identity_key_from_instance(instance)
+    return instances
+
+
+def update_many(model, conditions, values):
+    if not conditions:
+        return 0
+    table = class_mapper(model).mapped_table
+    groups = {}
+    for where, changes in zip(conditions, values):
+        params = dict(changes)
+        params.update(('where_%s' % name, value)
+                      for name, value in where.iteritems())
+        key = (tuple(sorted(where)), tuple(sorted(changes)))
+        groups.setdefault(key, []).append(params)
+    count = 0
+    with transaction() as db_session:
+        for (where_names, change_names), rows in groups.iteritems():
+            statement = table.update().where(and_(*[
+                table.c[name] == bindparam('where_%s' % name)
+                for name in where_names]))
+            changes = dict((name, bindparam(name)) for name in change_names)
+            if getattr(model, '_versioned', False):
+                changes['version'] = func.coalesce(table.c.version, 0) + 1
+            statement = statement.values(changes)
+            count += _execute(model, db_session, statement, rows).rowcount
+    _expire_loaded(model)
+    return count
+
+
+def find_existing_keys(model, keys, rows):
+    columns = [getattr(model, key) for key in keys]
+    first_values = set(row[keys[0]] for row in rows)
+    query = session.get_session().query(*columns)
+    query = query.filter(columns[0].in_(first_values))
+    return set(tuple(found) for found in query.all())
+
+
+@contextlib.contextmanager
+def transaction():
+    """Runs the db calls made within it in one transaction."""
+    # The calls all need the same session for that.
+    with session.unit_of_work():
+        db_session = session.get_write_session()
+        db_session.begin(subtransactions=True)
+        try:
+            yield db_session
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+
+def _execute(model, db_session, statement, rows):
+    try:
+        return db_session.execute(statement, rows)
+    except sqlalchemy.exc.IntegrityError as error:
+        raise exception.DBConstraintError(model_name=model.__name__,
+                                          error=str(error.orig))
+
+
 def delete(model):
-    db_session = session.get_session()
+    db_session = session.get_write_session()
     model = db_session.merge(model)
     db_session.delete(model)
     db_session.flush()
 
 
 def delete_all(query_func, model, **conditions):
-    query_func(model, **conditions).delete()
+    _for_write(query_func(model, **conditions)).delete()
 
 
 def update(model, **values):
@@ -77,7 +207,94 @@ def update(model, **values):
 
 
 def update_all(query_func, model, conditions, values):
-    query_func(model, **conditions).update(values)
+    _for_write(query_func(model, **conditions)).update(values)
+
+
+def update_all_in(model, column, in_values, values, **conditions):
+    if getattr(model, '_versioned', False):
+        values = dict(values, version=_next_version(model))
+    query = _for_write(_query_by(model, **conditions))
+    query = query.filter(getattr(model, column).in_(in_values))
+    count = query.update(values, synchronize_session=False)
+    _expire_loaded(model)
+    return count
+
+
+def update_where(model, id, expected_version, values):
+    query = _for_write(_query_by(model, id=id))
+    query = query.filter(model.version == expected_version)
+    values = dict(values, version=_next_version(model))
+    return query.update(values, synchronize_session=False) == 1
+
+
+def loaded_value(model, name):
+    # Expired attributes would be loaded by reading them, so look past them.
+    return attributes.instance_state(model).dict.get(name)
+
+
+def set_loaded_values(model, values):
+    for name, value in values.iteritems():
+        attributes.set_committed_value(model, name, value)
+
+
+def increment_version(model, **conditions):
+    _for_write(_query_by(model, **conditions)).update(
+        {'version': _next_version(model)}, synchronize_session=False)
+    _expire_loaded(model)
+
+
+def find_max(model, column, **conditions):
+    return _aggregate(func.max, model, column, **conditions)
+
+
+def find_sum(model, column, **conditions):
+    return _aggregate(func.sum, model, column, **conditions)
+
+
+def _aggregate(function, model, column, **conditions):
+    query = session.get_read_session().query(function(getattr(model, column)))
+    for key, value in conditions.iteritems():
+        query = query.filter(getattr(model, key) == value)
+    return query.scalar()
+
+
+def increment(model, amounts, limit=None, limit_columns=(), **conditions):
+    query = _for_write(_query_by(model, **conditions))
+    if limit is not None:
+        # The check is part of the UPDATE, so concurrent increments can't
+        # both pass it.
+        total = sum(getattr(model, column) for column in limit_columns)
+        added = sum(amount for column, amount in amounts.iteritems()
+                    if column in limit_columns)
+        query = query.filter(total + added <= limit)
+    values = dict((column, getattr(model, column) + amount)
+                  for column, amount in amounts.iteritems())
+    count = query.update(values, synchronize_session=False)
+    _expire_loaded(model)
+    return count
+
+
+def delete_where(model, **conditions):
+    query = _for_write(_query_by(model, **conditions))
+    return query.delete(synchronize_session=False)
+
+
+def delete_all_before(model, column, value, **conditions):
+    query = _for_write(_query_by(model, **conditions))
+    query = query.filter(getattr(model, column) < value)
+    return query.delete(synchronize_session=False)
+
+
+def unit_of_work():
+    return session.unit_of_work()
+
+
+def expire_all():
+    """Makes models loaded by the unit of work reload on their next use."""
+    if session.in_unit_of_work():
+        for db_session in set([session.get_session(),
+                               session.get_read_session()]):
+            db_session.expire_all()
 
 
 def configure_db(options, *plugins):
@@ -116,20 +333,141 @@ def db_reset(options, *plugins):
     configure_db(options)
 
 
+def _next_version(model):
+    # Incrementing in the UPDATE itself means concurrent saves never end up
+    # with the same version.
+    return func.coalesce(model.version, 0) + 1
+
+
 def _base_query(cls):
-    return session.get_session().query(cls)
+    # Rows already in a unit of work's identity map are refreshed, so
+    # queries always see what other services have written.
+    return session.get_read_session().query(cls).populate_existing()
+
+
+def _for_write(query):
+    # The query functions read from the replicas, so move the query to the
+    # primary before writing with it.
+    return query.with_session(session.get_write_session())
+
+
+def _expire_loaded(model):
+    # Bulk updates skip the identity map, so a unit of work has to reload
+    # the models they may have changed.
+    if session.in_unit_of_work():
+        db_session = session.get_session()
+        for instance in db_session.identity_map.values():
+            if isinstance(instance, model):
+                db_session.expire(instance)
+
+
+def _project(query, model, columns):
+    # Rows straight from the cursor into plain tuples skip building and
+    # tracking a mapped object, or SQLAlchemy's own named tuple, for each.
+    record = _projection(model, tuple(columns))
+    query = query.with_entities(*[getattr(model, column)
+                                  for column in columns])
+    rows = query.session.execute(query.statement)
+    return [record._make(row) for row in rows]
+
+
+_PROJECTIONS = {}
+
+
+def _projection(model, columns):
+    if (model, columns) not in _PROJECTIONS:
+        _PROJECTIONS[(model, columns)] = collections.namedtuple(
+            '%sRow' % model.__name__, columns)
+    return _PROJECTIONS[(model, columns)]
 
 
 def _query_by(cls, **conditions):
     query = _base_query(cls)
-    if conditions:
-        query = query.filter_by(**conditions)
+    equal = {}
+    for name, value in conditions.items():
+        if isinstance(value, db_conditions.Either):
+            query = query.filter(_either(cls, value))
+        elif isinstance(value, db_conditions.Condition):
+            query = query.filter(_clause(getattr(cls, name), value))
+        else:
+            equal[name] = value
+    if equal:
+        query = query.filter_by(**equal)
     return query
 
 
-def _limits(query_func, model, conditions, limit, marker, marker_column=None):
+def _either(cls, condition):
+    alternatives = []
+    for conditions in condition.alternatives:
+        clauses = []
+        for name, value in conditions.items():
+            column = getattr(cls, name)
+            if isinstance(value, db_conditions.Condition):
+                clauses.append(_clause(column, value))
+            else:
+                clauses.append(column == value)
+        alternatives.append(and_(*clauses))
+    return or_(*alternatives)
+
+
+def _clause(column, condition):
+    if isinstance(condition, db_conditions.StartsWith):
+        # LIKE would take any % or _ in the prefix as wildcards. MySQL
+        # treats a backslash in a literal as an escape, so use ! instead.
+        prefix = condition.prefix.replace('!', '!!').replace('%', '!%').\
+            replace('_', '!_')
+        return column.like(prefix + '%', escape='!')
+    if isinstance(condition, db_conditions.AtLeast):
+        return column >= condition.value
+    if isinstance(condition, db_conditions.Before):
+        return column < condition.value
+    if isinstance(condition, db_conditions.OneOf):
+        return column.in_(condition.values)
+    if isinstance(condition, db_conditions.NoneOf):
+        # NOT IN is never true of NULL.
+        return or_(column == null(), ~column.in_(condition.values))
+    if isinstance(condition, db_conditions.InSelect):
+        model = condition.model
+        query = _query_by(model, **condition.conditions)
+        query = query.with_entities(getattr(model, condition.column))
+        return column.in_(query.statement)
+    raise TypeError("Unknown condition %r." % condition)
+
+
+def _limits(query_func, model, conditions, limit, marker, marker_column=None,
+            sort_keys=None, sort_dir='asc'):
     query = query_func(model, **conditions)
-    marker_column = marker_column or model.id
-    if marker:
-        query = query.filter(marker_column > marker)
-    return query.order_by(marker_column).limit(limit)
+    if sort_keys is None:
+        marker_column = marker_column or model.id
+        if marker:
+            query = query.filter(marker_column > marker)
+        return query.order_by(marker_column).limit(limit)
+    columns = [getattr(model, key) for key in sort_keys]
+    if marker is not None:
+        query = query.filter(_after_marker(columns, marker, sort_dir))
+    if sort_dir == 'desc':
+        query = query.order_by(*[column.desc() for column in columns])
+    else:
+        query = query.order_by(*[column.asc() for column in columns])
+    return query.limit(limit)
+
+
+def _after_marker(columns, values, sort_dir):
+    # Rows after the marker row in the sort order: those sharing its first
+    # n keys and beyond it on the next one, for each n.
+    descending = sort_dir == 'desc'
+
+    def beyond(column, value):
+        return column < value if descending else column > value
+
+    clauses = []
+    for index, column in enumerate(columns):
+        equal = [columns[prior] == values[prior] for prior in range(index)]
+        clauses.append(and_(*(equal + [beyond(column, values[index])])))
+    # The OR alone hides the range on the first key from some databases'
+    # planners, so repeat it on its own to keep the index seek.
+    if descending:
+        first = columns[0] <= values[0]
+    else:
+        first = columns[0] >= values[0]
+    return and_(first, or_(*clauses))
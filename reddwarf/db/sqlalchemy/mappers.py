@@ -34,10 +34,16 @@ def map(engine, models):
                Table('service_images', meta, autoload=True))
     orm.mapper(models['service_statuses'],
                Table('service_statuses', meta, autoload=True))
+    orm.mapper(models['instance_events'],
+               Table('instance_events', meta, autoload=True))
     orm.mapper(models['dns_records'],
                Table('dns_records', meta, autoload=True))
     orm.mapper(models['agent_heartbeats'],
                Table('agent_heartbeats', meta, autoload=True))
+    orm.mapper(models['quota_usages'],
+               Table('quota_usages', meta, autoload=True))
+    orm.mapper(models['quota_reservations'],
+               Table('quota_reservations', meta, autoload=True))
 
 
 def mapping_exists(model):
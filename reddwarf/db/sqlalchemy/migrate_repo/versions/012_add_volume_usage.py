@@ -0,0 +1,42 @@
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Column
+from sqlalchemy.schema import MetaData
+
+from reddwarf.db.sqlalchemy.migrate_repo.schema import BigInteger
+from reddwarf.db.sqlalchemy.migrate_repo.schema import DateTime
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Table
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    # add column:
+    service_statuses = Table('service_statuses', meta, autoload=True)
+    service_statuses.create_column(Column('volume_used', BigInteger()))
+    service_statuses.create_column(Column('volume_total', BigInteger()))
+    service_statuses.create_column(Column('volume_updated_at', DateTime()))
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    # drop column:
+    service_statuses = Table('service_statuses', meta, autoload=True)
+    service_statuses.drop_column('volume_used')
+    service_statuses.drop_column('volume_total')
+    service_statuses.drop_column('volume_updated_at')
@@ -0,0 +1,52 @@
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Column
+from sqlalchemy.schema import Index
+from sqlalchemy.schema import MetaData
+
+from reddwarf.db.sqlalchemy.migrate_repo.schema import create_tables
+from reddwarf.db.sqlalchemy.migrate_repo.schema import DateTime
+from reddwarf.db.sqlalchemy.migrate_repo.schema import drop_tables
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Integer
+from reddwarf.db.sqlalchemy.migrate_repo.schema import String
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Table
+
+
+meta = MetaData()
+
+# The id is the cursor clients pass back to fetch newer events, so it has to
+# keep going up across every process writing to the table.
+instance_events = Table(
+    'instance_events',
+    meta,
+    Column('id', Integer(), primary_key=True, autoincrement=True,
+           nullable=False),
+    Column('tenant_id', String(36), nullable=False),
+    Column('instance_id', String(36), nullable=False),
+    Column('event_type', String(36), nullable=False),
+    Column('value', String(64)),
+    Column('created', DateTime()),
+    Index('instance_events_tenant_id_id', 'tenant_id', 'id'),
+    Index('instance_events_instance_id_id', 'instance_id', 'id'))
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    create_tables([instance_events])
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    drop_tables([instance_events])
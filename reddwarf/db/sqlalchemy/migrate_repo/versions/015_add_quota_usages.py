@@ -0,0 +1,49 @@
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Column
+from sqlalchemy.schema import MetaData
+from sqlalchemy.schema import UniqueConstraint
+
+from reddwarf.db.sqlalchemy.migrate_repo.schema import create_tables
+from reddwarf.db.sqlalchemy.migrate_repo.schema import DateTime
+from reddwarf.db.sqlalchemy.migrate_repo.schema import drop_tables
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Integer
+from reddwarf.db.sqlalchemy.migrate_repo.schema import String
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Table
+
+
+meta = MetaData()
+
+quota_usages = Table(
+    'quota_usages',
+    meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('tenant_id', String(36), nullable=False),
+    Column('resource', String(36), nullable=False),
+    Column('in_use', Integer(), nullable=False),
+    Column('reserved', Integer(), nullable=False),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    UniqueConstraint('tenant_id', 'resource'))
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    create_tables([quota_usages])
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    drop_tables([quota_usages])
@@ -0,0 +1,51 @@
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Index
+from sqlalchemy.schema import MetaData
+
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Table
+
+
+def _indexes(meta):
+    instances = Table('instances', meta, autoload=True)
+    service_statuses = Table('service_statuses', meta, autoload=True)
+    agent_heartbeats = Table('agent_heartbeats', meta, autoload=True)
+    instance_events = Table('instance_events', meta, autoload=True)
+    return [
+        # Listing a tenant's instances filters on both columns and pages
+        # through them by id; counting them only needs the first two.
+        Index('instances_tenant_id_deleted_id', instances.c.tenant_id,
+              instances.c.deleted, instances.c.id),
+        Index('instances_compute_instance_id',
+              instances.c.compute_instance_id),
+        Index('service_statuses_instance_id', service_statuses.c.instance_id),
+        Index('agent_heartbeats_instance_id', agent_heartbeats.c.instance_id),
+        # Old events are pruned by their age.
+        Index('instance_events_created', instance_events.c.created),
+    ]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    for index in _indexes(meta):
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    for index in _indexes(meta):
+        index.drop(migrate_engine)
@@ -0,0 +1,50 @@
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Column
+from sqlalchemy.schema import Index
+from sqlalchemy.schema import MetaData
+
+from reddwarf.db.sqlalchemy.migrate_repo.schema import create_tables
+from reddwarf.db.sqlalchemy.migrate_repo.schema import DateTime
+from reddwarf.db.sqlalchemy.migrate_repo.schema import drop_tables
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Integer
+from reddwarf.db.sqlalchemy.migrate_repo.schema import String
+from reddwarf.db.sqlalchemy.migrate_repo.schema import Table
+
+
+meta = MetaData()
+
+quota_reservations = Table(
+    'quota_reservations',
+    meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('tenant_id', String(36), nullable=False),
+    Column('resource', String(36), nullable=False),
+    Column('delta', Integer(), nullable=False),
+    Column('expires_at', DateTime(), nullable=False),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    # The taskmanager looks for expired reservations.
+    Index('quota_reservations_expires_at', 'expires_at'))
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    create_tables([quota_reservations])
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    drop_tables([quota_reservations])
@@ -0,0 +1,184 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Runs the database driver's blocking calls in eventlet's native thread pool.
+
+MySQLdb is written in C, so eventlet can't switch green threads while it
+waits on the server and one slow query stalls the whole process. With
+sql_offload set, engines get a wrapped DBAPI module whose connects,
+statements, commits and rollbacks run through eventlet.tpool instead, and
+only the green thread which made the call waits for them.
+
+"""
+
+import logging
+import sys
+import time
+
+from eventlet import tpool
+from sqlalchemy.engine import url as sa_url
+
+from reddwarf.common import config
+
+
+LOG = logging.getLogger(__name__)
+
+
+class Metrics(object):
+    """How long the offloaded calls queued for a thread and then ran."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.execution_time = 0.0
+        self.max_execution_time = 0.0
+
+    def record(self, wait, execution):
+        self.calls += 1
+        self.wait_time += wait
+        self.max_wait_time = max(self.max_wait_time, wait)
+        self.execution_time += execution
+        self.max_execution_time = max(self.max_execution_time, execution)
+
+    def snapshot(self):
+        calls = self.calls or 1
+        return {
+            'calls': self.calls,
+            'average_wait_time': self.wait_time / calls,
+            'max_wait_time': self.max_wait_time,
+            'average_execution_time': self.execution_time / calls,
+            'max_execution_time': self.max_execution_time,
+        }
+
+
+METRICS = Metrics()
+
+
+def is_enabled(options):
+    return config.get_option(options, 'sql_offload', type='bool',
+                             default=False)
+
+
+def engine_args(options, connection):
+    """Returns the create_engine arguments which offload the connection.
+
+    They're empty unless sql_offload is set. The pool is sized by
+    sql_offload_pool_size when it starts, which is on first use.
+
+    """
+    if not is_enabled(options):
+        return {}
+    tpool.set_num_threads(config.get_option(options, 'sql_offload_pool_size',
+                                            type='int', default=20))
+    url = sa_url.make_url(connection)
+    args = {'module': OffloadedDBAPI(url.get_dialect().dbapi())}
+    if url.drivername.startswith('sqlite'):
+        # Consecutive calls on a connection may run in different threads.
+        args['connect_args'] = {'check_same_thread': False}
+    return args
+
+
+def execute(method, *args, **kwargs):
+    """Calls method in a pool thread, waiting for it in this green thread."""
+    submitted = time.time()
+    started, finished, result, error = tpool.execute(_timed, method, args,
+                                                     kwargs)
+    wait = started - submitted
+    METRICS.record(wait, finished - started)
+    slow_wait = config.Config.get_float('sql_offload_slow_wait', default=1.0)
+    if wait > slow_wait:
+        LOG.warn(_("Database call waited %.3fs for a thread; consider raising "
+                   "sql_offload_pool_size.") % wait)
+    if error is not None:
+        raise error[0], error[1], error[2]
+    return result
+
+
+def _timed(method, args, kwargs):
+    # Runs in the pool thread, so the caller records the times.
+    started = time.time()
+    try:
+        result = method(*args, **kwargs)
+        error = None
+    except Exception:
+        result = None
+        error = sys.exc_info()
+    return started, time.time(), result, error
+
+
+class OffloadedDBAPI(object):
+    """A DBAPI module whose connections offload their blocking calls."""
+
+    def __init__(self, module):
+        self._module = module
+
+    def connect(self, *args, **kwargs):
+        return OffloadedConnection(execute(self._module.connect, *args,
+                                           **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+
+class OffloadedConnection(object):
+
+    def __init__(self, connection):
+        self.__dict__['_connection'] = connection
+
+    def cursor(self, *args, **kwargs):
+        return OffloadedCursor(self._connection.cursor(*args, **kwargs))
+
+    def commit(self):
+        return execute(self._connection.commit)
+
+    def rollback(self):
+        return execute(self._connection.rollback)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+class OffloadedCursor(object):
+
+    def __init__(self, cursor):
+        self.__dict__['_cursor'] = cursor
+
+    def execute(self, *args, **kwargs):
+        return execute(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return execute(self._cursor.executemany, *args, **kwargs)
+
+    def callproc(self, *args, **kwargs):
+        return execute(self._cursor.callproc, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
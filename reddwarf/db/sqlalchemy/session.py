@@ -16,16 +16,23 @@
 #    under the License.
 
 import contextlib
+import itertools
 import logging
+from eventlet import corolocal
 from sqlalchemy import create_engine
 from sqlalchemy import MetaData
 from sqlalchemy.orm import sessionmaker
 
 from reddwarf.common import config
 from reddwarf.db.sqlalchemy import mappers
+from reddwarf.db.sqlalchemy import offload
 
 _ENGINE = None
 _MAKER = None
+# The makers of sessions on the read replicas, taken in turn.
+_READ_MAKERS = None
+# The unit of work of each green thread which has one open.
+_UNIT = corolocal.local()
 
 
 LOG = logging.getLogger(__name__)
@@ -36,6 +43,7 @@ def configure_db(options, models_mapper=None):
     global _ENGINE
     if not _ENGINE:
         _ENGINE = _create_engine(options)
+        _configure_read_replicas(options)
     if models_mapper:
         models_mapper.map(_ENGINE)
     else:
@@ -43,12 +51,14 @@ def configure_db(options, models_mapper=None):
         from reddwarf.dns import models as dns_models
         from reddwarf.extensions.mysql import models as mysql_models
         from reddwarf.guestagent import models as agent_models
+        from reddwarf.quota import models as quota_models
 
         model_modules = [
             base_models,
             dns_models,
             mysql_models,
             agent_models,
+            quota_models,
         ]
 
         models = {}
@@ -67,7 +77,25 @@ def configure_sqlalchemy_log(options):
         logger.setLevel(logging.INFO)
 
 
-def _create_engine(options):
+def _configure_read_replicas(options):
+    global _READ_MAKERS
+    connections = [connection for connection
+                   in config.get_option(options, 'sql_read_connection',
+                                        type='list', default=[])
+                   if connection]
+    if not connections:
+        _READ_MAKERS = None
+        return
+    LOG.info(_("Sending reads to %d replicas.") % len(connections))
+    # The tables are mapped from the primary, so the replicas only need
+    # engines of their own.
+    makers = [sessionmaker(bind=_create_engine(options, connection),
+                           autocommit=True, expire_on_commit=False)
+              for connection in connections]
+    _READ_MAKERS = itertools.cycle(makers)
+
+
+def _create_engine(options, connection=None):
     engine_args = {
         "pool_recycle": config.get_option(options,
                                           'sql_idle_timeout',
@@ -79,11 +107,87 @@ def _create_engine(options):
                                   default=False),
     }
     LOG.info(_("Creating SQLAlchemy engine with args: %s") % engine_args)
-    return create_engine(options['sql_connection'], **engine_args)
+    connection = connection or options['sql_connection']
+    engine_args.update(offload.engine_args(options, connection))
+    return create_engine(connection, **engine_args)
 
 
 def get_session(autocommit=True, expire_on_commit=False):
-    """Helper method to grab session."""
+    """Helper method to grab session.
+
+    Inside a unit of work this is the green thread's shared session.
+
+    """
+    if getattr(_UNIT, 'depth', 0):
+        if _UNIT.session is None:
+            _UNIT.session = _make_session(autocommit, expire_on_commit)
+        return _UNIT.session
+    return _make_session(autocommit, expire_on_commit)
+
+
+def get_read_session():
+    """Helper method to grab a session for read-only queries.
+
+    It's on one of the sql_read_connection replicas when there are any,
+    taken in turn. A unit of work reads from the same replica throughout,
+    and from the primary once it has written, so it always sees its own
+    writes.
+
+    """
+    if _READ_MAKERS is None:
+        return get_session()
+    if not getattr(_UNIT, 'depth', 0):
+        return _READ_MAKERS.next()()
+    if _UNIT.written:
+        return get_session()
+    if _UNIT.read_session is None:
+        _UNIT.read_session = _READ_MAKERS.next()()
+    return _UNIT.read_session
+
+
+def get_write_session():
+    """Helper method to grab a session for a write, which is the primary's.
+
+    The rest of the unit of work reads from the primary as well.
+
+    """
+    if getattr(_UNIT, 'depth', 0):
+        _UNIT.written = True
+    return get_session()
+
+
+def in_unit_of_work():
+    return getattr(_UNIT, 'depth', 0) > 0
+
+
+@contextlib.contextmanager
+def unit_of_work():
+    """Shares one session between the db calls the green thread makes.
+
+    Models loaded and saved within it stay in the session's identity map,
+    so saving them again doesn't have to look them up first, and looking
+    one up again by id doesn't need a query. Each save is still flushed
+    and committed on its own, so the other services see it at once. Units
+    of work nest; the outermost one closes the sessions.
+
+    """
+    _UNIT.depth = getattr(_UNIT, 'depth', 0) + 1
+    if _UNIT.depth == 1:
+        _UNIT.session = None
+        _UNIT.read_session = None
+        _UNIT.written = False
+    try:
+        yield
+    finally:
+        _UNIT.depth -= 1
+        if _UNIT.depth == 0:
+            for name in ('session', 'read_session'):
+                if getattr(_UNIT, name) is not None:
+                    getattr(_UNIT, name).close()
+                    setattr(_UNIT, name, None)
+
+
+def _make_session(autocommit, expire_on_commit):
     global _MAKER, _ENGINE
     if not _MAKER:
         if not _ENGINE:
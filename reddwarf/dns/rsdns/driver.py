@@ -44,6 +44,25 @@ DNS_TTL = config.Config.get("dns_ttl", 300)
 DNS_DOMAIN_ID = config.Config.get("dns_domain_id", 1)
 
 
+def _reload_dns_options():
+    global DNS_HOSTNAME, DNS_ACCOUNT_ID, DNS_AUTH_URL, DNS_DOMAIN_NAME, \
+        DNS_USERNAME, DNS_PASSKEY, DNS_MANAGEMENT_BASE_URL, DNS_TTL, \
+        DNS_DOMAIN_ID
+    DNS_HOSTNAME = config.Config.get("dns_hostname", "")
+    DNS_ACCOUNT_ID = config.Config.get("dns_account_id", 0)
+    DNS_AUTH_URL = config.Config.get("dns_auth_url", "")
+    DNS_DOMAIN_NAME = config.Config.get("dns_domain_name", "")
+    DNS_USERNAME = config.Config.get("dns_username", "")
+    DNS_PASSKEY = config.Config.get("dns_passkey", "")
+    DNS_MANAGEMENT_BASE_URL = config.Config.get("dns_management_base_url",
+                                                "")
+    DNS_TTL = config.Config.get("dns_ttl", 300)
+    DNS_DOMAIN_ID = config.Config.get("dns_domain_id", 1)
+
+
+config.Config.add_reload_hook(_reload_dns_options)
+
+
 LOG = logging.getLogger(__name__)
 
 
@@ -68,12 +68,15 @@ class AccountsSummary(object):
         # TODO(pdmars): This should probably be changed to a more generic
         # database filter query if one is added, however, this should suffice
         # for now.
-        db_infos = DBInstance.find_all(deleted=False)
-        tenant_ids_for_instances = [db_info.tenant_id for db_info in db_infos]
+        rows = DBInstance.find_all_values(['tenant_id'], deleted=False)
+        tenant_ids_for_instances = [row.tenant_id for row in rows]
         tenant_ids = set(tenant_ids_for_instances)
         LOG.debug("All tenants with instances: %s" % tenant_ids)
+        counts = dict.fromkeys(tenant_ids, 0)
+        for tenant_id in tenant_ids_for_instances:
+            counts[tenant_id] += 1
         accounts = []
         for tenant_id in tenant_ids:
-            num_instances = tenant_ids_for_instances.count(tenant_id)
-            accounts.append({'id': tenant_id, 'num_instances': num_instances})
+            accounts.append({'id': tenant_id,
+                             'num_instances': counts[tenant_id]})
         return cls(accounts)
@@ -50,4 +50,4 @@ class AccountController(wsgi.Controller):
         LOG.info(_("req : '%s'\n\n") % req)
         LOG.info(_("Showing all accounts with instances for '%s'") % tenant_id)
         accounts_summary = models.AccountsSummary.load()
-        return wsgi.Result(views.AccountsView(accounts_summary).data(), 200)
+        return wsgi.Result(views.AccountsView(accounts_summary), 200)
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from reddwarf.common import wsgi
+
 
 class AccountsView(object):
 
@@ -22,6 +24,12 @@ class AccountsView(object):
     def data(self):
         return {'accounts': self.accounts_summary.accounts}
 
+    def data_for_json(self):
+        return {'accounts': wsgi.StreamedList(self.accounts_summary.accounts)}
+
+    def data_for_xml(self):
+        return self.data()
+
 
 class AccountView(object):
 
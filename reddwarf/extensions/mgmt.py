@@ -19,6 +19,8 @@ import logging
 
 from reddwarf.common import extensions
 from reddwarf.common import wsgi
+from reddwarf.extensions.mgmt.clients.service import ClientCacheController
+from reddwarf.extensions.mgmt.flavor.service import MgmtFlavorController
 from reddwarf.extensions.mgmt.instances.service import MgmtInstanceController
 from reddwarf.extensions.mgmt.host.service import HostController
 from reddwarf.extensions.mgmt.host.instance import service as hostservice
@@ -77,6 +79,21 @@ class Mgmt(extensions.ExtensionsDescriptor):
             member_actions={})
         resources.append(storage)
 
+        flavors = extensions.ResourceExtension(
+            '{tenant_id}/mgmt/flavors',
+            MgmtFlavorController(),
+            deserializer=wsgi.RequestDeserializer(),
+            serializer=serializer,
+            collection_actions={'refresh': 'POST'})
+        resources.append(flavors)
+
+        client_cache = extensions.ResourceExtension(
+            '{tenant_id}/mgmt/client_cache',
+            ClientCacheController(),
+            deserializer=wsgi.RequestDeserializer(),
+            serializer=serializer)
+        resources.append(client_cache)
+
         host_instances = extensions.ResourceExtension(
             'instances',
             hostservice.HostInstanceController(),
@@ -0,0 +1,38 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import logging
+
+from reddwarf.common.auth import admin_context
+from reddwarf.common import remote
+from reddwarf.common import wsgi
+
+LOG = logging.getLogger(__name__)
+
+
+class ClientCacheController(wsgi.Controller):
+    """Controller for reporting on the API's pool of Nova clients."""
+
+    @admin_context
+    def index(self, req, tenant_id):
+        """Returns the pool's hit rate and idle clients for each host."""
+        LOG.info(_("req : '%s'\n\n") % req)
+        LOG.info(_("Showing the client cache for tenant '%s'") % tenant_id)
+        stats = remote.client_cache_stats()
+        # Hosts have colons in them, which can't be XML element names.
+        stats['hosts'] = [{'host': host, 'idle': idle}
+                          for host, idle in sorted(stats['hosts'].items())]
+        return wsgi.Result({'client_cache': stats}, 200)
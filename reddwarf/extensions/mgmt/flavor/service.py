@@ -0,0 +1,39 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import logging
+
+from reddwarf.common.auth import admin_context
+from reddwarf.common import wsgi
+from reddwarf.flavor import models
+from reddwarf.flavor import views
+
+LOG = logging.getLogger(__name__)
+
+
+class MgmtFlavorController(wsgi.Controller):
+    """Controller for managing the flavor catalog."""
+
+    @admin_context
+    def refresh(self, req, tenant_id, body=None):
+        """Reloads the flavors from Nova and returns them."""
+        LOG.info(_("req : '%s'\n\n") % req)
+        LOG.info(_("Refreshing the flavor catalog for tenant '%s'")
+                 % tenant_id)
+        context = req.environ[wsgi.CONTEXT_KEY]
+        models.FLAVOR_CATALOG.refresh(context)
+        flavors = models.Flavors(context=context)
+        return wsgi.Result(views.FlavorsView(flavors, req).data(), 200)
@@ -39,7 +39,7 @@ class HostController(InstanceController):
         LOG.info(_("Indexing a host for tenant '%s'") % tenant_id)
         context = req.environ[wsgi.CONTEXT_KEY]
         hosts = models.SimpleHost.load_all(context)
-        return wsgi.Result(views.HostsView(hosts).data(), 200)
+        return wsgi.Result(views.HostsView(hosts), 200)
 
     @admin_context
     def show(self, req, tenant_id, id):
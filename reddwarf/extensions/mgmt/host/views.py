@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from reddwarf.common import wsgi
+
 
 class HostView(object):
 
@@ -51,3 +53,10 @@ class HostsView(object):
     def data(self):
         data = [HostView(host).data() for host in self.hosts]
         return {'hosts': data}
+
+    def data_for_json(self):
+        return {'hosts': wsgi.StreamedList(HostView(host).data()
+                                           for host in self.hosts)}
+
+    def data_for_xml(self):
+        return self.data()
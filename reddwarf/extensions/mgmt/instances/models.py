@@ -27,19 +27,35 @@ CONFIG = config.Config
 LOG = logging.getLogger(__name__)
 
 
-def load_mgmt_instances(context, deleted=None):
-    client = create_nova_client(context)
-    mgmt_servers = client.rdservers.list()
-    db_infos = None
+# The fields of the mgmt instance views which come from Nova's servers, and
+# those which come from the root history.
+SERVER_FIELDS = imodels.SERVER_FIELDS | frozenset(['server'])
+ROOT_HISTORY_FIELDS = frozenset(['root_enabled', 'root_enabled_by'])
+
+# How many instance rows the mgmt list reads with each query.
+MGMT_LIST_BATCH_SIZE = 200
+
+
+def load_mgmt_instances(context, deleted=None, fields=None, filters=None):
+    """Returns an iterator of the records of every matching instance.
+
+    Nova's servers are listed right away, but the instance rows are read a
+    batch at a time as the records are iterated, so a view streaming them
+    only holds one batch of rows and records.
+
+    """
+    mgmt_servers = None
+    if imodels.needs_fields(fields, SERVER_FIELDS):
+        client = create_nova_client(context)
+        mgmt_servers = client.rdservers.list()
+    filters = filters or imodels.InstanceFilters()
+    conditions = dict(filters.conditions)
     if deleted is not None:
-        db_infos = instance_models.DBInstance.find_all(deleted=deleted)
-    else:
-        db_infos = instance_models.DBInstance.find_all()
-    instances = MgmtInstances.load_status_from_existing(
-        context,
-        db_infos,
-        mgmt_servers)
-    return instances
+        conditions['deleted'] = deleted
+    batches = instance_models.DBInstance.find_all(**conditions).batches(
+        MGMT_LIST_BATCH_SIZE, sort_keys=filters.sort_keys,
+        sort_dir=filters.sort_dir, columns=MgmtInstanceRecord.COLUMNS)
+    return MgmtInstances.iter_records(context, batches, mgmt_servers)
 
 
 def load_mgmt_instance(cls, context, id):
@@ -95,15 +111,17 @@ class DetailedMgmtInstance(SimpleMgmtInstance):
         self.root_history = None
 
     @classmethod
-    def load(cls, context, id):
+    def load(cls, context, id, fields=None):
         instance = load_mgmt_instance(cls, context, id)
-        client = create_nova_volume_client(context)
-        try:
-            instance.volume = client.volumes.get(instance.volume_id)
-        except Exception as ex:
-            instance.volume = None
-        instance.root_history = mysql_models.RootHistory.load(context=context,
-                                                              instance_id=id)
+        if imodels.needs_fields(fields, ['volume']):
+            client = create_nova_volume_client(context)
+            try:
+                instance.volume = client.volumes.get(instance.volume_id)
+            except Exception as ex:
+                instance.volume = None
+        if imodels.needs_fields(fields, ROOT_HISTORY_FIELDS):
+            instance.root_history = mysql_models.RootHistory.load(
+                context=context, instance_id=id)
         return instance
 
 
@@ -119,8 +137,61 @@ class MgmtInstance(imodels.Instance):
         return self.get_guest().get_hwinfo()
 
 
+class MgmtInstanceRecord(imodels.InstanceRecord):
+    """The fields of an instance the mgmt list view shows."""
+
+    COLUMNS = imodels.InstanceRecord.COLUMNS + (
+        'tenant_id', 'created', 'updated', 'hostname', 'deleted',
+        'deleted_at', 'task_description')
+
+    __slots__ = ('tenant_id', 'created', 'updated', 'hostname', 'deleted',
+                 'deleted_at', 'task_description', 'server')
+
+    # Only Nova servers have addresses.
+    addresses = None
+
+    def __init__(self, row, status_row, service_status, server_status):
+        super(MgmtInstanceRecord, self).__init__(row, status_row,
+                                                 service_status,
+                                                 server_status)
+        self.tenant_id = row.tenant_id
+        self.created = row.created
+        self.updated = row.updated
+        self.hostname = row.hostname
+        self.deleted = row.deleted
+        self.deleted_at = row.deleted_at
+        self.task_description = row.task_description
+        self.server = None
+        if self.deleted:
+            self.status = imodels.InstanceStatus.SHUTDOWN
+
+
 class MgmtInstances(imodels.Instances):
 
+    @staticmethod
+    def load_records(context, rows, servers):
+        """Returns MgmtInstanceRecords for rows of its COLUMNS.
+
+        With servers None the records are left without them, and their
+        server status is the one on the row.
+
+        """
+        return list(MgmtInstances.iter_records(context, [rows], servers))
+
+    @staticmethod
+    def iter_records(context, batches, servers):
+        """Yields MgmtInstanceRecords for batches of rows, one at a time."""
+        if context is None:
+            raise TypeError("Argument context not defined.")
+        find_server = None
+        if servers is not None:
+            find_server = imodels.create_server_list_matcher(servers)
+        for rows in batches:
+            instances = imodels.Instances._load_records(MgmtInstanceRecord,
+                                                        rows, find_server)
+            for instance in _load_servers(instances, find_server):
+                yield instance
+
     @staticmethod
     def load_status_from_existing(context, db_infos, servers):
 
@@ -139,10 +210,11 @@ class MgmtInstances(imodels.Instances):
 
 def _load_servers(instances, find_server):
     for instance in instances:
-        db = instance.db_info
         instance.server = None
+        if find_server is None:
+            continue
         try:
-            server = find_server(db.id, db.compute_instance_id)
+            server = find_server(instance.id, instance.server_id)
             instance.server = server
         except Exception as ex:
             LOG.error(ex)
@@ -22,6 +22,7 @@ from novaclient import exceptions as nova_exceptions
 
 from reddwarf.common import exception
 from reddwarf.common import wsgi
+from reddwarf.common.views import get_fields
 from reddwarf.extensions.mgmt.instances import models
 from reddwarf.extensions.mgmt.instances.views import DiagnosticsView
 from reddwarf.extensions.mgmt.instances.views import HwInfoView
@@ -51,8 +52,12 @@ class MgmtInstanceController(InstanceController):
             deleted = True
         elif deleted_q in ['false']:
             deleted = False
+        fields = get_fields(req)
+        filters = instance_models.InstanceFilters(req.GET)
         try:
-            instances = models.load_mgmt_instances(context, deleted=deleted)
+            instances = models.load_mgmt_instances(context, deleted=deleted,
+                                                   fields=fields,
+                                                   filters=filters)
         except nova_exceptions.ClientException, e:
             LOG.error(e)
             return wsgi.Result(str(e), 403)
@@ -60,7 +65,8 @@ class MgmtInstanceController(InstanceController):
         view_cls = views.MgmtInstancesView
         return wsgi.Result(view_cls(instances, req=req,
                                     add_addresses=self.add_addresses,
-                                    add_volumes=self.add_volumes).data(), 200)
+                                    add_volumes=self.add_volumes,
+                                    fields=fields), 200)
 
     @admin_context
     def show(self, req, tenant_id, id):
@@ -70,16 +76,17 @@ class MgmtInstanceController(InstanceController):
         LOG.info(_("id : '%s'\n\n") % id)
 
         context = req.environ[wsgi.CONTEXT_KEY]
-        server = models.DetailedMgmtInstance.load(context, id)
-        root_history = mysql_models.RootHistory.load(context=context,
-                                                     instance_id=id)
+        fields = get_fields(req)
+        server = models.DetailedMgmtInstance.load(context, id, fields=fields)
+        root_history = server.root_history
         return wsgi.Result(
             views.MgmtInstanceDetailView(
                 server,
                 req=req,
                 add_addresses=self.add_addresses,
                 add_volumes=self.add_volumes,
-                root_history=root_history).data(),
+                root_history=root_history,
+                fields=fields).data(),
             200)
 
     @admin_context
@@ -16,93 +16,110 @@
 #    under the License.
 
 
+from reddwarf.common import wsgi
 from reddwarf.instance.views import InstanceDetailView
 
 
 class MgmtInstanceView(InstanceDetailView):
 
     def __init__(self, instance, req=None, add_addresses=False,
-                 add_volumes=False):
+                 add_volumes=False, fields=None):
         super(MgmtInstanceView, self).__init__(instance, req,
                                                add_addresses,
-                                               add_volumes)
+                                               add_volumes,
+                                               fields)
 
     def data(self):
         result = super(MgmtInstanceView, self).data()
-        if self.instance.server is None:
-            result['instance']['server'] = None
-        else:
-            server = self.instance.server
-            result['instance']['server'] = {
-                'deleted': server.deleted,
-                'deleted_at': server.deleted_at,
-                'host': server.host,
-                'id': server.id,
-                'local_id': server.local_id,
-                'name': server.name,
-                'status': server.status,
-                'tenant_id': server.tenant_id,
-            }
-
-        try:
-            service_status = self.instance.service_status.status.api_status
-        except AttributeError:
-            service_status = None
-        result['instance']['service_status'] = service_status
-        result['instance']['tenant_id'] = self.instance.tenant_id
-        result['instance']['deleted'] = bool(self.instance.deleted)
-        result['instance']['deleted_at'] = self.instance.deleted_at
-        result['instance']['task_description'] = self.instance.task_description
+        if self.shows('server'):
+            result['instance']['server'] = self._build_server_info()
+
+        if self.shows('service_status'):
+            result['instance']['service_status'] = \
+                self.instance.service_api_status
+        if self.shows('tenant_id'):
+            result['instance']['tenant_id'] = self.instance.tenant_id
+        if self.shows('deleted'):
+            result['instance']['deleted'] = bool(self.instance.deleted)
+        if self.shows('deleted_at'):
+            result['instance']['deleted_at'] = self.instance.deleted_at
+        if self.shows('task_description'):
+            result['instance']['task_description'] = \
+                self.instance.task_description
         return result
 
+    def _build_server_info(self):
+        server = self.instance.server
+        if server is None:
+            return None
+        return {
+            'deleted': server.deleted,
+            'deleted_at': server.deleted_at,
+            'host': server.host,
+            'id': server.id,
+            'local_id': server.local_id,
+            'name': server.name,
+            'status': server.status,
+            'tenant_id': server.tenant_id,
+        }
+
 
 class MgmtInstanceDetailView(MgmtInstanceView):
     """Works with a full-blown instance."""
 
     def __init__(self, instance, req, add_addresses=False,
-                 add_volumes=False, root_history=None):
+                 add_volumes=False, root_history=None, fields=None):
         add_a = add_addresses
         super(MgmtInstanceDetailView, self).__init__(instance,
                                                      req=req,
                                                      add_addresses=add_a,
-                                                     add_volumes=add_volumes)
+                                                     add_volumes=add_volumes,
+                                                     fields=fields)
         self.root_history = root_history
 
     def data(self):
         result = super(MgmtInstanceDetailView, self).data()
-        if self.instance.server is not None:
+        if self.instance.server is not None and self.shows('server'):
             server = self.instance.server
             result['instance']['server'].update(
                 {'addresses': server.addresses})
         if self.root_history:
-            result['instance']['root_enabled'] = self.root_history.created
-            result['instance']['root_enabled_by'] = self.root_history.user
-        if self.instance.volume:
-            volume = self.instance.volume
-            result['instance']['volume'] = {
-                "attachments": volume.attachments,
-                "availability_zone": volume.availability_zone,
-                "created_at": volume.created_at,
-                "id": volume.id,
-                "size": volume.size,
-                "status": volume.status,
-            }
-        else:
-            result['instance']['volume'] = None
-        description = self.instance.service_status.status.description
-        result['instance']['guest_status'] = {"state_description": description}
+            if self.shows('root_enabled'):
+                result['instance']['root_enabled'] = self.root_history.created
+            if self.shows('root_enabled_by'):
+                result['instance']['root_enabled_by'] = self.root_history.user
+        if self.shows('volume'):
+            result['instance']['volume'] = self._build_volume_info()
+        if self.shows('guest_status'):
+            description = self.instance.service_status.status.description
+            result['instance']['guest_status'] = {
+                "state_description": description}
         return result
 
+    def _build_volume_info(self):
+        volume = self.instance.volume
+        if not volume:
+            return None
+        return {
+            "attachments": volume.attachments,
+            "availability_zone": volume.availability_zone,
+            "created_at": volume.created_at,
+            "id": volume.id,
+            "size": volume.size,
+            "status": volume.status,
+        }
+
 
 class MgmtInstancesView(object):
-    """Shows a list of MgmtInstance objects."""
+    """Shows a list of MgmtInstanceRecords or SimpleMgmtInstances."""
 
     def __init__(self, instances, req=None, add_addresses=False,
-                 add_volumes=False):
+                 add_volumes=False, fields=None):
         self.instances = instances
         self.req = req
         self.add_addresses = add_addresses
         self.add_volumes = add_volumes
+        self.fields = fields
 
     def data(self):
         data = []
@@ -111,10 +128,18 @@ class MgmtInstancesView(object):
             data.append(self.data_for_instance(instance))
         return {'instances': data}
 
+    def data_for_json(self):
+        return {'instances': wsgi.StreamedList(
+            self.data_for_instance(instance) for instance in self.instances)}
+
+    def data_for_xml(self):
+        return self.data()
+
     def data_for_instance(self, instance):
         view = MgmtInstanceView(instance, req=self.req,
                                 add_addresses=self.add_addresses,
-                                add_volumes=self.add_volumes)
+                                add_volumes=self.add_volumes,
+                                fields=self.fields)
         return view.data()['instance']
 
 
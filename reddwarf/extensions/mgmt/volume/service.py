@@ -37,4 +37,4 @@ class StorageController(wsgi.Controller):
         LOG.info(_("Indexing storage info for tenant '%s'") % tenant_id)
         context = req.environ[wsgi.CONTEXT_KEY]
         storages = models.StorageDevices.load(context)
-        return wsgi.Result(views.StoragesView(storages).data(), 200)
+        return wsgi.Result(views.StoragesView(storages), 200)
@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from reddwarf.common import wsgi
+
 
 class StorageView(object):
 
@@ -40,3 +42,10 @@ class StoragesView(object):
     def data(self):
         data = [StorageView(storage).data() for storage in self.storages]
         return {'devices': data}
+
+    def data_for_json(self):
+        return {'devices': wsgi.StreamedList(StorageView(storage).data()
+                                             for storage in self.storages)}
+
+    def data_for_xml(self):
+        return self.data()
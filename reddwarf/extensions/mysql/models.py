@@ -237,3 +237,11 @@ class Schemas(object):
                                         mysql_schema.collate,
                                         mysql_schema.character_set))
         return model_schemas, next_marker
+
+
+def _reload_page_sizes():
+    Users.DEFAULT_LIMIT = int(CONFIG.get('users_page_size', '20'))
+    Schemas.DEFAULT_LIMIT = int(CONFIG.get('databases_page_size', '20'))
+
+
+CONFIG.add_reload_hook(_reload_page_sizes)
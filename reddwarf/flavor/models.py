@@ -17,15 +17,110 @@
 
 """Model classes that form the core of instance flavor functionality."""
 
-from reddwarf import db
+import logging
+import time
+
+from eventlet import greenthread
 
 from novaclient import exceptions as nova_exceptions
+from reddwarf.common import config
 from reddwarf.common import exception
-from reddwarf.common import utils
 from reddwarf.common.models import NovaRemoteModelBase
+from reddwarf.common.remote import create_admin_nova_client
 from reddwarf.common.remote import create_nova_client
 
 
+CONFIG = config.Config
+LOG = logging.getLogger(__name__)
+
+
+def flavor_cache_ttl():
+    """Seconds before the flavor catalog is refreshed, or zero to not cache."""
+    return CONFIG.get_int('flavor_cache_ttl', default=300)
+
+
+class FlavorCatalog(object):
+    """A copy of Nova's flavors shared by everything in the process.
+
+    It's loaded from Nova the first time it's needed. After that, once it's
+    older than the ttl, it's refreshed on a green thread while callers keep
+    getting the copy they have, so listing, showing and checking flavors
+    never waits on Nova unless a flavor isn't in the copy. The request which
+    started a refresh may be gone, and its token expired, by the time the
+    green thread runs, so it logs in to Nova as the proxy admin instead.
+
+    """
+
+    def __init__(self):
+        self.flavors = None
+        self.flavors_by_id = {}
+        self.loaded_at = None
+        self.refreshing = False
+
+    def refresh(self, context):
+        """Loads every flavor from Nova, replacing the current copy."""
+        return self._refresh(create_nova_client(context))
+
+    def _refresh(self, client):
+        try:
+            flavors = client.flavors.list()
+        except nova_exceptions.ClientException, e:
+            raise exception.ReddwarfError(str(e))
+        self.flavors_by_id = dict((str(flavor.id), flavor)
+                                  for flavor in flavors)
+        self.flavors = flavors
+        self.loaded_at = time.time()
+        LOG.debug("Loaded %d flavors from Nova." % len(flavors))
+        return flavors
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh(create_admin_nova_client(None))
+        except Exception:
+            LOG.exception(_("Error refreshing the flavor catalog."))
+        finally:
+            self.refreshing = False
+
+    def _load(self, context):
+        ttl = flavor_cache_ttl()
+        if self.flavors is None or ttl <= 0:
+            self.refresh(context)
+        elif time.time() - self.loaded_at > ttl and not self.refreshing:
+            self.refreshing = True
+            greenthread.spawn(self._refresh_in_background)
+
+    def list(self, context):
+        self._load(context)
+        return self.flavors
+
+    def get(self, context, flavor_id):
+        """Returns a flavor, asking Nova for ones which aren't in the copy.
+
+        Raises NotFound if Nova doesn't have it either.
+
+        """
+        self._load(context)
+        flavor = self.flavors_by_id.get(str(flavor_id))
+        if flavor is not None:
+            return flavor
+        try:
+            flavor = create_nova_client(context).flavors.get(flavor_id)
+        except nova_exceptions.NotFound, e:
+            raise exception.NotFound(uuid=flavor_id)
+        except nova_exceptions.ClientException, e:
+            raise exception.ReddwarfError(str(e))
+        self.flavors_by_id[str(flavor.id)] = flavor
+        return flavor
+
+    def clear(self):
+        self.flavors = None
+        self.flavors_by_id = {}
+        self.loaded_at = None
+
+
+FLAVOR_CATALOG = FlavorCatalog()
+
+
 class Flavor(object):
 
     _data_fields = ['id', 'links', 'name', 'ram', 'vcpus']
@@ -35,13 +130,7 @@ class Flavor(object):
             self.flavor = flavor
             return
         if flavor_id and context:
-            try:
-                client = create_nova_client(context)
-                self.flavor = client.flavors.get(flavor_id)
-            except nova_exceptions.NotFound, e:
-                raise exception.NotFound(uuid=flavor_id)
-            except nova_exceptions.ClientException, e:
-                raise exception.ReddwarfError(str(e))
+            self.flavor = FLAVOR_CATALOG.get(context, flavor_id)
             return
         msg = ("Flavor is not defined, and"
                " context and flavor_id were not specified.")
@@ -71,7 +160,7 @@ class Flavor(object):
 class Flavors(NovaRemoteModelBase):
 
     def __init__(self, context):
-        nova_flavors = create_nova_client(context).flavors.list()
+        nova_flavors = FLAVOR_CATALOG.list(context)
         self.flavors = [Flavor(flavor=item) for item in nova_flavors]
 
     def __iter__(self):
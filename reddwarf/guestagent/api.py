@@ -35,6 +35,15 @@ AGENT_LOW_TIMEOUT = int(config.Config.get('agent_call_low_timeout', 5))
 AGENT_HIGH_TIMEOUT = int(config.Config.get('agent_call_high_timeout', 60))
 
 
+def _reload_timeouts():
+    global AGENT_LOW_TIMEOUT, AGENT_HIGH_TIMEOUT
+    AGENT_LOW_TIMEOUT = int(config.Config.get('agent_call_low_timeout', 5))
+    AGENT_HIGH_TIMEOUT = int(config.Config.get('agent_call_high_timeout', 60))
+
+
+config.Config.add_reload_hook(_reload_timeouts)
+
+
 class API(object):
     """API for interacting with the guest manager."""
 
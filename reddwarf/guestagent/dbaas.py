@@ -45,6 +45,7 @@ from reddwarf.common.exception import GuestError
 from reddwarf.common.exception import ProcessExecutionError
 from reddwarf.common import config
 from reddwarf.common import utils
+from reddwarf.db.sqlalchemy import offload
 from reddwarf.guestagent.db import models
 from reddwarf.guestagent.volume import VolumeDevice
 from reddwarf.guestagent.query import Query
@@ -99,10 +100,10 @@ def get_engine():
             return ENGINE
         #ENGINE = create_engine(name_or_url=url)
         pwd = get_auth_password()
-        ENGINE = create_engine("mysql://%s:%s@localhost:3306" %
-                               (ADMIN_USER_NAME, pwd.strip()),
-                               pool_recycle=7200, echo=True,
-                               listeners=[KeepAliveConnection()])
+        url = "mysql://%s:%s@localhost:3306" % (ADMIN_USER_NAME, pwd.strip())
+        ENGINE = create_engine(url, pool_recycle=7200, echo=True,
+                               listeners=[KeepAliveConnection()],
+                               **offload.engine_args(CONFIG.instance, url))
         return ENGINE
 
 
@@ -123,6 +124,14 @@ def load_mysqld_options():
         return None
 
 
+def get_filesystem_volume_stats(fs_path):
+    """Returns the bytes used, free and in total on a filesystem."""
+    stats = os.statvfs(fs_path)
+    total = stats.f_blocks * stats.f_frsize
+    free = stats.f_bfree * stats.f_frsize
+    return {'total': total, 'free': free, 'used': total - free}
+
+
 class MySqlAppStatus(object):
     """
     Answers the question "what is the status of the MySQL application on
@@ -232,26 +241,37 @@ class MySqlAppStatus(object):
         id = config.Config.get('guest_id')
         return rd_models.InstanceServiceStatus.find_by(instance_id=id)
 
-    def set_status(self, status):
-        """Changes the status of the MySQL app in the database."""
+    def set_status(self, status, volume_stats=None):
+        """Changes the status of the MySQL app in the database.
+
+        A sample of the volume's usage, if given, is saved with it.
+        """
         db_status = self._load_status()
-        db_status.set_status(status)
+        if status is not None:
+            db_status.set_status(status)
+        if volume_stats is not None:
+            db_status.set_volume_usage(volume_stats['used'],
+                                       volume_stats['total'])
         db_status.save()
-        self.status = status
+        if status is not None:
+            self.status = status
 
-    def update(self):
+    def update(self, volume_stats=None):
         """Find and report status of MySQL on this machine.
 
-        The database is update and the status is also returned.
+        The database is update and the status is also returned. A sample
+        of the volume's usage, if given, is saved along with the status.
         """
         if self.is_mysql_installed and not self._is_mysql_restarting:
             LOG.info("Determining status of MySQL app...")
             status = self._get_actual_db_status()
-            self.set_status(status)
+            self.set_status(status, volume_stats)
         else:
             LOG.info("MySQL is not installed or is in restart mode, so for "
                      "now we'll skip determining the status of MySQL on this "
                      "box.")
+            if volume_stats is not None:
+                self.set_status(None, volume_stats)
 
     def wait_for_real_status_to_change_to(self, status, max_time,
                                           update_db=False):
@@ -576,9 +596,20 @@ class DBaaSAgent(object):
         app = MySqlApp(self.status)
         app.stop_mysql()
 
+    def get_filesystem_stats(self, fs_path):
+        return get_filesystem_volume_stats(fs_path)
+
     def update_status(self):
-        """Update the status of the MySQL service"""
-        MySqlAppStatus.get().update()
+        """Update the status of the MySQL service and its volume's usage"""
+        # The API shows the volume usage from this sample rather than
+        # asking for it on each request. It's saved with the status.
+        try:
+            volume_stats = get_filesystem_volume_stats(MYSQL_BASE_DIR)
+        except OSError as e:
+            LOG.error(_("Could not read the volume usage of %s: %s")
+                      % (MYSQL_BASE_DIR, e))
+            volume_stats = None
+        MySqlAppStatus.get().update(volume_stats)
 
 
 class KeepAliveConnection(interfaces.PoolListener):
@@ -28,6 +28,14 @@ LOG = logging.getLogger(__name__)
 AGENT_HEARTBEAT = int(config.Config.get('agent_heartbeat_time', '10'))
 
 
+def _reload_heartbeat():
+    global AGENT_HEARTBEAT
+    AGENT_HEARTBEAT = int(config.Config.get('agent_heartbeat_time', '10'))
+
+
+config.Config.add_reload_hook(_reload_heartbeat)
+
+
 def persisted_models():
     return {'agent_heartbeats': AgentHeartBeat}
 
@@ -18,11 +18,15 @@
 """Model classes that form the core of instances functionality."""
 
 import eventlet
+import json
 import logging
 import netaddr
+import time
 
 from datetime import datetime
+from datetime import timedelta
 from novaclient import exceptions as nova_exceptions
+from reddwarf import db
 from reddwarf.common import config
 from reddwarf.common import exception
 from reddwarf.common import utils
@@ -30,7 +34,10 @@ from reddwarf.common.remote import create_dns_client
 from reddwarf.common.remote import create_guest_client
 from reddwarf.common.remote import create_nova_client
 from reddwarf.common.remote import create_nova_volume_client
+from reddwarf.db import conditions as db_conditions
 from reddwarf.db import models as dbmodels
+from reddwarf.flavor.models import FLAVOR_CATALOG
+from reddwarf.quota import models as quota_models
 from reddwarf.instance.tasks import InstanceTask
 from reddwarf.instance.tasks import InstanceTasks
 from reddwarf.guestagent import models as agent_models
@@ -38,6 +45,7 @@ from reddwarf.taskmanager import api as task_api
 
 
 from eventlet import greenthread
+from eventlet import semaphore
 
 
 CONFIG = config.Config
@@ -70,20 +78,31 @@ class InstanceStatus(object):
     ERROR = "ERROR"
 
 
+def use_nova_notifications():
+    """True if server info is kept current in our database by notifications.
+
+    When set, the taskmanager consumes Nova's compute notifications and
+    records each server's status, addresses and host on the instance row, so
+    the API can read them from there instead of calling Nova.
+
+    """
+    return CONFIG.get_bool('use_nova_notifications', default=False)
+
+
 def load_simple_instance_server_status(context, db_info):
     """Loads a server or raises an exception."""
     if 'BUILDING' == db_info.task_status.action:
-        db_info.server_status = "BUILD"
-        db_info.addresses = {}
+        db_info.show_server("BUILD", {})
+    elif use_nova_notifications() and db_info.server_status is not None:
+        db_info.show_server(db_info.server_status,
+                            db_info.get_server_addresses())
     else:
         client = create_nova_client(context)
         try:
             server = client.servers.get(db_info.compute_instance_id)
-            db_info.server_status = server.status
-            db_info.addresses = server.addresses
+            db_info.show_server(server.status, server.addresses)
         except nova_exceptions.NotFound, e:
-            db_info.server_status = "SHUTDOWN"
-            db_info.addresses = {}
+            db_info.show_server("SHUTDOWN", {})
 
 
 # If the compute server is in any of these states we can't perform any
@@ -96,6 +115,52 @@ VALID_ACTION_STATUSES = ["ACTIVE"]
 # Invalid states to contact the agent
 AGENT_INVALID_STATUSES = ["BUILD", "REBOOT", "RESIZE"]
 
+# Waiting for an instance to reach a status ends early in these.
+WAIT_FOR_STOP_STATUSES = ["ERROR", "FAILED"]
+
+
+def get_instance_status(id, task_status, server_status, service_status):
+    """Returns the status the API reports for an instance."""
+    ### Check for taskmanager errors.
+    if task_status.is_error:
+        return InstanceStatus.ERROR
+
+    ### Check for taskmanager status.
+    ACTION = task_status.action
+    if 'BUILDING' == ACTION:
+        if 'ERROR' == server_status:
+            return InstanceStatus.ERROR
+        return InstanceStatus.BUILD
+    if 'REBOOTING' == ACTION:
+        return InstanceStatus.REBOOT
+    if 'RESIZING' == ACTION:
+        return InstanceStatus.RESIZE
+
+    ### Check for server status.
+    if server_status in ["BUILD", "ERROR", "REBOOT", "RESIZE"]:
+        return server_status
+
+    ### Report as Shutdown while deleting, unless there's an error.
+    if 'DELETING' == ACTION:
+        if server_status in ["ACTIVE", "SHUTDOWN"]:
+            return InstanceStatus.SHUTDOWN
+        else:
+            msg = _("While shutting down instance (%s): server had "
+                    "status (%s).")
+            LOG.error(msg % (id, server_status))
+            return InstanceStatus.ERROR
+
+    ### Check against the service status.
+    # The service is only paused during a reboot.
+    if ServiceStatuses.PAUSED == service_status:
+        return InstanceStatus.REBOOT
+    # If the service status is NEW, then we are building.
+    if ServiceStatuses.NEW == service_status:
+        return InstanceStatus.BUILD
+
+    # For everything else we can look at the service status mapping.
+    return service_status.api_status
+
 
 class SimpleInstance(object):
     """A simple view of an instance.
@@ -154,48 +219,17 @@ class SimpleInstance(object):
         return self.db_info.compute_instance_id
 
     @property
-    def status(self):
-        ### Check for taskmanager errors.
-        if self.db_info.task_status.is_error:
-            return InstanceStatus.ERROR
-
-        ### Check for taskmanager status.
-        ACTION = self.db_info.task_status.action
-        if 'BUILDING' == ACTION:
-            if 'ERROR' == self.db_info.server_status:
-                return InstanceStatus.ERROR
-            return InstanceStatus.BUILD
-        if 'REBOOTING' == ACTION:
-            return InstanceStatus.REBOOT
-        if 'RESIZING' == ACTION:
-            return InstanceStatus.RESIZE
-
-        ### Check for server status.
-        if self.db_info.server_status in ["BUILD", "ERROR", "REBOOT",
-                                          "RESIZE"]:
-            return self.db_info.server_status
-
-        ### Report as Shutdown while deleting, unless there's an error.
-        if 'DELETING' == ACTION:
-            if self.db_info.server_status in ["ACTIVE", "SHUTDOWN"]:
-                return InstanceStatus.SHUTDOWN
-            else:
-                msg = _("While shutting down instance (%s): server had "
-                        "status (%s).")
-                LOG.error(msg % (self.id, self.db_info.server_status))
-                return InstanceStatus.ERROR
-
-        ### Check against the service status.
-        # The service is only paused during a reboot.
-        if ServiceStatuses.PAUSED == self.service_status.status:
-            return InstanceStatus.REBOOT
-        # If the service status is NEW, then we are building.
-        if ServiceStatuses.NEW == self.service_status.status:
-            return InstanceStatus.BUILD
-
-        # For everything else we can look at the service status mapping.
+    def service_api_status(self):
+        if self.service_status is None or self.service_status.status is None:
+            return None
         return self.service_status.status.api_status
 
+    @property
+    def status(self):
+        return get_instance_status(self.id, self.db_info.task_status,
+                                   self.db_info.shown_server_status,
+                                   self.service_status.status)
+
     @property
     def updated(self):
         return self.db_info.updated
@@ -208,6 +242,12 @@ class SimpleInstance(object):
     def volume_size(self):
         return self.db_info.volume_size
 
+    @property
+    def volume_used(self):
+        if self.service_status is None:
+            return None
+        return self.service_status.get_volume_used()
+
 
 class DetailInstance(SimpleInstance):
     """A detailed view of an Instnace.
@@ -222,7 +262,9 @@ class DetailInstance(SimpleInstance):
 
     @property
     def volume_used(self):
-        return self._volume_used
+        if self._volume_used is not None:
+            return self._volume_used
+        return super(DetailInstance, self).volume_used
 
     @volume_used.setter
     def volume_used(self, value):
@@ -260,9 +302,8 @@ def load_any_instance(context, id):
 def load_instance(cls, context, id, needs_server=False):
     db_info = get_db_info(context, id)
     if not needs_server:
-        # TODO(tim.simpson): When we have notifications this won't be
-        # necessary and instead we'll just use the server_status field from
-        # the instance table.
+        # Uses the server_status field from the instance table when Nova
+        # notifications are enabled.
         load_simple_instance_server_status(context, db_info)
         server = None
     else:
@@ -270,8 +311,7 @@ def load_instance(cls, context, id, needs_server=False):
             server = load_server(context, db_info.id,
                                  db_info.compute_instance_id)
             #TODO(tim.simpson): Remove this hack when we have notifications!
-            db_info.server_status = server.status
-            db_info.addresses = server.addresses
+            db_info.show_server(server.status, server.addresses)
         except exception.ComputeInstanceNotFound:
             LOG.error("COMPUTE ID = %s" % db_info.compute_instance_id)
             raise exception.UnprocessableEntity("Instance %s is not ready." %
@@ -282,21 +322,237 @@ def load_instance(cls, context, id, needs_server=False):
     return cls(context, db_info, server, service_status)
 
 
-def load_instance_with_guest(cls, context, id):
+def volume_usage_max_age():
+    """Seconds a guest's sample of its volume usage can be used for."""
+    return CONFIG.get_int('volume_usage_max_age', default=180)
+
+
+def recent_volume_used(used, updated_at):
+    """Returns the bytes used from a volume usage sample, if it's recent."""
+    if updated_at is None:
+        return None
+    max_age = timedelta(seconds=volume_usage_max_age())
+    if utils.utcnow() - updated_at > max_age:
+        return None
+    return used
+
+
+def volume_gb(bytes):
+    """Returns bytes of a volume in GB, to the two places the API shows."""
+    return round(bytes / 1024.0 ** 3, 2)
+
+
+def volume_used_timeout():
+    """Seconds an instance show may wait for the guest's volume stats."""
+    return CONFIG.get_float('volume_used_timeout', default=2.0)
+
+
+def load_volume_used(context, id):
+    """Asks the guest how much of its volume is used, or returns None."""
+    guest = create_guest_client(context, id)
+    try:
+        return guest.get_volume_info()['used']
+    except Exception as e:
+        LOG.error(e)
+        return None
+
+
+# The fields of the instance views which come from the instance's server in
+# Nova, and those which come from asking the guest.
+SERVER_FIELDS = frozenset(['status', 'ip'])
+GUEST_FIELDS = frozenset(['volume'])
+
+
+def needs_fields(fields, needed):
+    """False if only some fields are to be shown, and none of needed."""
+    return fields is None or not fields.isdisjoint(needed)
+
+
+def load_instance_with_guest(cls, context, id, fields=None):
     db_info = get_db_info(context, id)
-    load_simple_instance_server_status(context, db_info)
+    # Nova is called on a green thread while this one reads the service
+    # status. Whether the guest can answer depends on the statuses, so it's
+    # only asked once they're known, and only for as long as the volume
+    # used timeout. Neither is called if fields are given and none of them
+    # need it.
+    server_thread = None
+    if needs_fields(fields, SERVER_FIELDS):
+        server_thread = greenthread.spawn(load_simple_instance_server_status,
+                                          context, db_info)
     service_status = InstanceServiceStatus.find_by(instance_id=id)
     LOG.info("service status=%s" % service_status)
+    if server_thread is not None:
+        server_thread.wait()
     instance = cls(context, db_info, service_status)
-    if instance.status not in AGENT_INVALID_STATUSES:
-        guest = create_guest_client(context, id)
+    # Guests push samples of their volume usage to the service status, so
+    # only ask the guest if there's no recent one.
+    if (needs_fields(fields, GUEST_FIELDS) and
+            'BUILDING' != db_info.task_status.action and
+            service_status.get_volume_used() is None and
+            instance.status not in AGENT_INVALID_STATUSES):
+        guest_thread = greenthread.spawn(load_volume_used, context, id)
+        timeout = eventlet.Timeout(volume_used_timeout())
         try:
-            instance.volume_used = guest.get_volume_info()['used']
-        except Exception as e:
-            LOG.error(e)
+            instance.volume_used = guest_thread.wait()
+        except eventlet.Timeout as t:
+            if t is not timeout:
+                raise
+            # The call is left to finish on its own, since killing it could
+            # leave its rpc connection in a bad state.
+            LOG.warn(_("Leaving out the volume used by instance %s since the "
+                       "guest did not answer in time.") % id)
+        finally:
+            timeout.cancel()
+    return instance
+
+
+def instance_batch_max():
+    """Most instances one request may show by id."""
+    return CONFIG.get_int('instance_batch_max', default=200)
+
+
+def load_instances_with_guest(cls, context, ids, fields=None):
+    """Loads many instances at once, as load_instance_with_guest loads one.
+
+    The instance rows and service statuses are each read with one query and
+    the servers are got from Nova concurrently. Rather than failing the lot,
+    an instance which can't be loaded gets an error instead. The guests are
+    never asked for their volume usage, so it is only shown for instances
+    with a recent sample of it. Returns dicts of the instances and of the
+    errors, both by id.
+
+    """
+    if context is None:
+        raise TypeError("Argument context not defined.")
+    db_infos = {}
+    for db_info in DBInstance.find_all_in('id', ids, deleted=False):
+        if context.is_admin or db_info.tenant_id == context.tenant:
+            db_infos[db_info.id] = db_info
+        else:
+            LOG.error("Tenant %s tried to access instance %s, owned by %s."
+                      % (context.tenant, db_info.id, db_info.tenant_id))
+    statuses = dict((status.instance_id, status) for status in
+                    InstanceServiceStatus.find_all_in('instance_id',
+                                                      db_infos.keys()))
+    # Only what load_simple_instance_server_status would ask Nova for is
+    # got, and nothing if none of the fields need it.
+    from_nova = []
+    for db_info in db_infos.values():
+        if 'BUILDING' == db_info.task_status.action:
+            db_info.show_server("BUILD", {})
+        elif use_nova_notifications() and db_info.server_status is not None:
+            db_info.show_server(db_info.server_status,
+                                db_info.get_server_addresses())
+        elif needs_fields(fields, SERVER_FIELDS):
+            from_nova.append(db_info)
+    servers = get_servers(context, [db_info.compute_instance_id
+                                    for db_info in from_nova])
+    instances = {}
+    errors = {}
+    for db_info in from_nova:
+        server = servers.get(db_info.compute_instance_id)
+        if isinstance(server, Exception):
+            errors[db_info.id] = exception.ReddwarfError(str(server))
+        elif server is None:
+            db_info.show_server("SHUTDOWN", {})
+        else:
+            db_info.show_server(server.status, server.addresses)
+    for id in ids:
+        if id in errors:
+            continue
+        if id not in db_infos:
+            errors[id] = exception.NotFound(uuid=id)
+        elif id not in statuses:
+            LOG.error(_("Could not find the service status for instance "
+                        "%s.") % id)
+            errors[id] = exception.NotFound(uuid=id)
+        else:
+            instances[id] = cls(context, db_infos[id], statuses[id])
+    return instances, errors
+
+
+def instance_wait_max_timeout():
+    """Most seconds a request may block waiting for instances to change."""
+    return CONFIG.get_int('instance_wait_max_timeout', default=60)
+
+
+def instance_event_poll_interval():
+    """Seconds before a waiting request first checks the event log again."""
+    return CONFIG.get_float('instance_event_poll_interval', default=1.0)
+
+
+def instance_event_max_poll_interval():
+    """Most seconds between checks of the event log, once backed off."""
+    return CONFIG.get_float('instance_event_max_poll_interval', default=8.0)
+
+
+def instance_event_max_age():
+    """Seconds events are kept in the log before they're pruned."""
+    return CONFIG.get_int('instance_event_max_age', default=86400)
+
+
+def wait_for_instance_status(cls, context, id, status, timeout,
+                             fields=None):
+    """Loads an instance once it has the status or the timeout passes.
+
+    Rather than loading the instance over and over, this waits on the event
+    log for the next transition of the instance and only loads it again once
+    there is one. It also stops waiting if the instance goes into an error.
+    Given fields, only what those need is loaded, along with the status.
+
+    """
+    if fields is not None:
+        fields = fields | frozenset(['status'])
+    deadline = time.time() + timeout
+    cursor = InstanceEvent.latest_cursor(instance_id=id)
+    instance = load_instance_with_guest(cls, context, id, fields=fields)
+    while (instance.status != status and
+           instance.status not in WAIT_FOR_STOP_STATUSES):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        events = InstanceEvent.wait_for_events(cursor, remaining,
+                                               instance_id=id)
+        if not events:
+            break
+        cursor = events[-1].id
+        # The instance changed elsewhere, so don't reuse what was loaded.
+        db.db_api.expire_all()
+        instance = load_instance_with_guest(cls, context, id, fields=fields)
     return instance
 
 
+def load_instance_changes(context, cursor, timeout, limit):
+    """Returns the tenant's events after the cursor and the next cursor.
+
+    Waits up to timeout seconds for one if there are none yet. Without a
+    cursor nothing is returned, only the cursor to start from.
+
+    """
+    if cursor is None:
+        return [], InstanceEvent.latest_cursor(tenant_id=context.tenant)
+    events = InstanceEvent.wait_for_events(cursor, timeout, limit=limit,
+                                           tenant_id=context.tenant)
+    if events:
+        cursor = events[-1].id
+    return events, cursor
+
+
+def load_tenant_usage(tenant_id):
+    """Returns a function counting what the tenant uses of a resource."""
+
+    def count_usage(resource):
+        if resource == 'instances':
+            return DBInstance.find_all(tenant_id=tenant_id,
+                                       deleted=False).count()
+        if resource == 'volumes_gb':
+            return DBInstance.find_sum('volume_size', tenant_id=tenant_id,
+                                       deleted=False) or 0
+        return 0
+
+    return count_usage
+
+
 class BaseInstance(SimpleInstance):
     """Represents an instance."""
 
@@ -311,7 +567,7 @@ class BaseInstance(SimpleInstance):
         return create_guest_client(self.context, self.db_info.id)
 
     def delete(self):
-        if (self.db_info.server_status in ["BUILD"] and
+        if (self.db_info.shown_server_status in ["BUILD"] and
                 not self.db_info.task_status.is_error):
             raise exception.UnprocessableEntity("Instance %s is not ready." %
                                                 self.id)
@@ -336,6 +592,9 @@ class BaseInstance(SimpleInstance):
         time_now = datetime.now()
         self.update_db(deleted=True, deleted_at=time_now,
                        task_status=InstanceTasks.NONE)
+        quota_models.release(self.db_info.tenant_id,
+                             {'instances': 1,
+                              'volumes_gb': self.db_info.volume_size or 0})
 
     @property
     def guest(self):
@@ -350,10 +609,34 @@ class BaseInstance(SimpleInstance):
         return self._nova_client
 
     def update_db(self, **values):
-        self.db_info = DBInstance.find_by(id=self.id, deleted=False)
-        for key in values:
-            setattr(self.db_info, key, values[key])
-        self.db_info.save()
+        """Writes values to the instance's row with a single UPDATE.
+
+        The UPDATE only applies to the version of the row last seen here. If
+        it has been saved since, the row is read again and the update
+        retried as long as none of these values changed in between;
+        otherwise ModelVersionConflict is raised rather than overwriting
+        the other write.
+
+        """
+        try:
+            self.db_info.update_versioned(**values)
+        except exception.ModelVersionConflict:
+            seen = dict((key, getattr(self.db_info, key)) for key in values)
+            # In a unit of work find_by would hand back this same stale
+            # model, so query for the row, which reloads it.
+            found = DBInstance.find_all(id=self.id, deleted=False).all()
+            if not found:
+                raise exception.ModelNotFoundError(_("DBInstance Not Found"))
+            current = found[0]
+            changed = [key for key in values
+                       if getattr(current, key) != seen[key]]
+            if changed:
+                LOG.warn(_("Not updating %s of instance %s, which changed "
+                           "elsewhere.") % (", ".join(changed), self.id))
+                raise
+            self.db_info = current
+            self.db_info.update_versioned(**values)
+        InstanceEvent.record_changes(self.db_info, values)
 
     @property
     def volume_client(self):
@@ -390,16 +673,26 @@ class Instance(BuiltInstance):
     @classmethod
     def create(cls, context, name, flavor_id, image_id,
                databases, users, service_type, volume_size):
-        client = create_nova_client(context)
         try:
-            flavor = client.flavors.get(flavor_id)
-        except nova_exceptions.NotFound:
+            flavor = FLAVOR_CATALOG.get(context, flavor_id)
+        except exception.NotFound:
             raise exception.FlavorNotFound(uuid=flavor_id)
 
-        db_info = DBInstance.create(name=name, flavor_id=flavor_id,
-                                    tenant_id=context.tenant,
-                                    volume_size=volume_size,
-                                    task_status=InstanceTasks.BUILDING)
+        reservation = quota_models.reserve(context.tenant,
+                                           {'instances': 1,
+                                            'volumes_gb': volume_size or 0},
+                                           load_tenant_usage(context.tenant))
+        try:
+            # The instance only counts as used if it's created.
+            with db.db_api.transaction():
+                db_info = DBInstance.create(
+                    name=name, flavor_id=flavor_id, tenant_id=context.tenant,
+                    volume_size=volume_size,
+                    task_status=InstanceTasks.BUILDING)
+                reservation.commit()
+        except Exception:
+            reservation.rollback()
+            raise
         LOG.debug(_("Tenant %s created new Reddwarf instance %s...")
                   % (context.tenant, db_info.id))
 
@@ -407,8 +700,7 @@ class Instance(BuiltInstance):
             instance_id=db_info.id,
             status=ServiceStatuses.NEW)
 
-        dns_support = config.Config.get("reddwarf_dns_support", 'False')
-        if utils.bool_from_string(dns_support):
+        if CONFIG.get_bool("reddwarf_dns_support", default=False):
             dns_client = create_dns_client(context)
             hostname = dns_client.determine_hostname(db_info.id)
             db_info.hostname = hostname
@@ -427,12 +719,11 @@ class Instance(BuiltInstance):
                   % (self.id, new_flavor_id))
         # Validate that the flavor can be found and that it isn't the same size
         # as the current one.
-        client = create_nova_client(self.context)
         try:
-            new_flavor = client.flavors.get(new_flavor_id)
-        except nova_exceptions.NotFound:
+            new_flavor = FLAVOR_CATALOG.get(self.context, new_flavor_id)
+        except exception.NotFound:
             raise exception.FlavorNotFound(uuid=new_flavor_id)
-        old_flavor = client.flavors.get(self.flavor_id)
+        old_flavor = FLAVOR_CATALOG.get(self.context, self.flavor_id)
         new_flavor_size = new_flavor.ram
         old_flavor_size = old_flavor.ram
         if new_flavor_size == old_flavor_size:
@@ -455,9 +746,19 @@ class Instance(BuiltInstance):
             msg = ("The new volume 'size' must be larger than the current "
                    "volume size of '%s'")
             raise exception.BadRequest(msg % old_size)
-        # Set the task to Resizing before sending off to the taskmanager
-        self.update_db(task_status=InstanceTasks.RESIZING)
-        task_api.API(self.context).resize_volume(new_size, self.id)
+        # The growth is reserved here and the taskmanager uses it once the
+        # volume has grown, or gives it back if it doesn't.
+        reservation = quota_models.reserve(
+            self.tenant_id, {'volumes_gb': int(new_size) - old_size},
+            load_tenant_usage(self.tenant_id))
+        try:
+            # Set the task to Resizing before sending off to the taskmanager
+            self.update_db(task_status=InstanceTasks.RESIZING)
+            task_api.API(self.context).resize_volume(
+                new_size, self.id, reservation_ids=reservation.ids)
+        except Exception:
+            reservation.rollback()
+            raise
 
     def reboot(self):
         self._validate_can_perform_action()
@@ -481,7 +782,7 @@ class Instance(BuiltInstance):
         """
         Raises exception if an instance action cannot currently be performed.
         """
-        if (self.db_info.server_status != "ACTIVE" or
+        if (self.db_info.shown_server_status != "ACTIVE" or
                 self.db_info.task_status != InstanceTasks.NONE or
                 not self.service_status.status.action_is_allowed):
             msg = ("Instance is not currently available for an action to be "
@@ -492,86 +793,430 @@ class Instance(BuiltInstance):
 
 def create_server_list_matcher(server_list):
     # Returns a method which finds a server from the given list.
+    servers_by_id = {}
+    duplicate_ids = set()
+    for server in server_list:
+        if server.id in servers_by_id:
+            duplicate_ids.add(server.id)
+        servers_by_id[server.id] = server
+
     def find_server(instance_id, server_id):
-        matches = [server for server in server_list if server.id == server_id]
-        if len(matches) == 1:
-            return matches[0]
-        elif len(matches) < 1:
+        if server_id in duplicate_ids:
+            # Should never happen, but never say never.
+            LOG.error(_("Server %s for instance %s was found twice!") %
+                      (server_id, instance_id))
+            raise exception.ReddwarfError(uuid=instance_id)
+        try:
+            return servers_by_id[server_id]
+        except KeyError:
             # The instance was not found in the list and
             # this can happen if the instance is deleted from
             # nova but still in reddwarf database
             raise exception.ComputeInstanceNotFound(
                 instance_id=instance_id, server_id=server_id)
-        else:
-            # Should never happen, but never say never.
-            LOG.error(_("Server %s for instance %s was found twice!") %
-                      (server_id, instance_id))
-            raise exception.ReddwarfError(uuid=instance_id)
     return find_server
 
 
+def server_list_strategy():
+    """How Instances.load fetches the servers for a page of instances.
+
+    "list" lists every server the tenant has and picks out the ones on the
+    page, while "get" fetches just the page's servers with concurrent calls,
+    so the cost of a page doesn't grow with the size of the tenant.
+
+    """
+    return CONFIG.get('server_list_strategy', 'list')
+
+
+_SERVER_GET_SEMAPHORE = None
+
+
+def server_get_semaphore():
+    """Limits the server gets in flight at once across every request.
+
+    Each request's gets are already limited by server_get_pool_size, but
+    this keeps many concurrent requests from flooding Nova between them.
+
+    """
+    global _SERVER_GET_SEMAPHORE
+    if _SERVER_GET_SEMAPHORE is None:
+        _SERVER_GET_SEMAPHORE = semaphore.Semaphore(
+            CONFIG.get_int('server_get_concurrency', default=50))
+    return _SERVER_GET_SEMAPHORE
+
+
+def get_servers(context, server_ids):
+    """Gets each of the servers concurrently.
+
+    Returns a dict of each server id's server, None if Nova couldn't find
+    it, or the ClientException Nova raised for it.
+
+    """
+    pool = eventlet.GreenPool(CONFIG.get_int('server_get_pool_size',
+                                             default=10))
+
+    def get_server(server_id):
+        # Each green thread gets its own client since they can't share
+        # the client's connection.
+        client = create_nova_client(context)
+        with server_get_semaphore():
+            try:
+                return server_id, client.servers.get(server_id)
+            except nova_exceptions.NotFound:
+                LOG.debug("Could not find nova server_id(%s)" % server_id)
+                return server_id, None
+            except nova_exceptions.ClientException as e:
+                return server_id, e
+
+    server_ids = set(id for id in server_ids if id is not None)
+    return dict(pool.imap(get_server, server_ids))
+
+
+def load_servers_by_id(context, server_ids):
+    """Gets each of the servers concurrently, leaving out any not found."""
+    servers = []
+    for server in get_servers(context, server_ids).values():
+        if isinstance(server, Exception):
+            raise server
+        if server is not None:
+            servers.append(server)
+    return servers
+
+
+def load_instance_version(context, id):
+    """Returns the version of one of the tenant's instances, or None.
+
+    The version goes up whenever anything shown for the instance changes,
+    which is only true when the server info is kept in the database.
+
+    """
+    if not use_nova_notifications():
+        return None
+    rows = DBInstance.find_all_values(['version'], id=id,
+                                      tenant_id=context.tenant,
+                                      deleted=False)
+    if not rows:
+        return None
+    return rows[0][0]
+
+
+def instances_page_total():
+    """True if instance listings include the number of instances."""
+    return CONFIG.get_bool('instances_page_total', default=False)
+
+
+class InstanceRecord(object):
+    """The fields of an instance the list views show, built from rows.
+
+    Listing thousands of instances as SimpleInstances maps and tracks a
+    DBInstance and an InstanceServiceStatus for each, then works out their
+    fields on every read. This is built from tuples of just the COLUMNS of
+    the instance and the STATUS_COLUMNS of its service status, with the
+    fields worked out once.
+
+    """
+
+    COLUMNS = ('id', 'name', 'flavor_id', 'volume_size',
+               'compute_instance_id', 'task_id', 'server_status')
+    STATUS_COLUMNS = ('instance_id', 'status_id', 'volume_used',
+                      'volume_updated_at')
+
+    __slots__ = ('id', 'name', 'flavor_id', 'volume_size', 'server_id',
+                 'server_status', 'status', 'service_api_status',
+                 'volume_used')
+
+    def __init__(self, row, status_row, service_status, server_status):
+        self.id = row.id
+        self.name = row.name
+        self.flavor_id = row.flavor_id
+        self.volume_size = row.volume_size
+        self.server_id = row.compute_instance_id
+        self.server_status = server_status
+        self.status = get_instance_status(row.id,
+                                          InstanceTask.from_code(row.task_id),
+                                          server_status, service_status)
+        self.service_api_status = service_status.api_status
+        self.volume_used = recent_volume_used(status_row.volume_used,
+                                              status_row.volume_updated_at)
+
+
+class InstanceFilters(object):
+    """Which instances a listing asks for, and in what order.
+
+    They're read from the listing's query params, and each filter becomes a
+    condition of its query so only the instances shown are read. The status
+    filter is on the status listed, which needs the server statuses kept in
+    the database, so it's only taken when Nova notifications are used.
+
+    """
+
+    # Instances can be sorted on these, with the id to break ties. There
+    # are indexes on the tenant, deleted flag, created or name, and id for
+    # the pages to use.
+    SORT_KEYS = ('created', 'updated', 'name', 'flavor_id')
+    SORT_DIRS = ('asc', 'desc')
+    TIME_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+    def __init__(self, params=None):
+        params = params or {}
+        self.conditions = {}
+        if params.get('status'):
+            if not use_nova_notifications():
+                # Nova's statuses are only known once a page is loaded.
+                raise exception.BadRequest(_("Instances can't be filtered "
+                                             "by status."))
+            self.conditions['status'] = self._status_condition(
+                params['status'])
+        if params.get('task_status'):
+            self.conditions['task_id'] = self._task_condition(
+                params['task_status'])
+        if params.get('flavor_id'):
+            self.conditions['flavor_id'] = params['flavor_id']
+        if params.get('name_prefix'):
+            self.conditions['name'] = db_conditions.StartsWith(
+                params['name_prefix'])
+        if params.get('created_since'):
+            self.conditions['created'] = db_conditions.AtLeast(
+                self._parse_time(params['created_since']))
+        sort_key = params.get('sort_key', 'created')
+        if sort_key not in self.SORT_KEYS:
+            raise exception.BadRequest(_("Instances can't be sorted by %s.")
+                                       % sort_key)
+        self.sort_keys = (sort_key, 'id')
+        self.sort_dir = params.get('sort_dir', 'asc').lower()
+        if self.sort_dir not in self.SORT_DIRS:
+            raise exception.BadRequest(_("The sort direction must be asc or "
+                                         "desc."))
+
+    @staticmethod
+    def _status_condition(status):
+        """Matches the rows get_instance_status would give the status.
+
+        Each of its cases becomes a set of conditions on the task, the
+        recorded server status and the service status, checked in the same
+        order by excluding what the cases before it matched.
+
+        """
+        status = status.upper()
+        tasks = {}
+        for code, task in InstanceTask._lookup.items():
+            action = 'ERROR' if task.is_error else task.action
+            tasks.setdefault(action, []).append(code)
+        # Tasks which leave the status to the server and the service.
+        other_tasks = [code for action, codes in tasks.items()
+                       if action not in ('ERROR', 'BUILDING', 'REBOOTING',
+                                         'RESIZING', 'DELETING')
+                       for code in codes]
+
+        def task_is(action):
+            return db_conditions.OneOf(tasks.get(action, []))
+
+        server_statuses = ["BUILD", "ERROR", "REBOOT", "RESIZE"]
+        alternatives = []
+        if InstanceStatus.ERROR == status:
+            alternatives.append({'task_id': task_is('ERROR')})
+            alternatives.append({'task_id': task_is('BUILDING'),
+                                 'server_status': "ERROR"})
+        if InstanceStatus.BUILD == status:
+            alternatives.append({
+                'task_id': task_is('BUILDING'),
+                'server_status': db_conditions.NoneOf(["ERROR"])})
+        if InstanceStatus.REBOOT == status:
+            alternatives.append({'task_id': task_is('REBOOTING')})
+        if InstanceStatus.RESIZE == status:
+            alternatives.append({'task_id': task_is('RESIZING')})
+        if status in server_statuses:
+            alternatives.append({
+                'task_id': db_conditions.OneOf(other_tasks +
+                                               tasks.get('DELETING', [])),
+                'server_status': status})
+        stopped = ["ACTIVE", "SHUTDOWN"]
+        if InstanceStatus.SHUTDOWN == status:
+            alternatives.append({
+                'task_id': task_is('DELETING'),
+                'server_status': db_conditions.OneOf(stopped)})
+        if InstanceStatus.ERROR == status:
+            alternatives.append({
+                'task_id': task_is('DELETING'),
+                'server_status': db_conditions.NoneOf(server_statuses +
+                                                      stopped)})
+        codes = [code for code, service_status
+                 in ServiceStatus._lookup.items()
+                 if status == get_instance_status(None, InstanceTasks.NONE,
+                                                  None, service_status)]
+        if codes:
+            alternatives.append({
+                'task_id': db_conditions.OneOf(other_tasks),
+                'server_status': db_conditions.NoneOf(server_statuses),
+                'id': db_conditions.InSelect(
+                    InstanceServiceStatus, 'instance_id',
+                    status_id=db_conditions.OneOf(codes))})
+        if not alternatives:
+            raise exception.BadRequest(_("Invalid status: %s") % status)
+        return db_conditions.Either(*alternatives)
+
+    @staticmethod
+    def _task_condition(task_status):
+        codes = [code for code, task in InstanceTask._lookup.items()
+                 if task.action == task_status.upper()]
+        if not codes:
+            raise exception.BadRequest(_("Invalid task status: %s")
+                                       % task_status)
+        return db_conditions.OneOf(codes)
+
+    def _parse_time(self, value):
+        for time_format in self.TIME_FORMATS:
+            try:
+                return datetime.strptime(value.rstrip('Z'), time_format)
+            except ValueError:
+                pass
+        raise exception.BadRequest(_("Invalid time: %s") % value)
+
+
 class Instances(object):
 
     DEFAULT_LIMIT = int(config.Config.get('instances_page_size', '20'))
 
     @staticmethod
-    def load(context):
+    def _limit(context):
+        limit = int(context.limit or Instances.DEFAULT_LIMIT)
+        if limit > Instances.DEFAULT_LIMIT:
+            limit = Instances.DEFAULT_LIMIT
+        return limit
+
+    @staticmethod
+    def load_version(context, filters=None):
+        """Returns a version for the page Instances.load would return.
 
-        def load_simple_instance(context, db, status):
-            return SimpleInstance(context, db, status)
+        It's made from the ids and versions of the instances on the page
+        and the markers of the pages around it, so it changes when any of
+        them change or when instances are added or deleted. As with single
+        instances it's None unless the server info is in the database.
+
+        """
+        if not use_nova_notifications():
+            return None
+        page = Instances._find_page(context, columns=['id', 'version'],
+                                    filters=filters)
+        versions = ",".join("%s:%s" % (row.id, row.version) for row in page)
+        return "%s;%s;%s;%s" % (versions, page.next_marker,
+                                page.previous_marker, page.total)
+
+    @staticmethod
+    def _find_page(context, columns=None, filters=None):
+        filters = filters or InstanceFilters()
+        db_infos = DBInstance.find_all(tenant_id=context.tenant, deleted=False,
+                                       **filters.conditions)
+        return db_infos.paginate(limit=Instances._limit(context),
+                                 marker=context.marker,
+                                 sort_keys=filters.sort_keys,
+                                 sort_dir=filters.sort_dir,
+                                 with_count=instances_page_total(),
+                                 columns=columns)
+
+    @staticmethod
+    def load(context, fields=None, filters=None):
+        instances, page = Instances.load_page(context, fields=fields,
+                                              filters=filters)
+        return instances, page.next_marker
+
+    @staticmethod
+    def load_page(context, fields=None, filters=None):
+        """Returns a page of the tenant's instances as InstanceRecords.
+
+        The db Page they're from comes back with them. If fields are given,
+        Nova is only asked for the servers if they're needed for them. Given
+        InstanceFilters, only the instances they match are listed, in their
+        order.
+
+        """
 
         if context is None:
             raise TypeError("Argument context not defined.")
-        client = create_nova_client(context)
-        servers = client.servers.list()
+        page = Instances._find_page(context, columns=InstanceRecord.COLUMNS,
+                                    filters=filters)
+
+        if use_nova_notifications():
+            # The server status is already on each row.
+            find_server = None
+        elif not needs_fields(fields, SERVER_FIELDS):
+            # The row's server status is only used for fields not shown.
+            find_server = None
+        elif server_list_strategy() == 'get':
+            server_ids = [db.compute_instance_id for db in page.items]
+            servers = load_servers_by_id(context, server_ids)
+            find_server = create_server_list_matcher(servers)
+        else:
+            client = create_nova_client(context)
+            servers = client.servers.list()
+            find_server = create_server_list_matcher(servers)
 
-        db_infos = DBInstance.find_all(tenant_id=context.tenant, deleted=False)
-        limit = int(context.limit or Instances.DEFAULT_LIMIT)
-        if limit > Instances.DEFAULT_LIMIT:
-            limit = Instances.DEFAULT_LIMIT
-        data_view = DBInstance.find_by_pagination('instances', db_infos, "foo",
-                                                  limit=limit,
-                                                  marker=context.marker)
-        next_marker = data_view.next_page_marker
-
-        find_server = create_server_list_matcher(servers)
-        for db in db_infos:
-            LOG.debug("checking for db [id=%s, compute_instance_id=%s]" %
-                      (db.id, db.compute_instance_id))
-        ret = Instances._load_servers_status(load_simple_instance, context,
-                                             data_view.collection,
-                                             find_server)
-        return ret, next_marker
+        ret = Instances._load_records(InstanceRecord, page.items, find_server)
+        return ret, page
+
+    @staticmethod
+    def _load_records(record_cls, rows, find_server):
+        """Builds a record_cls from each row and its service status.
+
+        This is _load_servers_status for rows with record_cls's COLUMNS.
+
+        """
+        statuses = InstanceServiceStatus.find_all_in(
+            'instance_id', [row.id for row in rows],
+            columns=record_cls.STATUS_COLUMNS)
+        statuses_by_instance = dict((status.instance_id, status)
+                                    for status in statuses)
+        records = []
+        for row in rows:
+            status = statuses_by_instance.get(row.id)
+            if status is None:
+                LOG.error(_("Server status could not be read for "
+                            "instance id(%s)") % (row.id))
+                continue
+            service_status = ServiceStatus.from_code(status.status_id)
+            server_status = row.server_status
+            if InstanceTasks.BUILDING.code == row.task_id:
+                server_status = "BUILD"
+            elif find_server is not None:
+                try:
+                    server = find_server(row.id, row.compute_instance_id)
+                    server_status = server.status
+                except exception.ComputeInstanceNotFound:
+                    server_status = "SHUTDOWN"
+            records.append(record_cls(row, status, service_status,
+                                      server_status))
+        return records
 
     @staticmethod
     def _load_servers_status(load_instance, context, db_items, find_server):
         ret = []
+        # The items may be a query, so only iterate them once.
+        db_items = list(db_items)
+        statuses = InstanceServiceStatus.find_all_in(
+            'instance_id', [db.id for db in db_items])
+        statuses_by_instance = dict((status.instance_id, status)
+                                    for status in statuses)
         for db in db_items:
             server = None
-            try:
-                #TODO(tim.simpson): Delete when we get notifications working!
-                if InstanceTasks.BUILDING == db.task_status:
-                    db.server_status = "BUILD"
-                else:
-                    try:
-                        server = find_server(db.id, db.compute_instance_id)
-                        db.server_status = server.status
-                    except exception.ComputeInstanceNotFound:
-                        db.server_status = "SHUTDOWN"  # Fake it...
-                #TODO(tim.simpson): End of hack.
-
-                #volumes = find_volumes(server.id)
-                status = InstanceServiceStatus.find_by(instance_id=db.id)
-                LOG.info(_("Server api_status(%s)") %
-                         (status.status.api_status))
-                if not status.status:  # This should never happen.
-                    LOG.error(_("Server status could not be read for "
-                                "instance id(%s)") % (db.id))
-                    continue
-            except exception.ModelNotFoundError:
+            #TODO(tim.simpson): Delete when we get notifications working!
+            if InstanceTasks.BUILDING == db.task_status:
+                db.show_server("BUILD")
+            elif find_server is not None:
+                try:
+                    server = find_server(db.id, db.compute_instance_id)
+                    db.show_server(server.status)
+                except exception.ComputeInstanceNotFound:
+                    db.show_server("SHUTDOWN")  # Fake it...
+            #TODO(tim.simpson): End of hack.
+
+            #volumes = find_volumes(server.id)
+            status = statuses_by_instance.get(db.id)
+            if status is None or not status.status:
                 LOG.error(_("Server status could not be read for "
                             "instance id(%s)") % (db.id))
                 continue
+            LOG.info(_("Server api_status(%s)") %
+                     (status.status.api_status))
             ret.append(load_instance(context, db, status))
         return ret
 
@@ -581,6 +1226,8 @@ class DBInstance(dbmodels.DatabaseModelBase):
 
     #TODO(tim.simpson): Add start time.
 
+    _versioned = True
+
     _data_fields = ['name', 'created', 'compute_instance_id',
                     'task_id', 'task_description', 'task_start_time',
                     'volume_id', 'deleted', 'tenant_id']
@@ -592,12 +1239,49 @@ class DBInstance(dbmodels.DatabaseModelBase):
         super(DBInstance, self).__init__(**kwargs)
         self.set_task_status(task_status)
 
+    @classmethod
+    def _process_values(cls, raw_values):
+        values = dict(raw_values)
+        task_status = values.pop('task_status', None)
+        if task_status is not None:
+            values['task_id'] = task_status.code
+            values['task_description'] = task_status.db_text
+        return values
+
     def _validate(self, errors):
         if InstanceTask.from_code(self.task_id) is None:
             errors['task_id'] = "Not valid."
         if self.task_status is None:
             errors['task_status'] = "Cannot be none."
 
+    def get_server_addresses(self):
+        """Returns the addresses last recorded from a Nova notification."""
+        if not self.server_addresses:
+            return {}
+        return json.loads(self.server_addresses)
+
+    def set_server_addresses(self, addresses):
+        self.server_addresses = json.dumps(addresses)
+
+    def show_server(self, status, addresses=None):
+        """Sets the server status, and addresses, shown for this instance.
+
+        They're kept off the mapped columns, so saving this row, or anything
+        else in its unit of work, doesn't write them to the database.
+
+        """
+        self._shown_server_status = status
+        if addresses is not None:
+            self.addresses = addresses
+
+    @property
+    def shown_server_status(self):
+        """The status given to show_server, or else the recorded one."""
+        shown = getattr(self, '_shown_server_status', None)
+        if shown is None:
+            return self.server_status
+        return shown
+
     def get_task_status(self):
         return InstanceTask.from_code(self.task_id)
 
@@ -608,11 +1292,50 @@ class DBInstance(dbmodels.DatabaseModelBase):
     task_status = property(get_task_status, set_task_status)
 
 
+def service_image_cache_ttl():
+    """Seconds a service's image id is reused for before it's looked up."""
+    return CONFIG.get_int('service_image_cache_ttl', default=300)
+
+
 class ServiceImage(dbmodels.DatabaseModelBase):
     """Defines the status of the service being run."""
 
     _data_fields = ['service_name', 'image_id']
 
+    # Maps service names to (image id, time looked up).
+    _image_ids = {}
+
+    @classmethod
+    def find_image_id(cls, service_name):
+        """Returns the image id for a service, usually from memory.
+
+        Changes made with reddwarf-manage image_update are seen once the
+        cached id is older than the ttl, or right away after a SIGHUP.
+
+        """
+        cached = cls._image_ids.get(service_name)
+        if cached is not None:
+            image_id, looked_up_at = cached
+            if time.time() - looked_up_at < service_image_cache_ttl():
+                return image_id
+        image_id = cls.find_by(service_name=service_name).image_id
+        cls._image_ids[service_name] = (image_id, time.time())
+        return image_id
+
+    @classmethod
+    def clear_cache(cls):
+        cls._image_ids.clear()
+
+
+CONFIG.add_reload_hook(ServiceImage.clear_cache)
+
+
+def _reload_page_size():
+    Instances.DEFAULT_LIMIT = int(CONFIG.get('instances_page_size', '20'))
+
+
+CONFIG.add_reload_hook(_reload_page_size)
+
 
 class InstanceServiceStatus(dbmodels.DatabaseModelBase):
 
@@ -623,6 +1346,7 @@ class InstanceServiceStatus(dbmodels.DatabaseModelBase):
         kwargs["status_description"] = status.description
         super(InstanceServiceStatus, self).__init__(**kwargs)
         self.set_status(status)
+        self._shown_changed = True
 
     def _validate(self, errors):
         if self.status is None:
@@ -634,15 +1358,125 @@ class InstanceServiceStatus(dbmodels.DatabaseModelBase):
         return ServiceStatus.from_code(self.status_id)
 
     def set_status(self, value):
+        if self.status_id != value.code:
+            self._status_changed = True
+            self._shown_changed = True
         self.status_id = value.code
         self.status_description = value.description
 
     status = property(get_status, set_status)
 
+    def save(self):
+        status = super(InstanceServiceStatus, self).save()
+        # The instance's version covers what's shown of its service status
+        # too. The guest saves on each heartbeat, so it's left alone unless
+        # that changed.
+        if getattr(self, '_shown_changed', False):
+            self._shown_changed = False
+            DBInstance.increment_version(id=self.instance_id)
+        if getattr(self, '_status_changed', False):
+            self._status_changed = False
+            db_info = DBInstance.get_by(id=self.instance_id)
+            if db_info is not None:
+                InstanceEvent.record(db_info, 'service_status',
+                                     self.status_description)
+        return status
+
+    def set_volume_usage(self, used, total):
+        """Records a sample of the bytes used and total on the volume."""
+        shown = self.get_volume_used()
+        if shown is None or volume_gb(shown) != volume_gb(used):
+            self._shown_changed = True
+        self.volume_used = used
+        self.volume_total = total
+        self.volume_updated_at = utils.utcnow()
+
+    def get_volume_used(self):
+        """Returns the bytes used from the last sample, if it's recent."""
+        return recent_volume_used(self.volume_used, self.volume_updated_at)
+
+
+class InstanceEvent(dbmodels.DatabaseModelBase):
+    """A status transition of an instance, kept in a per-tenant log.
+
+    The id goes up with each event, so it doubles as the cursor clients use
+    to ask for the events after the ones they've seen. Waiting for events
+    polls the log with a cheap indexed query rather than loading instances,
+    and works whichever process recorded the transition.
+
+    """
+
+    _data_fields = ['tenant_id', 'instance_id', 'event_type', 'value',
+                    'created']
+
+    @classmethod
+    def _values_for_create(cls, values):
+        # The database generates the id.
+        values['created'] = utils.utcnow()
+        return values
+
+    @classmethod
+    def record(cls, db_info, event_type, value=None):
+        return cls.create(tenant_id=db_info.tenant_id,
+                          instance_id=db_info.id, event_type=event_type,
+                          value=value)
+
+    @classmethod
+    def record_changes(cls, db_info, values):
+        """Records the transitions among values saved to an instance."""
+        changes = []
+        if 'task_status' in values:
+            changes.append(('task_status', values['task_status'].action))
+        if 'server_status' in values:
+            changes.append(('server_status', values['server_status']))
+        if values.get('deleted'):
+            changes.append(('deleted', None))
+        cls.create_many([dict(tenant_id=db_info.tenant_id,
+                              instance_id=db_info.id, event_type=event_type,
+                              value=value)
+                         for event_type, value in changes])
+
+    @classmethod
+    def latest_cursor(cls, **conditions):
+        return cls.find_max('id', **conditions) or 0
+
+    @classmethod
+    def find_since(cls, cursor, limit=100, **conditions):
+        return cls.find_all(**conditions).limit(limit, marker=cursor)
+
+    @classmethod
+    def wait_for_events(cls, cursor, timeout, limit=100, **conditions):
+        """Returns events after the cursor, waiting for one if need be.
+
+        Returns an empty list if there are still none after timeout seconds.
+        Every waiting request queries the log on each check, so the time
+        between checks doubles from the poll interval up to the max poll
+        interval. Quiet waits then cost a request a query every max poll
+        interval rather than every poll interval.
+
+        """
+        deadline = time.time() + timeout
+        interval = instance_event_poll_interval()
+        max_interval = max(instance_event_max_poll_interval(), interval)
+        while True:
+            events = cls.find_since(cursor, limit, **conditions)
+            remaining = deadline - time.time()
+            if events or remaining <= 0:
+                return events
+            eventlet.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+
+    @classmethod
+    def prune(cls):
+        """Deletes events which are older than the maximum age."""
+        max_age = timedelta(seconds=instance_event_max_age())
+        return cls.delete_all_before('created', utils.utcnow() - max_age)
+
 
 def persisted_models():
     return {
         'instance': DBInstance,
+        'instance_events': InstanceEvent,
         'service_image': ServiceImage,
         'service_statuses': InstanceServiceStatus,
     }
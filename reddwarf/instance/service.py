@@ -24,6 +24,7 @@ from reddwarf.common import exception
 from reddwarf.common import pagination
 from reddwarf.common import utils
 from reddwarf.common import wsgi
+from reddwarf.common.views import get_fields
 from reddwarf.extensions.mysql.common import populate_databases
 from reddwarf.extensions.mysql.common import populate_users
 from reddwarf.instance import models, views
@@ -130,29 +131,144 @@ class InstanceController(wsgi.Controller):
         raise webob.exc.HTTPNotImplemented()
 
     def index(self, req, tenant_id):
-        """Return all instances."""
+        """Return the instances matching any filters, a page at a time.
+
+        With ids, the details of just those instances are returned instead.
+
+        """
         LOG.info(_("req : '%s'\n\n") % req)
         LOG.info(_("Indexing a database instance for tenant '%s'") % tenant_id)
         context = req.environ[wsgi.CONTEXT_KEY]
-        servers, marker = models.Instances.load(context)
+        fields = get_fields(req)
+        if 'ids' in req.GET:
+            return self._show_batch(req, context, fields)
+        filters = models.InstanceFilters(req.GET)
+        servers, page = models.Instances.load_page(context, fields=fields,
+                                                   filters=filters)
         view = views.InstancesView(servers, req=req,
-                                   add_volumes=self.add_volumes)
+                                   add_volumes=self.add_volumes,
+                                   fields=fields)
         paged = pagination.SimplePaginatedDataView(req.url, 'instances', view,
-                                                   marker)
+                                                   page.next_marker,
+                                                   page.previous_marker,
+                                                   page.total)
         return wsgi.Result(paged.data(), 200)
 
+    def _show_batch(self, req, context, fields):
+        ids = self._get_ids(req)
+        instances, errors = models.load_instances_with_guest(
+            models.DetailInstance, context, ids, fields=fields)
+        errors = dict((id, self._error_data(error))
+                      for id, error in errors.items())
+        view = views.InstanceBatchView(ids, instances, errors, req=req,
+                                       add_addresses=self.add_addresses,
+                                       add_volumes=self.add_volumes,
+                                       fields=fields)
+        return wsgi.Result(view.data(), 200)
+
+    @staticmethod
+    def _get_ids(req):
+        """Returns the ids asked for, given comma separated or repeated."""
+        ids = []
+        seen = set()
+        for value in req.GET.getall('ids'):
+            for id in value.split(','):
+                id = id.strip()
+                if id and id not in seen:
+                    seen.add(id)
+                    ids.append(id)
+        if not ids:
+            raise exception.BadRequest(_("No instance ids were given."))
+        batch_max = models.instance_batch_max()
+        if len(ids) > batch_max:
+            raise exception.BadRequest(_("At most %d instances can be shown "
+                                         "at once.") % batch_max)
+        return ids
+
+    def _error_data(self, error):
+        """The code and message shown for an instance that failed to load."""
+        # Anything unexpected, such as Nova failing, is the server's fault.
+        http_error = webob.exc.HTTPServerError
+        for mapped_error, errors in self.exception_map.items():
+            if type(error) in errors:
+                http_error = mapped_error
+        return {'code': http_error.code, 'message': str(error)}
+
+    def index_version(self, req, tenant_id):
+        if 'ids' in req.GET:
+            # Instances shown by id have no version between them.
+            return None
+        context = req.environ[wsgi.CONTEXT_KEY]
+        filters = models.InstanceFilters(req.GET)
+        return models.Instances.load_version(context, filters=filters)
+
+    def show_version(self, req, tenant_id, id):
+        if 'wait_for' in req.GET:
+            # Waiting requests should never be answered right away.
+            return None
+        context = req.environ[wsgi.CONTEXT_KEY]
+        return models.load_instance_version(context, id)
+
     def show(self, req, tenant_id, id):
-        """Return a single instance."""
+        """Return a single instance.
+
+        With wait_for, blocks until the instance has that status or the
+        timeout given in seconds passes, then returns it either way.
+
+        """
         LOG.info(_("req : '%s'\n\n") % req)
         LOG.info(_("Showing a database instance for tenant '%s'") % tenant_id)
         LOG.info(_("id : '%s'\n\n") % id)
 
         context = req.environ[wsgi.CONTEXT_KEY]
-        server = models.load_instance_with_guest(models.DetailInstance,
-                                                 context, id)
+        fields = get_fields(req)
+        wait_for = req.GET.get('wait_for')
+        if wait_for:
+            server = models.wait_for_instance_status(
+                models.DetailInstance, context, id, wait_for.upper(),
+                self._get_wait_timeout(req), fields=fields)
+        else:
+            server = models.load_instance_with_guest(models.DetailInstance,
+                                                     context, id,
+                                                     fields=fields)
         return wsgi.Result(views.InstanceDetailView(server, req=req,
                            add_addresses=self.add_addresses,
-                           add_volumes=self.add_volumes).data(), 200)
+                           add_volumes=self.add_volumes,
+                           fields=fields).data(), 200)
+
+    def changes(self, req, tenant_id):
+        """Return the tenant's instance transitions after a cursor.
+
+        Blocks for up to the timeout if there are none yet. Without since
+        only the cursor to start from is returned.
+
+        """
+        LOG.info(_("Listing instance changes for tenant '%s'") % tenant_id)
+        context = req.environ[wsgi.CONTEXT_KEY]
+        since = req.GET.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                raise exception.BadRequest(_("The since cursor '%s' is not "
+                                             "valid.") % since)
+        limit = models.Instances._limit(context)
+        events, cursor = models.load_instance_changes(
+            context, since, self._get_wait_timeout(req), limit)
+        view = views.InstanceChangesView(events, cursor)
+        return wsgi.Result(view.data(), 200)
+
+    @staticmethod
+    def _get_wait_timeout(req):
+        """Returns the seconds a request asks to wait, up to the max."""
+        max_timeout = models.instance_wait_max_timeout()
+        timeout = req.GET.get('timeout', max_timeout)
+        try:
+            timeout = int(timeout)
+        except ValueError:
+            raise exception.BadRequest(_("The timeout '%s' is not a number "
+                                         "of seconds.") % timeout)
+        return min(max(timeout, 0), max_timeout)
 
     def delete(self, req, tenant_id, id):
         """Delete a single instance."""
@@ -187,8 +303,7 @@ class InstanceController(wsgi.Controller):
         service_type = body['instance'].get('service_type')
         if service_type is None:
             service_type = 'mysql'
-        service = models.ServiceImage.find_by(service_name=service_type)
-        image_id = service['image_id']
+        image_id = models.ServiceImage.find_image_id(service_type)
         name = body['instance']['name']
         flavor_ref = body['instance']['flavorRef']
         flavor_id = utils.get_id_from_href(flavor_ref)
@@ -202,16 +317,6 @@ class InstanceController(wsgi.Controller):
         else:
             volume_size = None
 
-        instance_max = int(config.Config.get('max_instances_per_user', 5))
-        number_instances = models.DBInstance.find_all(tenant_id=tenant_id,
-                                                      deleted=False).count()
-
-        if number_instances >= instance_max:
-            # That's too many, pal. Got to cut you off.
-            LOG.error(_("New instance would exceed user instance quota."))
-            msg = "User instance quota of %d would be exceeded."
-            raise exception.QuotaExceeded(msg % instance_max)
-
         instance = models.Instance.create(context, name, flavor_id,
                                           image_id, databases, users,
                                           service_type, volume_size)
@@ -252,7 +357,7 @@ class InstanceController(wsgi.Controller):
                    "integer value, %s cannot be accepted."
                    % volume_size)
             raise exception.ReddwarfError(msg)
-        max_size = int(config.Config.get('max_accepted_volume_size', 1))
+        max_size = CONFIG.get_int('max_accepted_volume_size', default=1)
         if int(volume_size) > max_size:
             msg = ("Volume 'size' cannot exceed maximum "
                    "of %d Gb, %s cannot be accepted."
@@ -267,10 +372,10 @@ class InstanceController(wsgi.Controller):
         try:
             body['instance']
             body['instance']['flavorRef']
-            vol_enabled = utils.bool_from_string(
-                config.Config.get('reddwarf_volume_support', 'True'))
-            must_have_vol = utils.bool_from_string(
-                config.Config.get('reddwarf_must_use_volume', 'False'))
+            vol_enabled = CONFIG.get_bool('reddwarf_volume_support',
+                                          default=True)
+            must_have_vol = CONFIG.get_bool('reddwarf_must_use_volume',
+                                            default=False)
             if vol_enabled:
                 if body['instance'].get('volume', None):
                     if body['instance']['volume'].get('size', None):
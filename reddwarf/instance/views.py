@@ -17,7 +17,6 @@
 
 import logging
 from reddwarf.common import config
-from reddwarf.common import utils
 from reddwarf.common.views import create_links
 from reddwarf.instance import models
 
@@ -36,28 +35,46 @@ def get_ip_address(addresses):
 
 
 class InstanceView(object):
-    """Uses a SimpleInstance."""
+    """Uses a SimpleInstance or an InstanceRecord.
+
+    Given fields, only those of the instance's fields are shown.
+
+    """
 
     def __init__(self, instance, req=None, add_addresses=False,
-                 add_volumes=False):
+                 add_volumes=False, fields=None):
         self.instance = instance
         self.add_addresses = add_addresses
         self.add_volumes = add_volumes
         self.req = req
+        self.fields = fields
+
+    def shows(self, field):
+        return self.fields is None or field in self.fields
 
     def data(self):
-        instance_dict = {
-            "id": self.instance.id,
-            "name": self.instance.name,
-            "status": self.instance.status,
-            "links": self._build_links(),
-            "flavor": self._build_flavor_info(),
-        }
-        if self.add_volumes:
+        instance_dict = {}
+        if self.shows("id"):
+            instance_dict["id"] = self.instance.id
+        if self.shows("name"):
+            instance_dict["name"] = self.instance.name
+        if self.shows("status"):
+            instance_dict["status"] = self.instance.status
+        if self.shows("links"):
+            instance_dict["links"] = self._build_links()
+        if self.shows("flavor"):
+            instance_dict["flavor"] = self._build_flavor_info()
+        if self.add_volumes and self.shows("volume"):
             instance_dict['volume'] = {'size': self.instance.volume_size}
+            if self.instance.volume_used:
+                used = self._to_gb(self.instance.volume_used)
+                instance_dict['volume']['used'] = used
         LOG.debug(instance_dict)
         return {"instance": instance_dict}
 
+    def _to_gb(self, bytes):
+        return models.volume_gb(bytes)
+
     def _build_links(self):
         return create_links("instances", self.req, self.instance.id)
 
@@ -76,55 +93,102 @@ class InstanceDetailView(InstanceView):
     """Works with a full-blown instance."""
 
     def __init__(self, instance, req, add_addresses=False,
-                 add_volumes=False):
+                 add_volumes=False, fields=None):
         super(InstanceDetailView, self).__init__(instance,
                                                  req=req,
-                                                 add_volumes=add_volumes)
+                                                 add_volumes=add_volumes,
+                                                 fields=fields)
         self.add_addresses = add_addresses
         self.add_volumes = add_volumes
 
-    def _to_gb(self, bytes):
-        return bytes / 1024.0 ** 3
-
     def data(self):
         result = super(InstanceDetailView, self).data()
-        result['instance']['created'] = self.instance.created
-        result['instance']['updated'] = self.instance.updated
+        if self.shows('created'):
+            result['instance']['created'] = self.instance.created
+        if self.shows('updated'):
+            result['instance']['updated'] = self.instance.updated
 
-        dns_support = config.Config.get("reddwarf_dns_support", 'False')
-        if utils.bool_from_string(dns_support):
+        if (self.shows('hostname') and
+                config.Config.get_bool("reddwarf_dns_support", default=False)):
             result['instance']['hostname'] = self.instance.hostname
 
-        if self.add_addresses:
+        if self.add_addresses and self.shows('ip'):
             ip = get_ip_address(self.instance.addresses)
             if ip is not None and len(ip) > 0:
                 result['instance']['ip'] = ip
-        if self.add_volumes:
-            if (isinstance(self.instance, models.DetailInstance) and
-                    self.instance.volume_used):
-                used = self._to_gb(self.instance.volume_used)
-                result['instance']['volume']['used'] = used
         return result
 
 
 class InstancesView(object):
-    """Shows a list of SimpleInstance objects."""
+    """Shows a list of InstanceRecords or SimpleInstances."""
 
     def __init__(self, instances, req=None, add_addresses=False,
-                 add_volumes=True):
+                 add_volumes=True, fields=None):
         self.instances = instances
         self.req = req
         self.add_addresses = add_addresses
         self.add_volumes = add_volumes
+        self.fields = fields
 
     def data(self):
         data = []
-        # These are model instances
         for instance in self.instances:
             data.append(self.data_for_instance(instance))
         return {'instances': data}
 
     def data_for_instance(self, instance):
         view = InstanceView(instance, req=self.req,
-                            add_volumes=self.add_volumes)
+                            add_volumes=self.add_volumes, fields=self.fields)
         return view.data()['instance']
+
+
+class InstanceBatchView(object):
+    """Shows the instances asked for by id, in the order they were asked.
+
+    Those which couldn't be loaded are shown as their id and an error with
+    the code and message the instance alone would have failed with.
+
+    """
+
+    def __init__(self, ids, instances, errors, req, add_addresses=False,
+                 add_volumes=False, fields=None):
+        self.ids = ids
+        self.instances = instances
+        self.errors = errors
+        self.req = req
+        self.add_addresses = add_addresses
+        self.add_volumes = add_volumes
+        self.fields = fields
+
+    def data(self):
+        data = []
+        for id in self.ids:
+            if id in self.errors:
+                data.append({'id': id, 'error': self.errors[id]})
+                continue
+            view = InstanceDetailView(self.instances[id], req=self.req,
+                                      add_addresses=self.add_addresses,
+                                      add_volumes=self.add_volumes,
+                                      fields=self.fields)
+            data.append(view.data()['instance'])
+        return {'instances': data}
+
+
+class InstanceChangesView(object):
+    """Shows InstanceEvents along with the cursor to ask for the next ones."""
+
+    def __init__(self, events, cursor):
+        self.events = events
+        self.cursor = cursor
+
+    def data(self):
+        changes = []
+        for event in self.events:
+            changes.append({
+                'id': event.id,
+                'instance_id': event.instance_id,
+                'type': event.event_type,
+                'value': event.value,
+                'created': event.created,
+            })
+        return {'changes': changes, 'cursor': self.cursor}
@@ -0,0 +1,196 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Model classes for keeping track of what each tenant uses."""
+
+import logging
+
+from datetime import timedelta
+
+from reddwarf import db
+from reddwarf.common import config
+from reddwarf.common import exception
+from reddwarf.common import utils
+from reddwarf.db import conditions as db_conditions
+from reddwarf.db import models as dbmodels
+
+
+CONFIG = config.Config
+LOG = logging.getLogger(__name__)
+
+
+def quota_limit(resource):
+    """Returns the most of the resource a tenant may use, or None."""
+    if resource == 'instances':
+        return CONFIG.get_int('max_instances_per_user', default=5)
+    if resource == 'volumes_gb':
+        limit = CONFIG.get_int('max_volume_gb_per_user', default=0)
+        return limit or None
+    return None
+
+
+def reservation_expiry():
+    """Seconds a reservation lasts if it's never committed or rolled back."""
+    return CONFIG.get_int('quota_reservation_expiry', default=86400)
+
+
+def quota_exceeded(resource, limit):
+    if resource == 'volumes_gb':
+        msg = _("User volume quota of %dGB would be exceeded.") % limit
+        return exception.VolumeQuotaExceeded(msg)
+    msg = _("User instance quota of %d would be exceeded.") % limit
+    return exception.QuotaExceeded(msg)
+
+
+class QuotaUsage(dbmodels.DatabaseModelBase):
+    """How much of a resource a tenant uses, plus what's been reserved.
+
+    Usage only changes by adding to the columns in an UPDATE, which also
+    checks the limit, so it never needs counting again once the row exists.
+
+    """
+
+    _data_fields = ['tenant_id', 'resource', 'in_use', 'reserved',
+                    'created', 'updated']
+
+    @classmethod
+    def load(cls, tenant_id, resource, count_usage):
+        """Returns the tenant's usage, counting it the first time."""
+        usage = cls.get_by(tenant_id=tenant_id, resource=resource)
+        if usage is not None:
+            return usage
+        try:
+            return cls.create(tenant_id=tenant_id, resource=resource,
+                              in_use=count_usage(resource), reserved=0)
+        except exception.DBConstraintError:
+            # Another request counted it first.
+            return cls.find_by(tenant_id=tenant_id, resource=resource)
+
+
+class QuotaReservation(dbmodels.DatabaseModelBase):
+    """An amount of a resource reserved for a tenant, until it expires."""
+
+    _data_fields = ['tenant_id', 'resource', 'delta', 'expires_at',
+                    'created', 'updated']
+
+
+class Reservation(object):
+    """Amounts set aside for a tenant until they're committed or not.
+
+    Each amount has a QuotaReservation row as well as being added to what
+    the usage has reserved. Whichever of commit, rollback and
+    expire_reservations deletes the row settles the amount, once, so one
+    left behind by a crash is given back when it expires.
+
+    """
+
+    def __init__(self, tenant_id, rows=()):
+        self.tenant_id = tenant_id
+        self.rows = list(rows)
+
+    @classmethod
+    def load(cls, tenant_id, ids):
+        """Returns the reservation made of the rows, if they're still kept."""
+        return cls(tenant_id, QuotaReservation.find_all_in(
+            'id', ids or [], tenant_id=tenant_id))
+
+    @property
+    def amounts(self):
+        return dict((row.resource, row.delta) for row in self.rows)
+
+    @property
+    def ids(self):
+        return [row.id for row in self.rows]
+
+    def commit(self):
+        """Moves the reserved amounts into use, returning those it moved."""
+        return self._settle(in_use=True)
+
+    def rollback(self):
+        """Gives back the reserved amounts, returning those it gave back."""
+        return self._settle(in_use=False)
+
+    def _settle(self, in_use):
+        settled = {}
+        for row in self.rows:
+            with db.db_api.transaction():
+                if not QuotaReservation.delete_where(id=row.id):
+                    # It's been settled already.
+                    continue
+                amounts = {'reserved': -row.delta}
+                if in_use:
+                    amounts['in_use'] = row.delta
+                QuotaUsage.increment(amounts, tenant_id=self.tenant_id,
+                                     resource=row.resource)
+            settled[row.resource] = row.delta
+        return settled
+
+
+def reserve(tenant_id, amounts, count_usage):
+    """Reserves amounts of resources for a tenant, within its quotas.
+
+    count_usage(resource) is only called to count what the tenant uses the
+    first time. Raises QuotaExceeded, without reserving anything, if any of
+    the amounts would take the tenant over its quota.
+
+    """
+    reservation = Reservation(tenant_id)
+    expires_at = utils.utcnow() + timedelta(seconds=reservation_expiry())
+    try:
+        for resource, amount in sorted(amounts.iteritems()):
+            if not amount:
+                continue
+            QuotaUsage.load(tenant_id, resource, count_usage)
+            limit = quota_limit(resource)
+            with db.db_api.transaction():
+                if not QuotaUsage.increment(
+                        {'reserved': amount}, limit=limit,
+                        limit_columns=('in_use', 'reserved'),
+                        tenant_id=tenant_id, resource=resource):
+                    LOG.error(_("Tenant %s would exceed its %s quota.")
+                              % (tenant_id, resource))
+                    raise quota_exceeded(resource, limit)
+                reservation.rows.append(QuotaReservation.create(
+                    tenant_id=tenant_id, resource=resource, delta=amount,
+                    expires_at=expires_at))
+    except Exception:
+        reservation.rollback()
+        raise
+    return reservation
+
+
+def release(tenant_id, amounts):
+    """Takes amounts which are no longer used off a tenant's usage."""
+    for resource, amount in amounts.iteritems():
+        if amount:
+            QuotaUsage.increment({'in_use': -amount}, tenant_id=tenant_id,
+                                 resource=resource)
+
+
+def expire_reservations():
+    """Gives back reservations which have expired, returning how many."""
+    expired = QuotaReservation.find_all(
+        expires_at=db_conditions.Before(utils.utcnow())).all()
+    for row in expired:
+        LOG.warn(_("Giving back %s %s reserved for tenant %s, which "
+                   "expired.") % (row.delta, row.resource, row.tenant_id))
+        Reservation(row.tenant_id, [row]).rollback()
+    return len(expired)
+
+
+def persisted_models():
+    return {'quota_usages': QuotaUsage,
+            'quota_reservations': QuotaReservation}
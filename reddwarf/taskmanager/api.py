@@ -55,10 +55,11 @@ class API(ManagerAPI):
         """Create the routing key for the taskmanager"""
         return CONFIG.get('taskmanager_queue', 'taskmanager')
 
-    def resize_volume(self, new_size, instance_id):
+    def resize_volume(self, new_size, instance_id, reservation_ids=None):
         LOG.debug("Making async call to resize volume for instance: %s"
                   % instance_id)
-        self._cast("resize_volume", new_size=new_size, instance_id=instance_id)
+        self._cast("resize_volume", new_size=new_size, instance_id=instance_id,
+                   reservation_ids=reservation_ids)
 
     def resize_flavor(self, instance_id, new_flavor_id, old_memory_size,
                       new_memory_size):
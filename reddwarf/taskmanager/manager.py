@@ -22,7 +22,12 @@ from eventlet import greenthread
 
 from reddwarf.common import exception
 from reddwarf.common import service
+from reddwarf.instance.models import InstanceEvent
+from reddwarf.instance.models import use_nova_notifications
+from reddwarf.quota import models as quota_models
 from reddwarf.taskmanager import models
+from reddwarf.taskmanager import notifications
+from reddwarf.taskmanager import reconciler
 from reddwarf.taskmanager.models import BuiltInstanceTasks
 from reddwarf.taskmanager.models import FreshInstanceTasks
 from reddwarf.openstack.common.rpc.common import UnsupportedRpcVersion
@@ -38,10 +43,38 @@ class TaskManager(service.Manager):
     def __init__(self, *args, **kwargs):
         super(TaskManager, self).__init__(*args, **kwargs)
         LOG.info(_("TaskManager init %s %s") % (args, kwargs))
+        self.server_reconciler = reconciler.ServerReconciler()
 
-    def resize_volume(self, context, instance_id, new_size):
+    def create_consumers(self, conn):
+        if use_nova_notifications():
+            notifications.NovaNotificationConsumer().register(conn)
+
+    def periodic_tasks(self, raise_on_error=False):
+        super(TaskManager, self).periodic_tasks(raise_on_error=raise_on_error)
+        try:
+            self.server_reconciler.run_if_due()
+        except Exception:
+            if raise_on_error:
+                raise
+            LOG.exception(_("Error reconciling servers with Nova."))
+        try:
+            InstanceEvent.prune()
+        except Exception:
+            if raise_on_error:
+                raise
+            LOG.exception(_("Error pruning the instance event log."))
+        try:
+            quota_models.expire_reservations()
+        except Exception:
+            if raise_on_error:
+                raise
+            LOG.exception(_("Error expiring quota reservations."))
+
+    def resize_volume(self, context, instance_id, new_size,
+                      reservation_ids=None):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
-        instance_tasks.resize_volume(new_size)
+        instance_tasks.resize_volume(new_size,
+                                     reservation_ids=reservation_ids)
 
     def resize_flavor(self, context, instance_id, new_flavor_id,
                       old_memory_size, new_memory_size):
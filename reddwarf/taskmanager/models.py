@@ -42,6 +42,7 @@ from reddwarf.instance.models import InstanceServiceStatus
 from reddwarf.instance.models import ServiceStatuses
 from reddwarf.instance.tasks import InstanceTasks
 from reddwarf.instance.views import get_ip_address
+from reddwarf.quota import models as quota_models
 
 
 LOG = logging.getLogger(__name__)
@@ -50,6 +51,15 @@ use_nova_server_volume = config.Config.get_bool('use_nova_server_volume',
                                                 default=False)
 
 
+def _reload_server_volume():
+    global use_nova_server_volume
+    use_nova_server_volume = config.Config.get_bool('use_nova_server_volume',
+                                                    default=False)
+
+
+config.Config.add_reload_hook(_reload_server_volume)
+
+
 class FreshInstanceTasks(FreshInstance):
 
     def create_instance(self, flavor_id, flavor_ram, image_id,
@@ -309,9 +319,21 @@ class BuiltInstanceTasks(BuiltInstance):
         poll_until(server_is_finished, sleep_time=2,
                    time_out=int(config.Config.get('server_delete_time_out')))
 
-    def resize_volume(self, new_size):
+    def resize_volume(self, new_size, reservation_ids=None):
+        # The API reserved the growth against the tenant's volume quota.
+        # Whatever of it isn't used, such as when the volume never grows, is
+        # given back.
+        reservation = quota_models.Reservation.load(self.tenant_id,
+                                                    reservation_ids)
+        try:
+            self._resize_volume(new_size, reservation)
+        finally:
+            reservation.rollback()
+
+    def _resize_volume(self, new_size, reservation):
         LOG.debug("%s: Resizing volume for instance: %s to %r GB"
                   % (greenthread.getcurrent(), self.server.id, new_size))
+        old_size = self.volume_size
         self.volume_client.volumes.resize(self.volume_id, int(new_size))
         try:
             utils.poll_until(
@@ -321,6 +343,12 @@ class BuiltInstanceTasks(BuiltInstance):
                 time_out=int(config.Config.get('volume_time_out')))
             volume = self.volume_client.volumes.get(self.volume_id)
             self.update_db(volume_size=volume.size)
+            committed = reservation.commit().get('volumes_gb', 0)
+            # Usage follows the volume's size, in case it didn't grow by
+            # exactly what was reserved, or the reservation expired.
+            quota_models.release(self.tenant_id,
+                                 {'volumes_gb': old_size + committed -
+                                  volume.size})
             self.nova_client.volumes.rescan_server_volume(self.server,
                                                           self.volume_id)
             self.guest.resize_fs(self.get_volume_mountpoint())
@@ -0,0 +1,134 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Consumes Nova's compute notifications to keep the instances table current.
+"""
+
+import logging
+
+from reddwarf.common import config
+from reddwarf.instance.models import DBInstance
+from reddwarf.instance.models import InstanceEvent
+
+
+CONFIG = config.Config
+LOG = logging.getLogger(__name__)
+
+# Maps Nova's vm_state to the status its API reports for a server. Some
+# states report differently depending on the task_state, which is the key in
+# the inner dicts. Deleted servers are reported as SHUTDOWN, which is what
+# the rest of Reddwarf assumes when a server can't be found.
+SERVER_STATUS_MAP = {
+    'active': {
+        'default': 'ACTIVE',
+        'rebooting': 'REBOOT',
+        'rebooting_hard': 'HARD_REBOOT',
+        'updating_password': 'PASSWORD',
+        'resize_prep': 'RESIZE',
+        'resize_migrating': 'RESIZE',
+        'resize_migrated': 'RESIZE',
+        'resize_finish': 'RESIZE',
+        'resize_verify': 'VERIFY_RESIZE',
+    },
+    'building': {'default': 'BUILD'},
+    'stopped': {'default': 'SHUTOFF'},
+    'resized': {
+        'default': 'VERIFY_RESIZE',
+        'resize_reverting': 'REVERT_RESIZE',
+    },
+    'paused': {'default': 'PAUSED'},
+    'suspended': {'default': 'SUSPENDED'},
+    'rescued': {'default': 'RESCUE'},
+    'error': {'default': 'ERROR'},
+    'deleted': {'default': 'SHUTDOWN'},
+    'soft_delete': {'default': 'SHUTDOWN'},
+}
+
+
+def server_status_from_payload(payload):
+    """Returns the Nova API status for a compute notification's payload."""
+    vm_state = payload.get('state')
+    task_state = payload.get('new_task_state',
+                             payload.get('state_description'))
+    states = SERVER_STATUS_MAP.get(vm_state, {'default': 'UNKNOWN'})
+    return states.get(task_state, states['default'])
+
+
+def addresses_from_payload(payload):
+    """Converts the payload's fixed_ips to the format of server.addresses."""
+    addresses = {}
+    for fixed_ip in payload.get('fixed_ips', []):
+        label = fixed_ip.get('label')
+        addresses.setdefault(label, []).append({
+            'addr': fixed_ip.get('address'),
+            'version': fixed_ip.get('version'),
+        })
+    return addresses
+
+
+class NovaNotificationConsumer(object):
+    """Records server info from Nova's compute.instance.* notifications."""
+
+    EVENT_TYPE_PREFIX = 'compute.instance.'
+
+    def __init__(self, topic=None, queue_name=None):
+        self.topic = topic or CONFIG.get('nova_notification_topic',
+                                         'notifications.info')
+        # Nova's own consumers may listen to the topic's default queue, so
+        # use our own to make sure we see every message.
+        self.queue_name = queue_name or CONFIG.get('nova_notification_queue',
+                                                   'reddwarf.notifications')
+
+    def register(self, conn):
+        """Declares the notification consumer on an rpc connection."""
+        LOG.info(_("Consuming Nova notifications from topic %s (queue %s).")
+                 % (self.topic, self.queue_name))
+        conn.declare_topic_consumer(self.topic, callback=self,
+                                    queue_name=self.queue_name)
+
+    def __call__(self, message):
+        # An error here would kill the consumer thread, so just log it.
+        try:
+            self.process(message)
+        except Exception:
+            LOG.exception(_("Error processing Nova notification %s.")
+                          % message.get('message_id'))
+
+    def process(self, message):
+        """Updates the instance whose server the notification is about."""
+        event_type = message.get('event_type', '')
+        if not event_type.startswith(self.EVENT_TYPE_PREFIX):
+            return
+        payload = message.get('payload', {})
+        server_id = payload.get('instance_id')
+        db_info = DBInstance.get_by(compute_instance_id=server_id,
+                                    deleted=False)
+        if db_info is None:
+            LOG.debug("Ignoring %s for server %s, which is not a Reddwarf "
+                      "instance." % (event_type, server_id))
+            return
+        old_status = db_info.server_status
+        db_info.server_status = server_status_from_payload(payload)
+        if 'fixed_ips' in payload:
+            db_info.set_server_addresses(addresses_from_payload(payload))
+        if payload.get('host'):
+            db_info.host = payload['host']
+        LOG.debug("Instance %s server status is now %s (from %s)."
+                  % (db_info.id, db_info.server_status, event_type))
+        db_info.save()
+        if db_info.server_status != old_status:
+            InstanceEvent.record(db_info, 'server_status',
+                                 db_info.server_status)
@@ -0,0 +1,217 @@
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Periodically compares Nova's servers with the instances table.
+"""
+
+import datetime
+import logging
+import time
+
+from reddwarf.common import config
+from reddwarf.common import utils
+from reddwarf.common.context import ReddwarfContext
+from reddwarf.common.remote import create_admin_nova_client
+from reddwarf.instance.models import DBInstance
+from reddwarf.openstack.common import rpc
+
+
+CONFIG = config.Config
+LOG = logging.getLogger(__name__)
+
+
+def reconcile_interval():
+    """Seconds between sweeps, or zero if they are turned off."""
+    return CONFIG.get_int('server_reconcile_interval', default=0)
+
+
+def stuck_task_timeout():
+    """Seconds an instance may keep a task before it's reported as stuck."""
+    return CONFIG.get_int('server_reconcile_stuck_task_timeout',
+                          default=3600)
+
+
+def orphan_grace_period():
+    """Seconds after an instance is created that its server may be unknown.
+
+    The server is created before the instance row records its id, so until
+    then it looks like it has no instance.
+
+    """
+    return CONFIG.get_int('server_reconcile_orphan_grace_period',
+                          default=600)
+
+
+def notification_topic():
+    """The topic sweep reports are sent on, or None to only log them."""
+    return CONFIG.get('server_reconcile_notification_topic',
+                      'notifications') or None
+
+
+def create_admin_context():
+    return ReddwarfContext(
+        user=CONFIG.get('reddwarf_proxy_admin_user'),
+        tenant=CONFIG.get('reddwarf_proxy_admin_tenant_name'),
+        is_admin=True, limit=None, marker=None)
+
+
+class DriftReport(object):
+    """What a single sweep found and how long it took."""
+
+    def __init__(self):
+        self.server_count = 0
+        self.instance_count = 0
+        self.updated_count = 0
+        # Nova servers no instance refers to.
+        self.orphan_servers = []
+        # Instances whose server is not in Nova's list.
+        self.missing_servers = []
+        # Instances which have been running the same task for too long,
+        # as (instance id, task description) pairs.
+        self.stuck_tasks = []
+        self.duration = None
+
+    @property
+    def has_drift(self):
+        return bool(self.orphan_servers or self.missing_servers or
+                    self.stuck_tasks)
+
+    def to_dict(self):
+        return {
+            'duration': self.duration,
+            'server_count': self.server_count,
+            'instance_count': self.instance_count,
+            'updated_count': self.updated_count,
+            'orphan_server_count': len(self.orphan_servers),
+            'missing_server_count': len(self.missing_servers),
+            'stuck_task_count': len(self.stuck_tasks),
+            'orphan_servers': self.orphan_servers,
+            'missing_servers': self.missing_servers,
+            'stuck_tasks': [instance_id
+                            for instance_id, task in self.stuck_tasks],
+        }
+
+    def notify(self, context):
+        """Sends the report as a notification, so it can be graphed."""
+        topic = notification_topic()
+        if topic is None:
+            return
+        priority = 'WARN' if self.has_drift else 'INFO'
+        message = {
+            'message_id': utils.generate_uuid(),
+            'publisher_id': 'reddwarf.taskmanager',
+            'event_type': 'reddwarf.server_reconcile',
+            'priority': priority,
+            'payload': self.to_dict(),
+            'timestamp': str(utils.utcnow()),
+        }
+        rpc.notify(context, '%s.%s' % (topic, priority.lower()), message)
+
+    def log(self):
+        LOG.info(_("Server reconcile took %.3fs: %d servers, %d instances, "
+                   "%d server statuses updated.")
+                 % (self.duration, self.server_count, self.instance_count,
+                    self.updated_count))
+        if self.orphan_servers:
+            LOG.warn(_("Nova servers with no instance: %s")
+                     % ", ".join(self.orphan_servers))
+        if self.missing_servers:
+            LOG.warn(_("Instances whose server is gone: %s")
+                     % ", ".join(self.missing_servers))
+        for instance_id, task in self.stuck_tasks:
+            LOG.warn(_("Instance %s is stuck on task '%s'.")
+                     % (instance_id, task))
+
+
+class ServerReconciler(object):
+    """Writes Nova's server statuses to the instances table in bulk.
+
+    Each sweep lists every server once with the admin client and loads every
+    instance row with one query, then updates the rows whose status changed
+    with a single executemany. This keeps server_status current for
+    everything that reads it from the database without a Nova call per
+    instance, and catches anything the Nova notifications missed.
+
+    """
+
+    def __init__(self, context=None):
+        self.context = context or create_admin_context()
+        self.last_run = None
+
+    def is_due(self):
+        interval = reconcile_interval()
+        if interval <= 0:
+            return False
+        return (self.last_run is None or
+                time.time() - self.last_run >= interval)
+
+    def run_if_due(self):
+        if not self.is_due():
+            return None
+        self.last_run = time.time()
+        return self.run()
+
+    def run(self):
+        """Runs a sweep and returns its DriftReport."""
+        report = DriftReport()
+        start = time.time()
+
+        client = create_admin_nova_client(self.context)
+        servers = dict((server.id, server)
+                       for server in client.rdservers.list()
+                       if not getattr(server, 'deleted', False))
+        db_infos = DBInstance.find_all(deleted=False).all()
+        report.server_count = len(servers)
+        report.instance_count = len(db_infos)
+
+        updates = []
+        now = utils.utcnow()
+        stuck_before = now - datetime.timedelta(seconds=stuck_task_timeout())
+        new_after = now - datetime.timedelta(seconds=orphan_grace_period())
+        # The names of instances which may have a server that's not been
+        # recorded yet. Servers are named after the instance's hostname or
+        # name.
+        pending_names = set()
+        for db_info in db_infos:
+            if db_info.compute_instance_id is None and (
+                    db_info.task_status.action == 'BUILDING' or
+                    db_info.created is None or db_info.created > new_after):
+                pending_names.add(db_info.hostname or db_info.name)
+        for db_info in db_infos:
+            server_id = db_info.compute_instance_id
+            server = servers.pop(server_id, None)
+            if server is not None:
+                if server.status != db_info.server_status:
+                    updates.append((db_info.id, server.status))
+            elif server_id is not None:
+                report.missing_servers.append(db_info.id)
+            task = db_info.task_status
+            if (task is not None and task.action != 'NONE' and
+                    not task.is_error and db_info.updated is not None and
+                    db_info.updated < stuck_before):
+                report.stuck_tasks.append((db_info.id, task.db_text))
+        report.orphan_servers = sorted(
+            id for id, server in servers.items()
+            if getattr(server, 'name', None) not in pending_names)
+
+        report.updated_count = DBInstance.update_many(
+            [{'id': id, 'deleted': False} for id, status in updates],
+            [{'server_status': status} for id, status in updates])
+
+        report.duration = time.time() - start
+        report.log()
+        report.notify(self.context)
+        return report
@@ -27,8 +27,10 @@ import unittest
 import urlparse
 
 import mox
+from sqlalchemy import event
 
 from reddwarf.db import db_api
+from reddwarf.db.sqlalchemy import session
 from reddwarf.common import config
 from reddwarf.common import utils
 
@@ -49,6 +51,62 @@ def test_config_file():
     return reddwarf_etc_path("reddwarf.conf.sample")
 
 
+class QueryRecorder(object):
+    """Records the statements run against the engine while it is active."""
+
+    def __init__(self):
+        self.queries = []
+        self.active = False
+        event.listen(session._ENGINE, "before_cursor_execute", self._record)
+
+    def __enter__(self):
+        self.active = True
+        return self
+
+    def __exit__(self, *args):
+        # SQLAlchemy 0.7 can't remove listeners, so just stop recording.
+        self.active = False
+
+    def _record(self, conn, cursor, statement, parameters, context,
+                executemany):
+        if self.active:
+            self.queries.append((statement, parameters))
+
+    @property
+    def statements(self):
+        return [statement for statement, parameters in self.queries]
+
+    def count(self, table_name):
+        return len([statement for statement in self.statements
+                    if "FROM %s" % table_name in statement])
+
+    def plans(self):
+        """Returns the plan of each SELECT as one string.
+
+        Only SQLite's EXPLAIN QUERY PLAN is supported, which is what the unit
+        tests run against.
+
+        """
+        self.active = False
+        plans = []
+        for statement, parameters in self.queries:
+            if not statement.lstrip().startswith("SELECT"):
+                continue
+            rows = session._ENGINE.execute("EXPLAIN QUERY PLAN " + statement,
+                                           parameters).fetchall()
+            plans.append(" / ".join(str(list(row)[-1]) for row in rows))
+        return plans
+
+    def assert_uses_index(self, test, index_name):
+        """Asserts that each recorded SELECT uses the index."""
+        plans = self.plans()
+        test.assertTrue(plans, "No queries were run.")
+        for plan in plans:
+            test.assertTrue(index_name in plan,
+                            "Query plan '%s' doesn't use %s."
+                            % (plan, index_name))
+
+
 class BaseTest(unittest.TestCase):
 
     def setUp(self):
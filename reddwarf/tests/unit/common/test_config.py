@@ -0,0 +1,102 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import tempfile
+import unittest
+
+from reddwarf.common import config
+
+
+class TestConfigCache(unittest.TestCase):
+
+    def setUp(self):
+        self.old_values = dict(config.Config.instance)
+        self.old_sources = config.Config._sources
+        config.Config._sources = []
+
+    def tearDown(self):
+        config.Config.instance.clear()
+        config.Config.instance.update(self.old_values)
+        config.Config._sources = self.old_sources
+        # Put back anything a reload set from the test's files.
+        for hook in config.Config._reload_hooks:
+            hook()
+
+    def test_values_are_only_parsed_once(self):
+        config.Config.instance['cached_int'] = '5'
+        self.assertEqual(5, config.Config.get_int('cached_int'))
+        # Sneak a change past the cache to show it isn't parsed again.
+        dict.__setitem__(config.Config.instance, 'cached_int', '6')
+        self.assertEqual(5, config.Config.get_int('cached_int'))
+
+    def test_changing_a_value_clears_the_cache(self):
+        config.Config.instance['cached_int'] = '5'
+        self.assertEqual(5, config.Config.get_int('cached_int'))
+        config.Config.instance['cached_int'] = '6'
+        self.assertEqual(6, config.Config.get_int('cached_int'))
+        del config.Config.instance['cached_int']
+        self.assertEqual(7, config.Config.get_int('cached_int', default=7))
+
+    def test_types_and_defaults_are_cached_separately(self):
+        config.Config.instance['cached_flag'] = 'True'
+        self.assertEqual('True', config.Config.get('cached_flag'))
+        self.assertTrue(config.Config.get_bool('cached_flag'))
+        self.assertEqual('x', config.Config.get('missing_option', 'x'))
+        self.assertEqual('y', config.Config.get('missing_option', 'y'))
+
+    def test_only_true_is_true(self):
+        for value, expected in [('true', True), ('TRUE', True),
+                                ('1', False), ('on', False), ('yes', False)]:
+            config.Config.instance['flag'] = value
+            self.assertEqual(expected, config.Config.get_bool('flag'))
+
+    def test_cached_lists_are_copied(self):
+        config.Config.instance['cached_list'] = 'a, b'
+        config.Config.get_list('cached_list').append('c')
+        self.assertEqual(['a', 'b'], config.Config.get_list('cached_list'))
+
+    def test_reload_reads_the_files_again(self):
+        conf_file = tempfile.NamedTemporaryFile()
+        conf_file.write("reloaded_option = 1\n")
+        conf_file.flush()
+        config.Config.append_to_config_values(
+            'reddwarf', {'config_file': conf_file.name}, None)
+        self.assertEqual(1, config.Config.get_int('reloaded_option'))
+        with open(conf_file.name, 'w') as conf:
+            conf.write("reloaded_option = 2\n")
+        config.Config.reload()
+        self.assertEqual(2, config.Config.get_int('reloaded_option'))
+
+    def _write_conf(self, text):
+        conf_file = tempfile.NamedTemporaryFile()
+        conf_file.write(text)
+        conf_file.flush()
+        return conf_file
+
+    def test_files_loaded_twice_are_only_read_once(self):
+        conf_file = self._write_conf("reloaded_option = 1\n")
+        for _ in range(2):
+            config.Config.append_to_config_values(
+                'reddwarf', {'config_file': conf_file.name}, None)
+        self.assertEqual(1, len(config.Config._sources))
+
+    def test_reload_updates_values_read_at_import(self):
+        from reddwarf.instance import models
+        conf_file = self._write_conf("instances_page_size = 7\n")
+        config.Config.append_to_config_values(
+            'reddwarf', {'config_file': conf_file.name}, None)
+        config.Config.reload()
+        self.assertEqual(7, models.Instances.DEFAULT_LIMIT)
@@ -0,0 +1,115 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import webob
+
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import context
+from reddwarf.common import remote
+from reddwarf.common import wsgi
+from reddwarf.extensions.mgmt.clients.service import ClientCacheController
+
+
+class CountingFactory(object):
+
+    def __init__(self):
+        self.created = []
+
+    def __call__(self):
+        client = object()
+        self.created.append(client)
+        return client
+
+
+class TestClientPool(tests.BaseTest):
+
+    def setUp(self):
+        super(TestClientPool, self).setUp()
+        self.mock.stubs.Set(remote, 'CLIENT_POOL', remote.ClientPool())
+        self.create = CountingFactory()
+
+    def tearDown(self):
+        for option in ('remote_client_cache_ttl', 'remote_client_cache_size'):
+            config.Config.instance.pop(option, None)
+        super(TestClientPool, self).tearDown()
+
+    def _get(self, endpoint="http://nova:8774/v2/tenant/", token="token"):
+        return remote._cached_client(endpoint, ("user", "tenant", token),
+                                     self.create)
+
+    def _get_in_green_thread(self, **kwargs):
+        # The thread is gone, and its clients checked in, once it returns.
+        return eventlet.spawn(self._get, **kwargs).wait()
+
+    def test_clients_are_reused_within_a_green_thread(self):
+        self.assertTrue(self._get() is self._get())
+        self.assertEqual(1, len(self.create.created))
+        stats = remote.client_cache_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(0.5, stats['hit_rate'])
+        self.assertEqual(1, stats['lent'])
+
+    def test_clients_are_reused_by_later_green_threads(self):
+        client = self._get_in_green_thread()
+        self.assertEqual({'nova:8774': 1},
+                         remote.client_cache_stats()['hosts'])
+        self.assertTrue(client is self._get_in_green_thread())
+        self.assertEqual(1, len(self.create.created))
+
+    def test_clients_are_only_lent_to_one_green_thread_at_a_time(self):
+        client = self._get()
+        other = eventlet.spawn(self._get).wait()
+        self.assertFalse(client is other)
+
+    def test_tokens_and_endpoints_get_their_own_clients(self):
+        self._get_in_green_thread()
+        self._get_in_green_thread(token="new-token")
+        self._get_in_green_thread(endpoint="http://volume:8776/v1/tenant/")
+        self.assertEqual(3, len(self.create.created))
+
+    def test_old_clients_expire(self):
+        config.Config.instance['remote_client_cache_ttl'] = '10'
+        client = self._get_in_green_thread()
+        for entries in remote.CLIENT_POOL.idle.values():
+            entries[:] = [entry[:2] + (entry[2] - 20,) for entry in entries]
+        self.assertFalse(client is self._get_in_green_thread())
+
+    def test_each_host_keeps_a_limited_number_of_clients(self):
+        config.Config.instance['remote_client_cache_size'] = '2'
+
+        def get_three():
+            for token in range(3):
+                self._get(token=token)
+        eventlet.spawn(get_three).wait()
+        stats = remote.client_cache_stats()
+        self.assertEqual({'nova:8774': 2}, stats['hosts'])
+        self.assertEqual(1, stats['evictions'])
+
+    def test_caching_can_be_turned_off(self):
+        config.Config.instance['remote_client_cache_ttl'] = '0'
+        self.assertFalse(self._get() is self._get())
+
+    def test_the_mgmt_api_reports_the_stats(self):
+        self._get_in_green_thread()
+        req = webob.Request.blank("/tenant/mgmt/client_cache")
+        req.environ[wsgi.CONTEXT_KEY] = context.ReddwarfContext(
+            tenant="tenant", is_admin=True, limit=None, marker=None)
+        result = ClientCacheController().index(req, "tenant")
+        stats = result.data('application/json')['client_cache']
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual([{'host': 'nova:8774', 'idle': 1}], stats['hosts'])
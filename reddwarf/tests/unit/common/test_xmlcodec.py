@@ -0,0 +1,222 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import re
+
+import webob.exc
+import webtest
+
+from reddwarf import tests
+from reddwarf import versions
+from reddwarf.common import wsgi
+from reddwarf.common import xmlcodec
+from reddwarf.openstack.common import exception as openstack_exception
+from reddwarf.openstack.common import wsgi as openstack_wsgi
+
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden")
+BASE_URL = "http://localhost:8779/v1.0/tenant"
+
+
+def _links(path):
+    return [{'rel': "self", 'href': "%s/%s" % (BASE_URL, path)},
+            {'rel': "bookmark",
+             'href': "http://localhost:8779/tenant/%s" % path}]
+
+
+def _instance(number):
+    id = "5e8f7c1a-0000-4000-8000-%012d" % number
+    return {
+        'id': id,
+        'name': "instance-%d" % number,
+        'status': "ACTIVE",
+        'links': _links("instances/%s" % id),
+        'flavor': {'id': "1", 'links': _links("flavors/1")},
+        'volume': {'size': 2},
+    }
+
+
+def _instance_detail(number):
+    instance = _instance(number)
+    instance['created'] = "2012-09-20T17:00:00"
+    instance['updated'] = "2012-09-20T17:05:00"
+    instance['hostname'] = "host-%d.example.com" % number
+    instance['ip'] = ["10.0.0.%d" % number]
+    instance['volume']['used'] = 0.17
+    return instance
+
+
+def _mgmt_instance(number):
+    instance = _instance_detail(number)
+    instance['server'] = {
+        'deleted': False,
+        'deleted_at': None,
+        'host': "compute-1",
+        'id': "server-%d" % number,
+        'local_id': number,
+        'name': "instance-%d" % number,
+        'status': "ACTIVE",
+        'tenant_id': "tenant",
+        'addresses': {'private': [{'addr': "10.0.0.%d" % number,
+                                   'version': 4}]},
+    }
+    instance['service_status'] = "RUNNING"
+    instance['tenant_id'] = "tenant"
+    instance['deleted'] = False
+    instance['deleted_at'] = None
+    instance['task_description'] = "No tasks for the instance."
+    instance['guest_status'] = {'state_description': "running"}
+    instance['volume'] = {'id': "volume-%d" % number, 'size': 2,
+                          'used': 0.17}
+    return instance
+
+
+def payloads():
+    """The documents the golden files were written from by minidom, by name."""
+    return {
+        'instance_list': {
+            'instances': [_instance(number) for number in range(3)],
+            'links': [{'rel': "next",
+                       'href': "%s/instances?marker=abc&limit=3" % BASE_URL}],
+            'total': 10,
+        },
+        'instance_detail': {'instance': _instance_detail(1)},
+        'mgmt_instance': {'instance': _mgmt_instance(1)},
+        'mgmt_instance_list': {
+            'instances': [_mgmt_instance(number) for number in range(2)],
+        },
+        'flavors': {
+            'flavors': [{'id': number, 'name': "m1.size%d" % number,
+                         'ram': 512 * number,
+                         'links': _links("flavors/%d" % number)}
+                        for number in range(1, 3)],
+        },
+        'databases': {
+            'databases': [{'name': "db%d" % number,
+                           'character_set': "utf8",
+                           'collate': "utf8_general_ci"}
+                          for number in range(3)],
+        },
+        'users': {
+            'users': [{'name': "user%d" % number,
+                       'databases': [{'name': "db%d" % number}]}
+                      for number in range(2)],
+        },
+        'root': {'rootEnabled': True},
+        'empty_list': {'instances': []},
+        'escaped': {'instance': {'id': "1", 'name': "a <b> & \"c\"",
+                                 'status': "x > y"}},
+        'versions': {
+            'versions': [versions.BaseVersion(
+                "v1.0", "CURRENT", "http://localhost:8779",
+                "2012-08-01T00:00:00Z")],
+        },
+        'version': {
+            'version': versions.Version(
+                "v1.0", "CURRENT", "http://localhost:8779/v1.0",
+                "2012-08-01T00:00:00Z"),
+        },
+    }
+
+
+def golden(name):
+    with open(os.path.join(GOLDEN_PATH, "%s.xml" % name)) as golden_file:
+        return golden_file.read()
+
+
+class TestSerializer(tests.BaseTest):
+
+    def test_documents_match_the_golden_files(self):
+        serializer = wsgi.ReddwarfXMLDictSerializer()
+        for name, data in payloads().items():
+            self.assertEqual(golden(name),
+                             serializer.serialize(data, 'default'), name)
+
+    def test_fault_matches_the_golden_file(self):
+        app = webtest.TestApp(wsgi.Fault(
+            webob.exc.HTTPBadRequest('some <error> & "more"')))
+        response = app.get("/x.xml", status="*")
+        self.assertEqual(golden("fault"), response.body)
+
+    def test_documents_match_minidom(self):
+        metadata = {'attributes': wsgi.CUSTOM_SERIALIZER_METADATA,
+                    'plurals': {'addresses': "address"}}
+        for name in ('instance_detail', 'mgmt_instance', 'users', 'escaped'):
+            data = payloads()[name]
+            expected = openstack_wsgi.XMLDictSerializer(
+                dict(metadata), wsgi.XMLNS).default(data)
+            actual = wsgi.XMLDictSerializer(
+                dict(metadata), wsgi.XMLNS).default(data)
+            self.assertEqual(expected, actual, name)
+
+    def test_iterwrite_yields_the_document(self):
+        element = versions.BaseVersion("v1.0", "CURRENT", BASE_URL,
+                                       "2012-08-01T00:00:00Z").to_xml()
+        chunks = list(xmlcodec.iterwrite(element))
+        self.assertEqual(3, len(chunks))
+        self.assertEqual(xmlcodec.tostring(element),
+                         u"".join(chunks).encode('UTF-8'))
+
+
+class TestDeserializer(tests.BaseTest):
+
+    BODIES = [
+        """<?xml version="1.0" encoding="UTF-8"?>
+        <instance xmlns="http://docs.openstack.org/database/api/v1.0"
+                  name="my instance" flavorRef="1">
+            <volume size="2"/>
+            <databases>
+                <database name="db1" character_set="utf8"/>
+                <database name="db2"/>
+            </databases>
+            <users>
+                <user name="me" password="secret">
+                    <databases>
+                        <database name="db1"/>
+                    </databases>
+                </user>
+            </users>
+        </instance>""",
+        """<resize xmlns="http://docs.openstack.org/database/api/v1.0"
+                   xmlns:atom="http://www.w3.org/2005/Atom">
+            <volume size="4"/><atom:link rel="self" href="x"/>
+        </resize>""",
+        """<restart/>""",
+        """<instance><name>
+            spread over
+            lines </name><empty></empty></instance>""",
+        """<?xml version="1.0" encoding="UTF-8"?>
+        <instance name="caf\xc3\xa9"/>""",
+    ]
+
+    def _minidom(self, body):
+        deserializer = openstack_wsgi.XMLDeserializer(
+            {'plurals': wsgi.CUSTOM_PLURALS_METADATA})
+        return deserializer._from_xml(
+            re.sub(r'((?<=>)\s+)*\n*(\s+(?=<))*', '', body))
+
+    def test_bodies_match_minidom(self):
+        deserializer = wsgi.ReddwarfXMLDeserializer()
+        for body in self.BODIES:
+            self.assertEqual({'body': self._minidom(body)},
+                             deserializer.default(body))
+
+    def test_malformed_bodies_are_rejected(self):
+        deserializer = wsgi.ReddwarfXMLDeserializer()
+        for body in ("", "<instance>", "<a></b>", "not xml"):
+            self.assertRaises(openstack_exception.MalformedRequestBody,
+                              deserializer.default, body)
@@ -0,0 +1,121 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from reddwarf import tests
+from reddwarf.common import exception
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+from reddwarf.quota.models import QuotaUsage
+
+
+class BadTask(object):
+    code = -1
+    db_text = "bad"
+
+
+class TestBulkWrites(tests.BaseTest):
+
+    def _rows(self, count, **values):
+        return [dict(values, name="instance-%d" % index, flavor_id=1,
+                     tenant_id="tenant", task_status=InstanceTasks.NONE)
+                for index in range(count)]
+
+    def _writes(self, counter):
+        return [statement for statement in counter.statements
+                if not statement.lstrip().startswith("SELECT")]
+
+    def test_rows_are_created_with_one_statement(self):
+        with tests.QueryRecorder() as counter:
+            created = models.DBInstance.create_many(self._rows(20))
+        self.assertEqual(1, len(self._writes(counter)))
+        found = models.DBInstance.find_all(tenant_id="tenant").all()
+        self.assertEqual(sorted(db_info.id for db_info in created),
+                         sorted(db_info.id for db_info in found))
+        self.assertEqual(set([1]), set(db_info.version for db_info in found))
+
+    def test_created_models_are_updated_when_saved(self):
+        db_info = models.DBInstance.create_many(self._rows(1))[0]
+        db_info.name = "renamed"
+        db_info.save()
+        found = models.DBInstance.find_all(tenant_id="tenant").all()
+        self.assertEqual(["renamed"], [found_info.name
+                                       for found_info in found])
+
+    def test_created_rows_are_stamped_as_updated(self):
+        models.DBInstance.create_many(self._rows(2))
+        found = models.DBInstance.find_all(tenant_id="tenant").all()
+        for db_info in found:
+            self.assertIsNotNone(db_info.created)
+            self.assertIsNotNone(db_info.updated)
+
+    def test_nothing_is_created_if_a_row_is_invalid(self):
+        rows = self._rows(3)
+        rows[2]['task_status'] = BadTask()
+        self.assertRaises(exception.InvalidModelError,
+                          models.DBInstance.create_many, rows)
+        self.assertEqual(0, models.DBInstance.find_all().count())
+
+    def test_nothing_is_created_if_a_row_is_rejected(self):
+        rows = self._rows(3)
+        models.DBInstance.create_many(rows[:1])
+        rows[2]['id'] = models.DBInstance.find_by(tenant_id="tenant").id
+        self.assertRaises(exception.DBConstraintError,
+                          models.DBInstance.create_many, rows[1:])
+        self.assertEqual(1, models.DBInstance.find_all().count())
+
+    def test_rows_are_updated_with_one_statement(self):
+        created = models.DBInstance.create_many(self._rows(10))
+        with tests.QueryRecorder() as counter:
+            count = models.DBInstance.update_many(
+                [{'id': db_info.id} for db_info in created],
+                [{'server_status': "status-%d" % index}
+                 for index in range(10)])
+        self.assertEqual(10, count)
+        self.assertEqual(1, len(self._writes(counter)))
+        for index, db_info in enumerate(created):
+            found = models.DBInstance.find_by(id=db_info.id)
+            self.assertEqual("status-%d" % index, found.server_status)
+            self.assertEqual(2, found.version)
+
+    def test_update_values_are_processed(self):
+        db_info = models.DBInstance.create_many(self._rows(1))[0]
+        models.DBInstance.update_many(
+            [{'id': db_info.id}], [{'task_status': InstanceTasks.DELETING}])
+        self.assertEqual(InstanceTasks.DELETING,
+                         models.DBInstance.find_by(id=db_info.id).task_status)
+
+    def test_upserts_update_existing_rows_and_create_the_rest(self):
+        QuotaUsage.create(tenant_id="tenant", resource="instances",
+                          in_use=1, reserved=0)
+        QuotaUsage.upsert_many(
+            [dict(tenant_id="tenant", resource="instances", in_use=3,
+                  reserved=0),
+             dict(tenant_id="tenant", resource="volumes_gb", in_use=20,
+                  reserved=0)],
+            keys=('tenant_id', 'resource'))
+        usages = dict((usage.resource, usage.in_use) for usage in
+                      QuotaUsage.find_all(tenant_id="tenant"))
+        self.assertEqual({'instances': 3, 'volumes_gb': 20}, usages)
+
+    def test_instance_events_are_recorded_together(self):
+        db_info = models.DBInstance.create_many(self._rows(1))[0]
+        with tests.QueryRecorder() as counter:
+            models.InstanceEvent.record_changes(
+                db_info, {'task_status': InstanceTasks.NONE, 'deleted': True})
+        self.assertEqual(1, len(self._writes(counter)))
+        events = models.InstanceEvent.find_all(instance_id=db_info.id)
+        self.assertEqual(['deleted', 'task_status'],
+                         sorted(event.event_type for event in events))
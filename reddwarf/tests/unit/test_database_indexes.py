@@ -0,0 +1,81 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from reddwarf import tests
+from reddwarf.common import context
+from reddwarf.common import pagination
+from reddwarf.guestagent.models import AgentHeartBeat
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+
+
+class TestLookupIndexes(tests.BaseTest):
+
+    def setUp(self):
+        super(TestLookupIndexes, self).setUp()
+        self.db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server", task_status=InstanceTasks.NONE)
+        models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id, status=models.ServiceStatuses.RUNNING)
+        AgentHeartBeat.create(instance_id=self.db_info.id)
+
+    def test_listing_a_tenants_instances(self):
+        with tests.QueryRecorder() as plans:
+            models.DBInstance.find_all(tenant_id="tenant", deleted=False)\
+                .limit(20, marker=self.db_info.id)
+        plans.assert_uses_index(self, "instances_tenant_id_deleted_id")
+
+    def test_counting_a_tenants_instances(self):
+        with tests.QueryRecorder() as plans:
+            models.DBInstance.find_all(tenant_id="tenant",
+                                       deleted=False).count()
+        # Either index on the tenant and deleted flag will do.
+        plans.assert_uses_index(self, "instances_tenant_id_deleted_")
+
+    def test_finding_instances_by_server(self):
+        with tests.QueryRecorder() as plans:
+            models.DBInstance.find_by(compute_instance_id="server")
+        plans.assert_uses_index(self, "instances_compute_instance_id")
+
+    def test_finding_service_statuses(self):
+        with tests.QueryRecorder() as plans:
+            models.InstanceServiceStatus.find_by(instance_id=self.db_info.id)
+            models.InstanceServiceStatus.find_all_in('instance_id',
+                                                     [self.db_info.id])
+        plans.assert_uses_index(self, "service_statuses_instance_id")
+
+    def test_finding_heartbeats(self):
+        with tests.QueryRecorder() as plans:
+            AgentHeartBeat.find_by(instance_id=self.db_info.id)
+        plans.assert_uses_index(self, "agent_heartbeats_instance_id")
+
+    def test_paging_through_a_tenants_instances(self):
+        ctx = context.ReddwarfContext(
+            tenant="tenant", limit=20, marker=pagination.encode_marker(
+                [self.db_info.created, self.db_info.id]))
+        with tests.QueryRecorder() as plans:
+            models.Instances._find_page(ctx)
+        plans.assert_uses_index(self,
+                                "instances_tenant_id_deleted_created_id")
+
+    def test_finding_a_tenants_instances_by_name_prefix(self):
+        ctx = context.ReddwarfContext(tenant="tenant", limit=20, marker=None)
+        filters = models.InstanceFilters({'name_prefix': "inst",
+                                          'sort_key': "name"})
+        with tests.QueryRecorder() as plans:
+            models.Instances._find_page(ctx, filters=filters)
+        plans.assert_uses_index(self, "instances_tenant_id_deleted_name_id")
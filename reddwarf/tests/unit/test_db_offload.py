@@ -0,0 +1,85 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import thread
+import time
+import unittest
+
+import eventlet
+from eventlet import patcher
+from sqlalchemy import event
+from sqlalchemy import exc
+
+from reddwarf.db.sqlalchemy import offload
+from reddwarf.db.sqlalchemy import session
+
+
+def _sleep(seconds):
+    # A native sleep blocks the hub like a slow query would.
+    patcher.original('time').sleep(seconds)
+    return seconds
+
+
+def _add_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function('thread_id', 0, thread.get_ident)
+    dbapi_connection.create_function('sleep', 1, _sleep)
+
+
+class TestOffload(unittest.TestCase):
+
+    def setUp(self):
+        super(TestOffload, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "offload.sqlite")
+        self.engine = session._create_engine({
+            'sql_connection': "sqlite:///%s" % path,
+            'sql_offload': 'True',
+            'sql_offload_pool_size': '4',
+        })
+        event.listen(self.engine, 'connect', _add_functions)
+        offload.METRICS.reset()
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.directory)
+        super(TestOffload, self).tearDown()
+
+    def test_off_by_default(self):
+        self.assertEqual({}, offload.engine_args({}, "sqlite://"))
+
+    def test_statements_run_in_pool_threads(self):
+        thread_id = self.engine.execute("SELECT thread_id()").scalar()
+        self.assertNotEqual(thread.get_ident(), thread_id)
+        metrics = offload.METRICS.snapshot()
+        # At least the connect and the statement.
+        self.assertTrue(metrics['calls'] >= 2)
+        self.assertTrue(metrics['max_execution_time'] >= 0)
+
+    def test_slow_statements_do_not_block_each_other(self):
+        start = time.time()
+        threads = [eventlet.spawn(self.engine.execute, "SELECT sleep(0.3)")
+                   for index in range(3)]
+        for green_thread in threads:
+            green_thread.wait()
+        self.assertTrue(time.time() - start < 0.8)
+        self.assertTrue(offload.METRICS.max_execution_time >= 0.3)
+
+    def test_errors_reach_the_caller(self):
+        self.assertRaises(exc.OperationalError, self.engine.execute,
+                          "SELECT nothing FROM nowhere")
@@ -0,0 +1,72 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import posix
+
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.guestagent import dbaas
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+
+
+class TestGetFilesystemVolumeStats(tests.BaseTest):
+
+    def test_stats_are_in_bytes(self):
+        self.mock.StubOutWithMock(os, 'statvfs')
+        os.statvfs("/var/lib/mysql").AndReturn(posix.statvfs_result(
+            (4096, 1024, 1000, 250, 200, 0, 0, 0, 0, 255)))
+        self.mock.ReplayAll()
+        stats = dbaas.get_filesystem_volume_stats("/var/lib/mysql")
+        self.assertEqual({'total': 1024000, 'free': 256000, 'used': 768000},
+                         stats)
+
+
+class TestUpdateStatus(tests.BaseTest):
+
+    def setUp(self):
+        super(TestUpdateStatus, self).setUp()
+        db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            task_status=InstanceTasks.NONE)
+        models.InstanceServiceStatus.create(
+            instance_id=db_info.id, status=models.ServiceStatuses.BUILDING)
+        self.id = db_info.id
+        self.old_values = dict(config.Config.instance)
+        config.Config.instance['guest_id'] = db_info.id
+        self.mock.stubs.Set(dbaas.MySqlAppStatus, '_instance', None)
+        self.mock.stubs.Set(dbaas.MySqlAppStatus, '_get_actual_db_status',
+                            lambda self: models.ServiceStatuses.RUNNING)
+        self.mock.stubs.Set(dbaas, 'get_filesystem_volume_stats',
+                            lambda path: {'used': 1024, 'total': 4096,
+                                          'free': 3072})
+        dbaas.MySqlAppStatus.get().status = models.ServiceStatuses.RUNNING
+
+    def tearDown(self):
+        config.Config.instance.clear()
+        config.Config.instance.update(self.old_values)
+        super(TestUpdateStatus, self).tearDown()
+
+    def test_the_status_and_volume_usage_are_saved_together(self):
+        with tests.QueryRecorder() as counter:
+            dbaas.DBaaSAgent().update_status()
+        updates = [statement for statement in counter.statements
+                   if statement.startswith("UPDATE service_statuses")]
+        self.assertEqual(1, len(updates))
+        status = models.InstanceServiceStatus.find_by(instance_id=self.id)
+        self.assertEqual(models.ServiceStatuses.RUNNING, status.status)
+        self.assertEqual(1024, status.get_volume_used())
@@ -0,0 +1,114 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from novaclient import exceptions as nova_exceptions
+
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import exception
+from reddwarf.flavor import models
+
+
+class FakeFlavor(object):
+
+    def __init__(self, id, ram):
+        self.id = id
+        self.name = "flavor-%s" % id
+        self.ram = ram
+        self.vcpus = 1
+        self.links = []
+
+
+class CountingFlavors(object):
+
+    def __init__(self, flavors):
+        self.flavors = flavors
+        self.list_calls = 0
+        self.get_calls = 0
+
+    def list(self):
+        self.list_calls += 1
+        return list(self.flavors)
+
+    def get(self, id):
+        self.get_calls += 1
+        for flavor in self.flavors:
+            if str(flavor.id) == str(id):
+                return flavor
+        raise nova_exceptions.NotFound(404)
+
+
+class FakeClient(object):
+
+    def __init__(self, flavors):
+        self.flavors = flavors
+
+
+class TestFlavorCatalog(tests.BaseTest):
+
+    def setUp(self):
+        super(TestFlavorCatalog, self).setUp()
+        self.nova_flavors = CountingFlavors([FakeFlavor(1, 512),
+                                             FakeFlavor(2, 2048)])
+        client = FakeClient(self.nova_flavors)
+        self.mock.stubs.Set(models, 'create_nova_client',
+                            lambda context: client)
+        self.admin_flavors = CountingFlavors(self.nova_flavors.flavors)
+        admin_client = FakeClient(self.admin_flavors)
+        self.mock.stubs.Set(models, 'create_admin_nova_client',
+                            lambda context: admin_client)
+        self.catalog = models.FlavorCatalog()
+
+    def tearDown(self):
+        config.Config.instance.pop('flavor_cache_ttl', None)
+        super(TestFlavorCatalog, self).tearDown()
+
+    def test_flavors_are_only_listed_once(self):
+        self.assertEqual(2, len(self.catalog.list(None)))
+        self.assertEqual(2048, self.catalog.get(None, "2").ram)
+        self.assertEqual(512, self.catalog.get(None, 1).ram)
+        self.assertEqual(1, self.nova_flavors.list_calls)
+        self.assertEqual(0, self.nova_flavors.get_calls)
+
+    def test_new_flavors_are_fetched(self):
+        self.catalog.list(None)
+        self.nova_flavors.flavors.append(FakeFlavor(3, 4096))
+        self.assertEqual(4096, self.catalog.get(None, 3).ram)
+        self.assertEqual(4096, self.catalog.get(None, 3).ram)
+        self.assertEqual(1, self.nova_flavors.get_calls)
+
+    def test_unknown_flavors_are_not_found(self):
+        self.assertRaises(exception.NotFound, self.catalog.get, None, 9)
+
+    def test_old_catalogs_are_refreshed_in_the_background(self):
+        config.Config.instance['flavor_cache_ttl'] = '60'
+        self.catalog.list(None)
+        self.catalog.loaded_at -= 120
+        self.nova_flavors.flavors.append(FakeFlavor(3, 4096))
+        # The old copy is returned right away.
+        self.assertEqual(2, len(self.catalog.list(None)))
+        eventlet.sleep(0)
+        self.assertEqual(3, len(self.catalog.list(None)))
+        # The refresh doesn't use the request's token, which may expire.
+        self.assertEqual(1, self.nova_flavors.list_calls)
+        self.assertEqual(1, self.admin_flavors.list_calls)
+
+    def test_caching_can_be_turned_off(self):
+        config.Config.instance['flavor_cache_ttl'] = '0'
+        self.catalog.list(None)
+        self.catalog.list(None)
+        self.assertEqual(2, self.nova_flavors.list_calls)
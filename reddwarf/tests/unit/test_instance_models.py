@@ -0,0 +1,1030 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import time
+
+import eventlet
+from novaclient import exceptions as nova_exceptions
+
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import context
+from reddwarf.common import exception
+from reddwarf.db import db_api
+from reddwarf.extensions.mgmt.instances import models as mgmt_models
+from reddwarf.extensions.mgmt.instances import views as mgmt_views
+from reddwarf.instance import models
+from reddwarf.instance import views
+from reddwarf.instance.tasks import InstanceTasks
+
+
+class FakeServer(object):
+
+    def __init__(self, id, status="ACTIVE"):
+        self.id = id
+        self.status = status
+        self.addresses = {}
+
+
+class TestInstancesLoadServersStatus(tests.BaseTest):
+
+    def setUp(self):
+        super(TestInstancesLoadServersStatus, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None)
+        self.db_infos = []
+        for index in range(5):
+            db_info = models.DBInstance.create(
+                name="instance-%d" % index, flavor_id=1, tenant_id="tenant",
+                compute_instance_id="server-%d" % index,
+                task_status=InstanceTasks.NONE)
+            models.InstanceServiceStatus.create(
+                instance_id=db_info.id, status=models.ServiceStatuses.RUNNING)
+            self.db_infos.append(db_info)
+
+    def _load(self, db_items):
+        def load_instance(context, db, status):
+            return models.SimpleInstance(context, db, status)
+
+        def find_server(instance_id, server_id):
+            return FakeServer(server_id)
+
+        return models.Instances._load_servers_status(load_instance,
+                                                     self.context, db_items,
+                                                     find_server)
+
+    def test_statuses_are_loaded_with_a_single_query(self):
+        with tests.QueryRecorder() as counter:
+            instances = self._load(self.db_infos)
+        self.assertEqual(1, counter.count("service_statuses"))
+        self.assertEqual(5, len(instances))
+        for instance in instances:
+            self.assertEqual("ACTIVE", instance.status)
+
+    def test_instances_without_a_status_are_skipped(self):
+        orphan = models.DBInstance.create(
+            name="orphan", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server-orphan",
+            task_status=InstanceTasks.NONE)
+        instances = self._load(self.db_infos + [orphan])
+        self.assertItemsEqual([db_info.id for db_info in self.db_infos],
+                              [instance.id for instance in instances])
+
+    def test_find_all_in_splits_large_value_lists(self):
+        ids = [db_info.id for db_info in self.db_infos]
+        self.mock.StubOutWithMock(models.dbmodels, "FIND_ALL_IN_BATCH_SIZE")
+        models.dbmodels.FIND_ALL_IN_BATCH_SIZE = 2
+        with tests.QueryRecorder() as counter:
+            statuses = models.InstanceServiceStatus.find_all_in(
+                'instance_id', ids)
+        self.assertEqual(3, counter.count("service_statuses"))
+        self.assertItemsEqual(ids, [status.instance_id
+                                    for status in statuses])
+
+
+class FakeMgmtServer(FakeServer):
+
+    def __init__(self, id, status="ACTIVE"):
+        super(FakeMgmtServer, self).__init__(id, status)
+        self.deleted = False
+        self.deleted_at = None
+        self.host = "host"
+        self.local_id = 1
+        self.name = id
+        self.tenant_id = "tenant"
+
+
+class TestInstanceRecords(tests.BaseTest):
+
+    def setUp(self):
+        super(TestInstanceRecords, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None)
+        self.mock.stubs.Set(views, 'create_links', lambda *args: [])
+        cases = [(InstanceTasks.NONE, models.ServiceStatuses.RUNNING),
+                 (InstanceTasks.BUILDING, models.ServiceStatuses.NEW),
+                 (InstanceTasks.REBOOTING, models.ServiceStatuses.PAUSED),
+                 (InstanceTasks.NONE, models.ServiceStatuses.SHUTDOWN)]
+        for index, (task, service_status) in enumerate(cases):
+            db_info = models.DBInstance.create(
+                name="instance-%d" % index, flavor_id=1, tenant_id="tenant",
+                compute_instance_id="server-%d" % index, task_status=task,
+                volume_size=10)
+            status = models.InstanceServiceStatus.create(
+                instance_id=db_info.id, status=service_status)
+            status.set_volume_usage(index * 1024 ** 3, 10 * 1024 ** 3)
+            status.save()
+        models.DBInstance.find_all(name="instance-3").update(deleted=True)
+
+    def _by_id(self, data):
+        return sorted(data['instances'], key=lambda instance: instance['id'])
+
+    def test_the_list_view_is_the_same_as_for_simple_instances(self):
+        def load_instance(context, db, status):
+            return models.SimpleInstance(context, db, status)
+
+        db_infos = models.DBInstance.find_all(deleted=False)
+        instances = models.Instances._load_servers_status(
+            load_instance, self.context, db_infos, None)
+        rows = models.DBInstance.find_all_values(
+            models.InstanceRecord.COLUMNS, deleted=False)
+        records = models.Instances._load_records(models.InstanceRecord, rows,
+                                                 None)
+        self.assertEqual(3, len(records))
+        self.assertEqual(self._by_id(views.InstancesView(instances).data()),
+                         self._by_id(views.InstancesView(records).data()))
+
+    def test_the_mgmt_list_view_is_the_same_as_for_simple_instances(self):
+        config.Config.instance['reddwarf_dns_support'] = 'True'
+        self.addCleanup(config.Config.instance.pop, 'reddwarf_dns_support')
+        servers = [FakeMgmtServer("server-0"),
+                   FakeMgmtServer("server-2", "REBOOT")]
+        instances = mgmt_models.MgmtInstances.load_status_from_existing(
+            self.context, models.DBInstance.find_all(), servers)
+        rows = models.DBInstance.find_all_values(
+            mgmt_models.MgmtInstanceRecord.COLUMNS)
+        records = mgmt_models.MgmtInstances.load_records(self.context, rows,
+                                                         servers)
+        self.assertEqual(4, len(records))
+        expected = mgmt_views.MgmtInstancesView(instances, add_addresses=True,
+                                                add_volumes=True).data()
+        actual = mgmt_views.MgmtInstancesView(records, add_addresses=True,
+                                              add_volumes=True).data()
+        self.assertEqual(self._by_id(expected), self._by_id(actual))
+
+    def test_records_are_loaded_without_mapping_rows(self):
+        config.Config.instance['use_nova_notifications'] = 'True'
+        self.addCleanup(config.Config.instance.pop, 'use_nova_notifications')
+        with tests.QueryRecorder() as counter:
+            records, page = models.Instances.load_page(self.context)
+        self.assertEqual(2, len(counter.statements))
+        for record in records:
+            self.assertIsInstance(record, models.InstanceRecord)
+            self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(["ACTIVE", "BUILD", "REBOOT"],
+                         [record.status for record in records])
+
+    def _refuse_nova(self, module):
+        def create_nova_client(context):
+            self.fail("Nova was called.")
+        self.mock.stubs.Set(module, 'create_nova_client', create_nova_client)
+
+    def test_fields_without_the_status_skip_nova(self):
+        self._refuse_nova(models)
+        fields = frozenset(['id', 'name'])
+        records, page = models.Instances.load_page(self.context,
+                                                   fields=fields)
+        data = views.InstancesView(records, fields=fields).data()
+        self.assertEqual([{'id': record.id, 'name': record.name}
+                          for record in records], data['instances'])
+
+    def test_fields_with_the_status_ask_nova(self):
+        servers = [FakeServer("server-0"), FakeServer("server-2", "REBOOT")]
+        self.mock.stubs.Set(models, 'create_nova_client',
+                            lambda context: FakeNovaClient(servers))
+        fields = frozenset(['status'])
+        records, page = models.Instances.load_page(self.context,
+                                                   fields=fields)
+        self.assertEqual(["ACTIVE", "BUILD", "REBOOT"],
+                         [record.status for record in records])
+
+    def test_mgmt_fields_without_the_server_skip_nova(self):
+        self._refuse_nova(mgmt_models)
+        fields = frozenset(['id', 'tenant_id', 'deleted'])
+        records = list(mgmt_models.load_mgmt_instances(self.context,
+                                                       fields=fields))
+        self.assertEqual(4, len(records))
+        data = mgmt_views.MgmtInstancesView(records, add_volumes=True,
+                                            fields=fields).data()
+        for instance in data['instances']:
+            self.assertEqual(fields, set(instance.keys()))
+
+    def test_the_mgmt_list_reads_rows_in_batches(self):
+        self.mock.stubs.Set(mgmt_models, 'MGMT_LIST_BATCH_SIZE', 3)
+        fields = frozenset(['id'])
+        with tests.QueryRecorder() as counter:
+            records = mgmt_models.load_mgmt_instances(self.context,
+                                                      fields=fields)
+            self.assertEqual(0, counter.count("instances"))
+            ids = [record.id for record in records]
+        self.assertEqual(2, counter.count("instances"))
+        self.assertEqual(sorted(db_info.id for db_info in
+                                models.DBInstance.find_all()), sorted(ids))
+
+
+class CountingServers(object):
+    """Fake Nova servers API that counts the servers it sends back."""
+
+    def __init__(self, servers):
+        self.servers = dict((server.id, server) for server in servers)
+        self.list_calls = 0
+        self.get_calls = 0
+        self.servers_sent = 0
+
+    def list(self):
+        self.list_calls += 1
+        self.servers_sent += len(self.servers)
+        return self.servers.values()
+
+    def get(self, id):
+        self.get_calls += 1
+        if id not in self.servers:
+            raise nova_exceptions.NotFound(404, "Not found")
+        self.servers_sent += 1
+        return self.servers[id]
+
+
+class FakeNovaClient(object):
+
+    def __init__(self, servers):
+        self.servers = CountingServers(servers)
+
+
+class TestCreateServerListMatcher(tests.BaseTest):
+
+    def test_servers_are_found_by_id(self):
+        servers = [FakeServer("server-%d" % index) for index in range(3)]
+        find_server = models.create_server_list_matcher(servers)
+        self.assertEqual(servers[1], find_server("instance", "server-1"))
+
+    def test_missing_servers_raise_not_found(self):
+        find_server = models.create_server_list_matcher([FakeServer("a")])
+        self.assertRaises(exception.ComputeInstanceNotFound,
+                          find_server, "instance", "b")
+
+    def test_duplicate_servers_raise_an_error(self):
+        find_server = models.create_server_list_matcher(
+            [FakeServer("a"), FakeServer("a")])
+        self.assertRaises(exception.ReddwarfError,
+                          find_server, "instance", "a")
+
+
+class TestInstancesLoadServerStrategy(tests.BaseTest):
+
+    def setUp(self):
+        super(TestInstancesLoadServerStrategy, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=5,
+                                               marker=None)
+        self.old_strategy = config.Config.instance.get('server_list_strategy')
+        config.Config.instance['server_list_strategy'] = 'get'
+
+    def tearDown(self):
+        if self.old_strategy is None:
+            del config.Config.instance['server_list_strategy']
+        else:
+            config.Config.instance['server_list_strategy'] = self.old_strategy
+        super(TestInstancesLoadServerStrategy, self).tearDown()
+
+    def _create_tenant(self, size):
+        servers = []
+        for index in range(size):
+            db_info = models.DBInstance.create(
+                name="instance-%d" % index, flavor_id=1, tenant_id="tenant",
+                compute_instance_id="server-%d" % index,
+                task_status=InstanceTasks.NONE)
+            models.InstanceServiceStatus.create(
+                instance_id=db_info.id, status=models.ServiceStatuses.RUNNING)
+            servers.append(FakeServer(db_info.compute_instance_id))
+        client = FakeNovaClient(servers)
+        self.mock.stubs.Set(models, 'create_nova_client',
+                            lambda context: client)
+        return client
+
+    def test_only_the_servers_on_the_page_are_fetched(self):
+        client = self._create_tenant(12)
+        instances, marker = models.Instances.load(self.context)
+        self.assertEqual(5, len(instances))
+        self.assertEqual(0, client.servers.list_calls)
+        self.assertEqual(5, client.servers.get_calls)
+        for instance in instances:
+            self.assertEqual("ACTIVE", instance.status)
+
+    def test_servers_missing_from_nova_are_shut_down(self):
+        client = self._create_tenant(2)
+        del client.servers.servers["server-1"]
+        instances, marker = models.Instances.load(self.context)
+        statuses = dict((instance.server_id, instance.server_status)
+                        for instance in instances)
+        self.assertEqual({"server-0": "ACTIVE", "server-1": "SHUTDOWN"},
+                         statuses)
+
+    def test_nova_work_is_flat_in_tenant_size(self):
+        sent = {}
+        for strategy in ('list', 'get'):
+            config.Config.instance['server_list_strategy'] = strategy
+            for size in (10, 50):
+                self.mock.UnsetStubs()
+                models.DBInstance.find_all().delete()
+                client = self._create_tenant(size)
+                models.Instances.load(self.context)
+                sent[(strategy, size)] = client.servers.servers_sent
+        self.assertEqual({('list', 10): 10, ('list', 50): 50,
+                          ('get', 10): 5, ('get', 50): 5}, sent)
+
+
+class SlowNovaClient(FakeNovaClient):
+
+    def __init__(self, servers, delay):
+        super(SlowNovaClient, self).__init__(servers)
+        self.delay = delay
+        get = self.servers.get
+
+        def slow_get(id):
+            eventlet.sleep(self.delay)
+            return get(id)
+        self.servers.get = slow_get
+
+
+class SlowGuest(object):
+
+    def __init__(self, delay, used=1.5):
+        self.delay = delay
+        self.used = used
+        self.calls = 0
+
+    def get_volume_info(self):
+        self.calls += 1
+        eventlet.sleep(self.delay)
+        return {'used': self.used}
+
+
+class TestLoadInstanceWithGuest(tests.BaseTest):
+
+    def setUp(self):
+        super(TestLoadInstanceWithGuest, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None)
+        self.db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server", task_status=InstanceTasks.NONE)
+        models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id, status=models.ServiceStatuses.RUNNING)
+        config.Config.instance['volume_used_timeout'] = '0.5'
+
+    def tearDown(self):
+        del config.Config.instance['volume_used_timeout']
+        super(TestLoadInstanceWithGuest, self).tearDown()
+
+    def _load(self, nova_delay, guest, fields=None):
+        client = SlowNovaClient([FakeServer("server")], nova_delay)
+        self.mock.stubs.Set(models, 'create_nova_client',
+                            lambda context: client)
+        self.mock.stubs.Set(models, 'create_guest_client',
+                            lambda context, id: guest)
+        start = time.time()
+        instance = models.load_instance_with_guest(models.DetailInstance,
+                                                   self.context,
+                                                   self.db_info.id,
+                                                   fields=fields)
+        return instance, time.time() - start
+
+    def test_the_guest_is_asked_for_a_valid_status(self):
+        instance, elapsed = self._load(0.2, SlowGuest(0.2))
+        self.assertEqual("ACTIVE", instance.status)
+        self.assertEqual(1.5, instance.volume_used)
+
+    def test_a_slow_guest_is_cut_off_at_the_deadline(self):
+        instance, elapsed = self._load(0, SlowGuest(5))
+        self.assertEqual("ACTIVE", instance.status)
+        self.assertIsNone(instance.volume_used)
+        self.assertTrue(elapsed < 1, "Took %.3fs." % elapsed)
+
+    def test_the_guest_is_not_asked_for_invalid_statuses(self):
+        server = FakeServer("server", status="REBOOT")
+        guest = SlowGuest(0)
+        self.mock.stubs.Set(models, 'create_nova_client',
+                            lambda context: FakeNovaClient([server]))
+        self.mock.stubs.Set(models, 'create_guest_client',
+                            lambda context, id: guest)
+        instance = models.load_instance_with_guest(models.DetailInstance,
+                                                   self.context,
+                                                   self.db_info.id)
+        self.assertEqual("REBOOT", instance.status)
+        self.assertIsNone(instance.volume_used)
+        self.assertEqual(0, guest.calls)
+
+    def test_a_recent_volume_usage_sample_is_used_instead_of_the_guest(self):
+        status = models.InstanceServiceStatus.find_by(
+            instance_id=self.db_info.id)
+        status.set_volume_usage(2 * 1024 ** 3, 10 * 1024 ** 3)
+        status.save()
+        guest = SlowGuest(0)
+        instance, elapsed = self._load(0, guest)
+        self.assertEqual(2 * 1024 ** 3, instance.volume_used)
+        self.assertEqual(0, guest.calls)
+
+    def test_cheap_fields_skip_nova_and_the_guest(self):
+        guest = SlowGuest(0)
+        fields = frozenset(['id', 'hostname'])
+        instance, elapsed = self._load(5, guest, fields=fields)
+        self.assertTrue(elapsed < 1, "Took %.3fs." % elapsed)
+        self.assertEqual(0, guest.calls)
+        data = views.InstanceDetailView(instance, req=None,
+                                        fields=fields).data()
+        self.assertEqual({'instance': {'id': self.db_info.id}}, data)
+
+    def test_the_volume_field_skips_only_nova(self):
+        guest = SlowGuest(0)
+        instance, elapsed = self._load(5, guest,
+                                       fields=frozenset(['volume']))
+        self.assertTrue(elapsed < 1, "Took %.3fs." % elapsed)
+        self.assertEqual(1.5, instance.volume_used)
+
+
+class FailingServers(CountingServers):
+
+    def get(self, id):
+        if id == "server-broken":
+            raise nova_exceptions.ClientException(500, "Nova is down")
+        return super(FailingServers, self).get(id)
+
+
+class TestLoadInstancesWithGuest(tests.BaseTest):
+
+    def setUp(self):
+        super(TestLoadInstancesWithGuest, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None)
+        self.ids = []
+        servers = []
+        for index in range(5):
+            db_info = models.DBInstance.create(
+                name="instance-%d" % index, flavor_id=1, tenant_id="tenant",
+                compute_instance_id="server-%d" % index,
+                task_status=InstanceTasks.NONE)
+            models.InstanceServiceStatus.create(
+                instance_id=db_info.id, status=models.ServiceStatuses.RUNNING)
+            self.ids.append(db_info.id)
+            servers.append(FakeServer(db_info.compute_instance_id))
+        self.client = SlowNovaClient(servers, 0.2)
+        self.mock.stubs.Set(models, 'create_nova_client',
+                            lambda context: self.client)
+
+    def _load(self, ids, fields=None):
+        return models.load_instances_with_guest(models.DetailInstance,
+                                                self.context, ids,
+                                                fields=fields)
+
+    def test_rows_and_statuses_are_loaded_with_a_query_each(self):
+        start = time.time()
+        with tests.QueryRecorder() as counter:
+            instances, errors = self._load(self.ids)
+        elapsed = time.time() - start
+        self.assertEqual(1, counter.count("instances"))
+        self.assertEqual(1, counter.count("service_statuses"))
+        self.assertEqual({}, errors)
+        self.assertEqual(set(self.ids), set(instances.keys()))
+        for instance in instances.values():
+            self.assertEqual("ACTIVE", instance.status)
+        # The servers are got concurrently.
+        self.assertTrue(elapsed < 0.6, "Took %.3fs." % elapsed)
+
+    def test_instances_that_cannot_be_shown_get_errors(self):
+        other = models.DBInstance.create(
+            name="other", flavor_id=1, tenant_id="other-tenant",
+            compute_instance_id="server-other",
+            task_status=InstanceTasks.NONE)
+        models.InstanceServiceStatus.create(
+            instance_id=other.id, status=models.ServiceStatuses.RUNNING)
+        instances, errors = self._load(self.ids[:2] + [other.id, "missing"])
+        self.assertEqual(set(self.ids[:2]), set(instances.keys()))
+        self.assertEqual(set([other.id, "missing"]), set(errors.keys()))
+        for error in errors.values():
+            self.assertTrue(isinstance(error, exception.NotFound))
+
+    def test_shown_server_statuses_are_not_saved(self):
+        with db_api.unit_of_work():
+            instances, errors = self._load(self.ids[:1])
+            self.assertEqual("ACTIVE", instances[self.ids[0]].status)
+            # Saving anything in the unit of work flushes what's changed.
+            other = models.DBInstance.find_by(id=self.ids[1])
+            other.name = "renamed"
+            other.save()
+            db_info = instances[self.ids[0]].db_info
+            db_info.name = "renamed"
+            db_info.save()
+        for id in self.ids[:2]:
+            self.assertIsNone(models.DBInstance.find_by(id=id).server_status)
+
+    def test_nova_failures_only_fail_their_instance(self):
+        self.client.servers = FailingServers([FakeServer("server-0")])
+        broken = models.DBInstance.find_by(id=self.ids[1])
+        broken.compute_instance_id = "server-broken"
+        broken.save()
+        instances, errors = self._load(self.ids[:3])
+        self.assertEqual("ACTIVE", instances[self.ids[0]].status)
+        self.assertTrue(isinstance(errors[self.ids[1]],
+                                   exception.ReddwarfError))
+        self.assertEqual("SHUTDOWN",
+                         instances[self.ids[2]].db_info.shown_server_status)
+
+    def test_fields_without_the_status_skip_nova(self):
+        instances, errors = self._load(self.ids, fields=frozenset(['name']))
+        self.assertEqual(5, len(instances))
+        self.assertEqual(0, self.client.servers.get_calls)
+
+    def test_server_gets_are_limited_across_requests(self):
+        self.mock.stubs.Set(models, '_SERVER_GET_SEMAPHORE',
+                            eventlet.semaphore.Semaphore(2))
+        start = time.time()
+        threads = [eventlet.spawn(self._load, self.ids[:2]),
+                   eventlet.spawn(self._load, self.ids[2:4])]
+        for thread in threads:
+            thread.wait()
+        elapsed = time.time() - start
+        self.assertTrue(elapsed >= 0.4, "Took %.3fs." % elapsed)
+
+
+class TestInstanceFilters(tests.BaseTest):
+
+    def setUp(self):
+        super(TestInstanceFilters, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None, is_admin=True)
+        self.ids = {}
+        now = datetime.datetime(2012, 9, 20, 17, 0, 0)
+        for index, (name, flavor_id, task, status) in enumerate([
+                ("web-1", 1, InstanceTasks.NONE,
+                 models.ServiceStatuses.RUNNING),
+                ("web_2", 2, InstanceTasks.BUILDING,
+                 models.ServiceStatuses.NEW),
+                ("db-1", 2, InstanceTasks.NONE,
+                 models.ServiceStatuses.SHUTDOWN)]):
+            db_info = models.DBInstance.create(
+                name=name, flavor_id=flavor_id, tenant_id="tenant",
+                compute_instance_id="server-%d" % index, task_status=task)
+            db_info.created = now + datetime.timedelta(days=index)
+            db_info.save()
+            models.InstanceServiceStatus.create(instance_id=db_info.id,
+                                                status=status)
+            self.ids[name] = db_info.id
+        self.mock.stubs.Set(models, 'use_nova_notifications', lambda: True)
+
+    def _names(self, **params):
+        filters = models.InstanceFilters(params)
+        records, page = models.Instances.load_page(self.context,
+                                                   filters=filters)
+        return [record.name for record in records]
+
+    def test_the_default_is_oldest_first(self):
+        self.assertEqual(["web-1", "web_2", "db-1"], self._names())
+
+    def test_instances_can_be_sorted(self):
+        self.assertEqual(["web_2", "web-1", "db-1"],
+                         self._names(sort_key="name", sort_dir="desc"))
+
+    def test_filters_are_applied_in_the_query(self):
+        with tests.QueryRecorder() as counter:
+            names = self._names(name_prefix="web", flavor_id="2")
+        self.assertEqual(["web_2"], names)
+        self.assertTrue(any("LIKE" in statement
+                            for statement in counter.statements))
+
+    def test_name_prefixes_are_not_wildcards(self):
+        self.assertEqual(["web_2"], self._names(name_prefix="web_"))
+        self.assertEqual([], self._names(name_prefix="%"))
+
+    def test_statuses(self):
+        self.assertEqual(["web-1"], self._names(status="active"))
+        self.assertEqual(["web_2", "db-1"],
+                         self._names(task_status="building") +
+                         self._names(status="SHUTDOWN"))
+
+    def _add(self, name, task, status, server_status=None):
+        db_info = models.DBInstance.create(
+            name=name, flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server-%s" % name, task_status=task,
+            server_status=server_status)
+        models.InstanceServiceStatus.create(instance_id=db_info.id,
+                                            status=status)
+        return db_info
+
+    def test_new_services_are_building(self):
+        self._add("new", InstanceTasks.NONE, models.ServiceStatuses.NEW)
+        self.assertEqual(["web_2", "new"], self._names(status="BUILD"))
+        # Which is never listed as NEW.
+        self.assertRaises(exception.BadRequest, self._names, status="NEW")
+
+    def test_instances_with_a_task_running_are_not_active(self):
+        self._add("rebooting", InstanceTasks.REBOOTING,
+                  models.ServiceStatuses.RUNNING)
+        self.assertEqual(["web-1"], self._names(status="ACTIVE"))
+        self.assertEqual(["rebooting"], self._names(status="REBOOT"))
+
+    def test_statuses_are_those_listed(self):
+        self.mock.stubs.Set(models.LOG, 'error', lambda *args: None)
+        expected = {}
+        for task in InstanceTasks.__dict__.values():
+            if not isinstance(task, models.InstanceTask):
+                continue
+            for server_status in [None, "ACTIVE", "BUILD", "ERROR",
+                                  "SHUTDOWN", "VERIFY_RESIZE"]:
+                for status in [models.ServiceStatuses.RUNNING,
+                               models.ServiceStatuses.NEW,
+                               models.ServiceStatuses.PAUSED,
+                               models.ServiceStatuses.CRASHED]:
+                    db_info = self._add("instance", task, status,
+                                        server_status=server_status)
+                    shown = models.get_instance_status(db_info.id, task,
+                                                       server_status, status)
+                    expected.setdefault(shown, set()).add(db_info.id)
+        for name, id in self.ids.items():
+            db_info = models.DBInstance.find_by(id=id)
+            status = models.InstanceServiceStatus.find_by(instance_id=id)
+            shown = models.get_instance_status(id, db_info.task_status, None,
+                                               status.status)
+            expected.setdefault(shown, set()).add(id)
+        for status, ids in expected.items():
+            filters = models.InstanceFilters({'status': status})
+            found = models.DBInstance.find_all(tenant_id="tenant",
+                                               **filters.conditions)
+            self.assertEqual((status, ids),
+                             (status, set(db_info.id for db_info in found)))
+
+    def test_statuses_need_nova_notifications(self):
+        self.mock.stubs.Set(models, 'use_nova_notifications', lambda: False)
+        self.assertRaises(exception.BadRequest, models.InstanceFilters,
+                          {'status': "ACTIVE"})
+        models.InstanceFilters({'task_status': "building"})
+
+    def test_created_since(self):
+        self.assertEqual(["web_2", "db-1"],
+                         self._names(created_since="2012-09-21T17:00:00Z"))
+
+    def test_invalid_filters_are_bad_requests(self):
+        for params in [{'status': "NOPE"}, {'task_status': "NOPE"},
+                       {'sort_key': "tenant_id"}, {'sort_dir': "up"},
+                       {'created_since': "yesterday"}]:
+            self.assertRaises(exception.BadRequest, models.InstanceFilters,
+                              params)
+
+    def test_the_mgmt_list_is_filtered_and_sorted(self):
+        filters = models.InstanceFilters({'flavor_id': "2",
+                                          'sort_key': "name"})
+        records = mgmt_models.load_mgmt_instances(
+            self.context, fields=frozenset(['name']), filters=filters)
+        self.assertEqual(["db-1", "web_2"],
+                         [record.name for record in records])
+
+
+class TestVolumeUsageSamples(tests.BaseTest):
+
+    def setUp(self):
+        super(TestVolumeUsageSamples, self).setUp()
+        self.db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server", task_status=InstanceTasks.NONE,
+            volume_size=10)
+        self.status = models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id, status=models.ServiceStatuses.RUNNING)
+
+    def test_there_is_no_usage_without_a_sample(self):
+        self.assertIsNone(self.status.get_volume_used())
+
+    def test_recent_samples_are_used(self):
+        self.status.set_volume_usage(1024, 4096)
+        self.assertEqual(1024, self.status.get_volume_used())
+
+    def test_old_samples_are_ignored(self):
+        self.status.set_volume_usage(1024, 4096)
+        self.status.volume_updated_at -= datetime.timedelta(hours=1)
+        self.assertIsNone(self.status.get_volume_used())
+
+    def test_list_views_show_the_volume_used(self):
+        self.status.set_volume_usage(5 * 1024 ** 3, 10 * 1024 ** 3)
+        self.status.save()
+        instance = models.SimpleInstance(None, self.db_info, self.status)
+        self.mock.stubs.Set(views, 'create_links', lambda *args: [])
+        data = views.InstancesView([instance]).data()
+        self.assertEqual({'size': 10, 'used': 5.0},
+                         data['instances'][0]['volume'])
+
+
+class TestInstanceVersions(tests.BaseTest):
+
+    def setUp(self):
+        super(TestInstanceVersions, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None)
+        self.db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server", task_status=InstanceTasks.NONE)
+        self.status = models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id, status=models.ServiceStatuses.RUNNING)
+        self.old_flag = config.Config.instance.get('use_nova_notifications')
+        config.Config.instance['use_nova_notifications'] = 'True'
+
+    def tearDown(self):
+        if self.old_flag is None:
+            del config.Config.instance['use_nova_notifications']
+        else:
+            config.Config.instance['use_nova_notifications'] = self.old_flag
+        super(TestInstanceVersions, self).tearDown()
+
+    def _version(self):
+        return models.load_instance_version(self.context, self.db_info.id)
+
+    def test_saving_the_instance_bumps_its_version(self):
+        version = self._version()
+        db_info = models.DBInstance.find_by(id=self.db_info.id)
+        db_info.server_status = "ACTIVE"
+        db_info.save()
+        self.assertTrue(self._version() > version)
+
+    def test_saving_the_service_status_bumps_the_instance_version(self):
+        version = self._version()
+        self.status.set_status(models.ServiceStatuses.SHUTDOWN)
+        self.status.save()
+        self.assertTrue(self._version() > version)
+
+    def test_heartbeats_that_change_nothing_shown_keep_the_version(self):
+        self.status.set_volume_usage(5 * 1024 ** 3, 10 * 1024 ** 3)
+        self.status.save()
+        version = self._version()
+        self.status.set_status(models.ServiceStatuses.RUNNING)
+        self.status.set_volume_usage(5 * 1024 ** 3 + 1024, 10 * 1024 ** 3)
+        self.status.save()
+        self.assertEqual(version, self._version())
+
+    def test_changes_to_the_volume_used_shown_bump_the_version(self):
+        self.status.set_volume_usage(5 * 1024 ** 3, 10 * 1024 ** 3)
+        self.status.save()
+        version = self._version()
+        self.status.set_volume_usage(6 * 1024 ** 3, 10 * 1024 ** 3)
+        self.status.save()
+        self.assertTrue(self._version() > version)
+
+    def test_bulk_updates_bump_the_version(self):
+        version = self._version()
+        models.DBInstance.update_all_in('id', [self.db_info.id],
+                                        {'server_status': "ERROR"})
+        self.assertTrue(self._version() > version)
+
+    def test_other_tenants_instances_have_no_version(self):
+        other = context.ReddwarfContext(tenant="other", limit=None,
+                                        marker=None)
+        self.assertIsNone(models.load_instance_version(other,
+                                                       self.db_info.id))
+
+    def test_there_are_no_versions_when_nova_is_called(self):
+        config.Config.instance['use_nova_notifications'] = 'False'
+        self.assertIsNone(self._version())
+        self.assertIsNone(models.Instances.load_version(self.context))
+
+    def test_the_list_version_changes_when_instances_are_added(self):
+        version = models.Instances.load_version(self.context)
+        models.DBInstance.create(
+            name="another", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server-2", task_status=InstanceTasks.NONE)
+        self.assertNotEqual(version,
+                            models.Instances.load_version(self.context))
+
+
+class TestInstanceEvents(tests.BaseTest):
+
+    def setUp(self):
+        super(TestInstanceEvents, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None)
+        self.db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server", task_status=InstanceTasks.BUILDING)
+        self.status = models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id, status=models.ServiceStatuses.NEW)
+        config.Config.instance['instance_event_poll_interval'] = '0.05'
+
+    def tearDown(self):
+        del config.Config.instance['instance_event_poll_interval']
+        super(TestInstanceEvents, self).tearDown()
+
+    def _events(self, cursor=0):
+        return [(event.event_type, event.value) for event in
+                models.InstanceEvent.find_since(cursor,
+                                                instance_id=self.db_info.id)]
+
+    def _update_task(self, task_status, delay=0):
+        eventlet.sleep(delay)
+        db_info = models.DBInstance.find_by(id=self.db_info.id)
+        instance = models.BaseInstance(self.context, db_info, None,
+                                       self.status)
+        instance.update_db(task_status=task_status)
+
+    def test_update_db_records_transitions(self):
+        self._update_task(InstanceTasks.NONE)
+        self.assertEqual([('task_status', 'NONE')], self._events())
+
+    def test_service_statuses_are_only_recorded_when_they_change(self):
+        self.status.set_status(models.ServiceStatuses.RUNNING)
+        self.status.save()
+        self.status.set_status(models.ServiceStatuses.RUNNING)
+        self.status.save()
+        self.assertEqual([('service_status', 'running')], self._events())
+
+    def test_cursors_go_up(self):
+        self._update_task(InstanceTasks.NONE)
+        cursor = models.InstanceEvent.latest_cursor(tenant_id="tenant")
+        self._update_task(InstanceTasks.REBOOTING)
+        self.assertEqual([('task_status', 'REBOOTING')], self._events(cursor))
+
+    def test_waiting_ends_when_an_event_is_recorded(self):
+        eventlet.spawn(self._update_task, InstanceTasks.NONE, 0.1)
+        start = time.time()
+        events = models.InstanceEvent.wait_for_events(
+            0, 5, instance_id=self.db_info.id)
+        self.assertEqual(1, len(events))
+        self.assertTrue(time.time() - start < 1)
+
+    def test_waiting_gives_up_after_the_timeout(self):
+        events = models.InstanceEvent.wait_for_events(
+            0, 0.2, instance_id=self.db_info.id)
+        self.assertEqual([], events)
+
+    def test_waiting_backs_off(self):
+        config.Config.instance['instance_event_poll_interval'] = '0.01'
+        config.Config.instance['instance_event_max_poll_interval'] = '0.16'
+        try:
+            with tests.QueryRecorder() as counter:
+                models.InstanceEvent.wait_for_events(
+                    0, 0.5, instance_id=self.db_info.id)
+        finally:
+            del config.Config.instance['instance_event_max_poll_interval']
+        # Without backing off it would check about fifty times.
+        self.assertTrue(2 <= counter.count("instance_events") <= 8)
+
+    def test_wait_for_status_loads_the_instance_after_each_event(self):
+        loads = []
+
+        def load_instance_with_guest(cls, context, id, fields=None):
+            loads.append(fields)
+            db_info = models.DBInstance.find_by(id=id)
+            db_info.server_status = "ACTIVE"
+            return cls(context, db_info, self.status)
+
+        def guest_starts_mysql():
+            eventlet.sleep(0.1)
+            self.status.set_status(models.ServiceStatuses.RUNNING)
+            self.status.save()
+
+        self.mock.stubs.Set(models, 'load_instance_with_guest',
+                            load_instance_with_guest)
+        self._update_task(InstanceTasks.NONE)
+        eventlet.spawn(guest_starts_mysql)
+        instance = models.wait_for_instance_status(
+            models.DetailInstance, self.context, self.db_info.id, "ACTIVE", 5,
+            fields=frozenset(['name']))
+        self.assertEqual("ACTIVE", instance.status)
+        self.assertEqual([frozenset(['name', 'status'])] * 2, loads)
+
+    def test_changes_without_a_cursor_return_the_latest_cursor(self):
+        self._update_task(InstanceTasks.NONE)
+        events, cursor = models.load_instance_changes(self.context, None, 5,
+                                                      20)
+        self.assertEqual([], events)
+        self.assertEqual(models.InstanceEvent.latest_cursor(), cursor)
+
+    def test_changes_are_for_the_tenant(self):
+        other = context.ReddwarfContext(tenant="other", limit=None,
+                                        marker=None)
+        self._update_task(InstanceTasks.NONE)
+        events, cursor = models.load_instance_changes(other, 0, 0, 20)
+        self.assertEqual([], events)
+        events, cursor = models.load_instance_changes(self.context, 0, 0, 20)
+        self.assertEqual([events[-1].id], [cursor])
+
+    def test_old_events_are_pruned(self):
+        self._update_task(InstanceTasks.NONE)
+        models.InstanceEvent.find_all().update(
+            created=datetime.datetime(2000, 1, 1))
+        self._update_task(InstanceTasks.REBOOTING)
+        self.assertEqual(1, models.InstanceEvent.prune())
+        self.assertEqual([('task_status', 'REBOOTING')], self._events())
+
+
+class TestUpdateDb(tests.BaseTest):
+
+    def setUp(self):
+        super(TestUpdateDb, self).setUp()
+        self.context = context.ReddwarfContext(tenant="tenant", limit=None,
+                                               marker=None)
+        models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server", task_status=InstanceTasks.RESIZING)
+        self.db_info = models.DBInstance.find_by(tenant_id="tenant")
+
+    def _instance(self, db_info=None):
+        return models.BaseInstance(self.context, db_info or self.db_info,
+                                   None, None)
+
+    def _reload(self):
+        return models.DBInstance.find_by(id=self.db_info.id)
+
+    def test_updates_are_a_single_statement(self):
+        instance = self._instance()
+        with tests.QueryRecorder() as counter:
+            instance.update_db(task_status=InstanceTasks.NONE)
+        writes = [statement for statement in counter.statements
+                  if "instance_events" not in statement]
+        self.assertEqual(1, len(writes))
+        self.assertTrue(writes[0].startswith("UPDATE instances"))
+        self.assertEqual(InstanceTasks.NONE, self._reload().task_status)
+        self.assertEqual(self._reload().version, instance.db_info.version)
+
+    def test_updates_are_retried_over_changes_to_other_values(self):
+        models.DBInstance.update_all_in('id', [self.db_info.id],
+                                        {'server_status': "ACTIVE"})
+        self._instance().update_db(task_status=InstanceTasks.NONE)
+        db_info = self._reload()
+        self.assertEqual(InstanceTasks.NONE, db_info.task_status)
+        self.assertEqual("ACTIVE", db_info.server_status)
+
+    def test_changes_to_the_same_values_are_not_overwritten(self):
+        self._instance(self._reload()).update_db(
+            task_status=InstanceTasks.DELETING)
+        self.assertRaises(exception.ModelVersionConflict,
+                          self._instance().update_db,
+                          task_status=InstanceTasks.NONE)
+        self.assertEqual(InstanceTasks.DELETING, self._reload().task_status)
+
+    def _update_elsewhere(self, **values):
+        # Another green thread has a unit of work, and a session, of its own.
+        eventlet.spawn(models.DBInstance.update_all_in, 'id',
+                       [self.db_info.id], values).wait()
+
+    def test_updates_in_a_unit_of_work_are_retried(self):
+        with db_api.unit_of_work():
+            instance = self._instance(self._reload())
+            self._update_elsewhere(server_status="ACTIVE")
+            instance.update_db(task_status=InstanceTasks.NONE)
+        db_info = self._reload()
+        self.assertEqual(InstanceTasks.NONE, db_info.task_status)
+        self.assertEqual("ACTIVE", db_info.server_status)
+
+    def test_changes_in_a_unit_of_work_are_not_overwritten(self):
+        with db_api.unit_of_work():
+            instance = self._instance(self._reload())
+            self._update_elsewhere(task_id=InstanceTasks.DELETING.code)
+            self.assertRaises(exception.ModelVersionConflict,
+                              instance.update_db,
+                              task_status=InstanceTasks.NONE)
+        self.assertEqual(InstanceTasks.DELETING, self._reload().task_status)
+
+    def test_update_where_checks_the_version(self):
+        version = self.db_info.version
+        models.DBInstance.update_where(self.db_info.id, version,
+                                       name="renamed")
+        self.assertRaises(exception.ModelVersionConflict,
+                          models.DBInstance.update_where, self.db_info.id,
+                          version, name="again")
+        db_info = self._reload()
+        self.assertEqual("renamed", db_info.name)
+        self.assertEqual(version + 1, db_info.version)
+
+
+class TestServiceImageCache(tests.BaseTest):
+
+    def setUp(self):
+        super(TestServiceImageCache, self).setUp()
+        models.ServiceImage.clear_cache()
+        self.image = models.ServiceImage.create(service_name="mysql",
+                                                image_id="image-1")
+
+    def tearDown(self):
+        models.ServiceImage.clear_cache()
+        super(TestServiceImageCache, self).tearDown()
+
+    def _change_image(self):
+        self.image.image_id = "image-2"
+        self.image.save()
+
+    def test_image_ids_are_cached(self):
+        self.assertEqual("image-1", models.ServiceImage.find_image_id("mysql"))
+        self._change_image()
+        with tests.QueryRecorder() as counter:
+            image_id = models.ServiceImage.find_image_id("mysql")
+        self.assertEqual("image-1", image_id)
+        self.assertEqual([], counter.statements)
+
+    def test_reloading_the_config_clears_the_cache(self):
+        models.ServiceImage.find_image_id("mysql")
+        self._change_image()
+        for hook in config.Config._reload_hooks:
+            hook()
+        self.assertEqual("image-2", models.ServiceImage.find_image_id("mysql"))
+
+    def test_unknown_services_are_not_found(self):
+        self.assertRaises(exception.ModelNotFoundError,
+                          models.ServiceImage.find_image_id, "postgres")
@@ -0,0 +1,102 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import context
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+from reddwarf.taskmanager import notifications
+
+
+def nova_notification(event_type, server_id, state, task_state=None):
+    """Builds a message like the ones Nova sends for compute events."""
+    return {
+        'message_id': 'fake-message-id',
+        'event_type': event_type,
+        'priority': 'INFO',
+        'publisher_id': 'compute.fake_host',
+        'payload': {
+            'instance_id': server_id,
+            'tenant_id': 'tenant',
+            'host': 'fake_host',
+            'state': state,
+            'state_description': task_state or '',
+            'fixed_ips': [{'address': '10.0.0.4', 'label': 'private',
+                           'version': 4, 'type': 'fixed'}],
+        },
+    }
+
+
+class TestNovaNotificationConsumer(tests.BaseTest):
+
+    def setUp(self):
+        super(TestNovaNotificationConsumer, self).setUp()
+        self.consumer = notifications.NovaNotificationConsumer()
+        self.db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server-id", task_status=InstanceTasks.NONE)
+        models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id,
+            status=models.ServiceStatuses.RUNNING)
+        self.old_flag = config.Config.instance.get('use_nova_notifications')
+        config.Config.instance['use_nova_notifications'] = 'True'
+
+    def tearDown(self):
+        if self.old_flag is None:
+            del config.Config.instance['use_nova_notifications']
+        else:
+            config.Config.instance['use_nova_notifications'] = self.old_flag
+        super(TestNovaNotificationConsumer, self).tearDown()
+
+    def test_update_records_server_info(self):
+        self.consumer(nova_notification('compute.instance.update',
+                                        'server-id', 'active'))
+        db_info = models.DBInstance.find_by(id=self.db_info.id)
+        self.assertEqual("ACTIVE", db_info.server_status)
+        self.assertEqual("fake_host", db_info.host)
+        self.assertEqual({'private': [{'addr': '10.0.0.4', 'version': 4}]},
+                         db_info.get_server_addresses())
+
+    def test_task_state_changes_the_status(self):
+        self.consumer(nova_notification('compute.instance.update',
+                                        'server-id', 'active', 'rebooting'))
+        db_info = models.DBInstance.find_by(id=self.db_info.id)
+        self.assertEqual("REBOOT", db_info.server_status)
+
+    def test_other_events_are_ignored(self):
+        self.consumer(nova_notification('volume.create.end',
+                                        'server-id', 'active'))
+        db_info = models.DBInstance.find_by(id=self.db_info.id)
+        self.assertIsNone(db_info.server_status)
+
+    def test_unknown_servers_are_ignored(self):
+        self.consumer(nova_notification('compute.instance.update',
+                                        'not-reddwarf', 'active'))
+        db_info = models.DBInstance.find_by(id=self.db_info.id)
+        self.assertIsNone(db_info.server_status)
+
+    def test_instances_load_reads_status_from_the_db(self):
+        self.consumer(nova_notification('compute.instance.update',
+                                        'server-id', 'error'))
+        # Any call to Nova will fail since the stub has no expectations.
+        self.mock.StubOutWithMock(models, 'create_nova_client')
+        self.mock.ReplayAll()
+        ctx = context.ReddwarfContext(tenant="tenant", limit=None,
+                                      marker=None)
+        instances, marker = models.Instances.load(ctx)
+        self.assertEqual(1, len(instances))
+        self.assertEqual("ERROR", instances[0].status)
@@ -0,0 +1,122 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from reddwarf import tests
+from reddwarf.common import exception
+from reddwarf.common import pagination
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+
+
+class TestMarkers(tests.BaseTest):
+
+    def test_markers_keep_their_values(self):
+        created = datetime.datetime(2012, 6, 1, 12, 30, 15, 250)
+        marker = pagination.encode_marker([created, "id-1", 3], 'previous')
+        self.assertEqual(('previous', [created, "id-1", 3]),
+                         pagination.decode_marker(marker))
+
+    def test_markers_are_url_safe(self):
+        marker = pagination.encode_marker(["?&/+= ", 1])
+        self.assertEqual(marker, pagination.AppUrl("").change_query_params(
+            marker=marker).url.split("marker=")[1])
+
+    def test_other_strings_are_not_markers(self):
+        self.assertIsNone(pagination.decode_marker(
+            "2f3a7d5e-1ce5-4e27-a34c-8bd4bf3e7d44"))
+        self.assertIsNone(pagination.decode_marker("e30"))
+
+
+class TestPaginate(tests.BaseTest):
+
+    def setUp(self):
+        super(TestPaginate, self).setUp()
+        start = datetime.datetime(2012, 1, 1)
+        self.ids = []
+        for index in range(7):
+            db_info = models.DBInstance.create(
+                name="instance-%d" % index, flavor_id=1, tenant_id="tenant",
+                task_status=InstanceTasks.NONE)
+            # Pairs of instances share a creation time, so the id has to
+            # break the ties.
+            db_info.created = start + datetime.timedelta(minutes=index / 2)
+            db_info.save()
+        self.ids = [db_info.id for db_info in
+                    sorted(models.DBInstance.find_all(tenant_id="tenant"),
+                           key=lambda db_info: (db_info.created, db_info.id))]
+
+    def _paginate(self, marker=None, **kwargs):
+        query = models.DBInstance.find_all(tenant_id="tenant", deleted=False)
+        return query.paginate(limit=3, marker=marker,
+                              sort_keys=('created', 'id'), **kwargs)
+
+    def _ids(self, page):
+        return [db_info.id for db_info in page]
+
+    def test_pages_follow_the_sort_keys(self):
+        first = self._paginate()
+        self.assertEqual(self.ids[0:3], self._ids(first))
+        self.assertIsNone(first.previous_marker)
+        second = self._paginate(first.next_marker)
+        self.assertEqual(self.ids[3:6], self._ids(second))
+        last = self._paginate(second.next_marker)
+        self.assertEqual(self.ids[6:], self._ids(last))
+        self.assertIsNone(last.next_marker)
+
+    def test_previous_markers_go_back(self):
+        first = self._paginate()
+        second = self._paginate(first.next_marker)
+        last = self._paginate(second.next_marker)
+        back = self._paginate(last.previous_marker)
+        self.assertEqual(self.ids[3:6], self._ids(back))
+        self.assertEqual(self.ids[6:],
+                         self._ids(self._paginate(back.next_marker)))
+        front = self._paginate(back.previous_marker)
+        self.assertEqual(self.ids[0:3], self._ids(front))
+        self.assertIsNone(front.previous_marker)
+        self.assertEqual(self.ids[3:6],
+                         self._ids(self._paginate(front.next_marker)))
+
+    def test_descending_pages(self):
+        first = self._paginate(sort_dir='desc')
+        self.assertEqual(self.ids[6:3:-1], self._ids(first))
+        second = self._paginate(first.next_marker, sort_dir='desc')
+        self.assertEqual(self.ids[3:0:-1], self._ids(second))
+        back = self._paginate(second.previous_marker, sort_dir='desc')
+        self.assertEqual(self._ids(first), self._ids(back))
+
+    def test_plain_ids_are_taken_as_the_last_row_seen(self):
+        page = self._paginate(self.ids[2])
+        self.assertEqual(self.ids[3:6], self._ids(page))
+
+    def test_unknown_markers_are_bad_requests(self):
+        self.assertRaises(exception.BadRequest, self._paginate, "not-an-id")
+
+    def test_total_is_only_counted_when_asked_for(self):
+        with tests.QueryRecorder() as counter:
+            page = self._paginate()
+        self.assertIsNone(page.total)
+        self.assertEqual(1, len(counter.statements))
+        self.assertEqual(7, self._paginate(with_count=True).total)
+
+    def test_columns_are_projected(self):
+        page = self._paginate(columns=['id', 'version'])
+        self.assertEqual(self.ids[0:3], [row.id for row in page])
+        self.assertEqual(self.ids[3:6], [
+            row.id for row in self._paginate(page.next_marker,
+                                             columns=['id'])])
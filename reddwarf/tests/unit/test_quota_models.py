@@ -0,0 +1,221 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import exception
+from reddwarf.instance import models as instance_models
+from reddwarf.instance.tasks import InstanceTasks
+from reddwarf.quota import models
+from reddwarf.taskmanager import models as task_models
+
+
+class TestQuotas(tests.BaseTest):
+
+    def setUp(self):
+        super(TestQuotas, self).setUp()
+        self.old_values = dict(config.Config.instance)
+        config.Config.instance['max_instances_per_user'] = '2'
+        config.Config.instance['max_volume_gb_per_user'] = '10'
+        self.counts = []
+
+    def tearDown(self):
+        config.Config.instance.clear()
+        config.Config.instance.update(self.old_values)
+        super(TestQuotas, self).tearDown()
+
+    def _count_usage(self, resource):
+        self.counts.append(resource)
+        return 0
+
+    def _usage(self, resource):
+        usage = models.QuotaUsage.find_by(tenant_id="tenant",
+                                          resource=resource)
+        return usage.in_use, usage.reserved
+
+    def _reserve(self, instances=1, volumes_gb=0):
+        return models.reserve("tenant", {'instances': instances,
+                                         'volumes_gb': volumes_gb},
+                              self._count_usage)
+
+    def test_usage_is_only_counted_once(self):
+        self._reserve(volumes_gb=1).commit()
+        self._reserve(volumes_gb=1).commit()
+        self.assertEqual(['instances', 'volumes_gb'], self.counts)
+        self.assertEqual((2, 0), self._usage('instances'))
+        self.assertEqual((2, 0), self._usage('volumes_gb'))
+
+    def test_reservations_count_against_the_quota(self):
+        self._reserve()
+        self._reserve()
+        self.assertRaises(exception.QuotaExceeded, self._reserve)
+        self.assertEqual((0, 2), self._usage('instances'))
+
+    def test_rolled_back_reservations_are_given_back(self):
+        self._reserve().rollback()
+        self.assertEqual((0, 0), self._usage('instances'))
+
+    def test_nothing_is_reserved_if_any_quota_is_exceeded(self):
+        self.assertRaises(exception.VolumeQuotaExceeded, self._reserve,
+                          volumes_gb=11)
+        self.assertEqual((0, 0), self._usage('instances'))
+        self.assertEqual((0, 0), self._usage('volumes_gb'))
+
+    def test_expired_reservations_are_given_back_once(self):
+        config.Config.instance['quota_reservation_expiry'] = '-1'
+        reservation = self._reserve()
+        self._reserve(volumes_gb=1).commit()
+        self.assertEqual(1, models.expire_reservations())
+        self.assertEqual((1, 0), self._usage('instances'))
+        reservation.commit()
+        self.assertEqual((1, 0), self._usage('instances'))
+        self.assertEqual(0, models.expire_reservations())
+
+    def test_reservations_are_kept_until_they_expire(self):
+        reservation = self._reserve()
+        self.assertEqual(0, models.expire_reservations())
+        models.Reservation.load("tenant", reservation.ids).commit()
+        self.assertEqual((1, 0), self._usage('instances'))
+
+    def test_released_usage_makes_room(self):
+        self._reserve().commit()
+        self._reserve().commit()
+        models.release("tenant", {'instances': 1})
+        self._reserve()
+        self.assertEqual((1, 1), self._usage('instances'))
+
+    def test_existing_instances_are_counted(self):
+        for volume_size in (2, 3):
+            instance_models.DBInstance.create(
+                name="instance", flavor_id=1, tenant_id="tenant",
+                volume_size=volume_size, task_status=InstanceTasks.NONE)
+        count_usage = instance_models.load_tenant_usage("tenant")
+        self.assertEqual(2, count_usage('instances'))
+        self.assertEqual(5, count_usage('volumes_gb'))
+        self.assertRaises(exception.QuotaExceeded, models.reserve, "tenant",
+                          {'instances': 1}, count_usage)
+
+
+class FakeVolume(object):
+
+    def __init__(self, size):
+        self.size = size
+        self.status = 'in-use'
+
+
+class FakeVolumes(object):
+
+    def __init__(self, size):
+        self.volume = FakeVolume(size)
+        self.fail = False
+
+    def resize(self, volume_id, size):
+        if self.fail:
+            raise Exception("The volume could not be resized.")
+        self.volume.size = size
+
+    def get(self, volume_id):
+        return self.volume
+
+
+class FakeVolumeClient(object):
+
+    def __init__(self, size):
+        self.volumes = FakeVolumes(size)
+
+
+class FakeGuest(object):
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class TestVolumeResizeQuotas(tests.BaseTest):
+
+    def setUp(self):
+        super(TestVolumeResizeQuotas, self).setUp()
+        self.old_values = dict(config.Config.instance)
+        config.Config.instance['max_instances_per_user'] = '2'
+        config.Config.instance['max_volume_gb_per_user'] = '20'
+        self.casts = []
+        self.mock.stubs.Set(instance_models.task_api.API, 'resize_volume',
+                            lambda api, *args, **kwargs:
+                            self.casts.append(kwargs))
+        self.mock.stubs.Set(instance_models.task_api.API, '_cast',
+                            lambda *args, **kwargs: None)
+        context = type("Context", (object,), {'tenant': "tenant"})()
+        # As Instance.create uses the quota.
+        models.reserve("tenant", {'instances': 1, 'volumes_gb': 10},
+                       lambda resource: 0).commit()
+        self.db_info = instance_models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant", volume_size=10,
+            task_status=InstanceTasks.NONE)
+        status = instance_models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id,
+            status=instance_models.ServiceStatuses.RUNNING)
+        self.instance = instance_models.Instance(context, self.db_info, None,
+                                                 status)
+        self.mock.stubs.Set(self.instance, '_validate_can_perform_action',
+                            lambda: None)
+        self.tasks = task_models.BuiltInstanceTasks(context, self.db_info,
+                                                    None, status)
+        self.tasks.server = type("Server", (object,), {'id': "server"})()
+        self.tasks._volume_client = FakeVolumeClient(10)
+        self.tasks._nova_client = type("Nova", (object,),
+                                       {'volumes': FakeGuest()})()
+        self.tasks._guest = FakeGuest()
+        self.mock.stubs.Set(self.tasks, 'get_volume_mountpoint',
+                            lambda: "/dev/vdb")
+        self.mock.stubs.Set(self.tasks, 'get_guest', FakeGuest)
+        self.mock.stubs.Set(self.tasks, '_delete_resources', lambda: None)
+
+    def tearDown(self):
+        config.Config.instance.clear()
+        config.Config.instance.update(self.old_values)
+        super(TestVolumeResizeQuotas, self).tearDown()
+
+    def _usage(self, resource):
+        usage = models.QuotaUsage.find_by(tenant_id="tenant",
+                                          resource=resource)
+        return usage.in_use, usage.reserved
+
+    def test_resizes_are_quota_checked(self):
+        self.assertRaises(exception.VolumeQuotaExceeded,
+                          self.instance.resize_volume, 31)
+        self.assertEqual((10, 0), self._usage('volumes_gb'))
+
+    def test_usage_follows_the_volume_through_a_resize(self):
+        self.instance.resize_volume(15)
+        self.assertEqual((10, 5), self._usage('volumes_gb'))
+        self.tasks.resize_volume(15, **self.casts[0])
+        self.assertEqual((15, 0), self._usage('volumes_gb'))
+        self.tasks.delete_async()
+        self.assertEqual((0, 0), self._usage('volumes_gb'))
+
+    def test_failed_resizes_give_back_the_reservation(self):
+        self.instance.resize_volume(15)
+        self.tasks._volume_client.volumes.fail = True
+        self.assertRaises(Exception, self.tasks.resize_volume, 15,
+                          **self.casts[0])
+        self.assertEqual((10, 0), self._usage('volumes_gb'))
+
+    def test_resizes_after_the_reservation_expired(self):
+        config.Config.instance['quota_reservation_expiry'] = '-1'
+        self.instance.resize_volume(15)
+        self.assertEqual(1, models.expire_reservations())
+        self.assertEqual((10, 0), self._usage('volumes_gb'))
+        self.tasks.resize_volume(15, **self.casts[0])
+        self.assertEqual((15, 0), self._usage('volumes_gb'))
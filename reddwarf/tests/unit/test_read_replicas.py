@@ -0,0 +1,100 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+
+from reddwarf import tests
+from reddwarf.db.sqlalchemy import session
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+
+
+class TestReadReplicas(tests.BaseTest):
+
+    def setUp(self):
+        super(TestReadReplicas, self).setUp()
+        self.db_info = models.DBInstance.create(
+            name="replica-0", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server", task_status=InstanceTasks.NONE)
+        # Two copies of the database standing in for replicas, which are
+        # told apart by the instance's name.
+        self.directory = tempfile.mkdtemp()
+        connections = []
+        for index in range(2):
+            self._rename("replica-%d" % index)
+            path = os.path.join(self.directory, "replica-%d.sqlite" % index)
+            shutil.copy(session._ENGINE.url.database, path)
+            connections.append("sqlite:///%s" % path)
+        self._rename("primary")
+        session._configure_read_replicas(
+            {'sql_read_connection': ", ".join(connections)})
+
+    def tearDown(self):
+        session._configure_read_replicas({})
+        shutil.rmtree(self.directory)
+        super(TestReadReplicas, self).tearDown()
+
+    def _rename(self, name):
+        models.DBInstance.find_all(id=self.db_info.id).update(name=name)
+
+    def _read_name(self):
+        return models.DBInstance.find_by(id=self.db_info.id).name
+
+    def test_reads_take_the_replicas_in_turn(self):
+        names = [self._read_name() for index in range(4)]
+        self.assertEqual(sorted(["replica-0", "replica-1"] * 2),
+                         sorted(names))
+        self.assertNotEqual(names[0], names[1])
+        self.assertEqual(names[0], names[2])
+
+    def test_writes_go_to_the_primary(self):
+        created = models.DBInstance.create(
+            name="new", flavor_id=1, tenant_id="tenant",
+            compute_instance_id="new-server", task_status=InstanceTasks.NONE)
+        primary = session.get_session().query(models.DBInstance)
+        self.assertEqual("new", primary.filter_by(id=created.id).one().name)
+        self.assertIsNone(models.DBInstance.get_by(id=created.id))
+
+    def test_a_unit_of_work_reads_its_own_writes(self):
+        with session.unit_of_work():
+            first = self._read_name()
+            self.assertTrue(first.startswith("replica-"))
+            # It keeps the same replica until it writes.
+            self.assertEqual(first, self._read_name())
+            models.InstanceServiceStatus.create(
+                instance_id=self.db_info.id,
+                status=models.ServiceStatuses.RUNNING)
+            self.assertEqual("primary", self._read_name())
+            self.assertIsNotNone(models.InstanceServiceStatus.find_by(
+                instance_id=self.db_info.id))
+        # The next unit of work starts on a replica again.
+        with session.unit_of_work():
+            self.assertTrue(self._read_name().startswith("replica-"))
+
+    def test_updating_a_replica_read_model_writes_to_the_primary(self):
+        with session.unit_of_work():
+            db_info = models.DBInstance.find_by(id=self.db_info.id)
+            db_info.task_status = InstanceTasks.REBOOTING
+            db_info.save()
+        primary = session.get_session().query(models.DBInstance)
+        self.assertEqual(InstanceTasks.REBOOTING.code,
+                         primary.filter_by(id=self.db_info.id).one().task_id)
+
+    def test_without_replicas_reads_use_the_primary(self):
+        session._configure_read_replicas({'sql_read_connection': ''})
+        self.assertEqual("primary", self._read_name())
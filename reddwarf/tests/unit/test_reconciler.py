@@ -0,0 +1,140 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import utils
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+from reddwarf.taskmanager import reconciler
+from reddwarf.tests.unit.test_instance_models import FakeServer
+
+
+class FakeRdServers(object):
+
+    def __init__(self, servers):
+        self.servers = servers
+
+    def list(self):
+        return self.servers
+
+
+class FakeAdminClient(object):
+
+    def __init__(self, servers):
+        self.rdservers = FakeRdServers(servers)
+
+
+class TestServerReconciler(tests.BaseTest):
+
+    def setUp(self):
+        super(TestServerReconciler, self).setUp()
+        self.reconciler = reconciler.ServerReconciler(context=object())
+
+    def _create_instance(self, server_id, server_status="ACTIVE",
+                         task_status=InstanceTasks.NONE):
+        db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            compute_instance_id=server_id, task_status=task_status)
+        db_info.server_status = server_status
+        return db_info.save()
+
+    def _run(self, servers):
+        self.mock.StubOutWithMock(reconciler, 'create_admin_nova_client')
+        reconciler.create_admin_nova_client(self.reconciler.context)\
+            .AndReturn(FakeAdminClient(servers))
+        self.notifications = []
+        self.mock.stubs.Set(reconciler.rpc, 'notify',
+                            lambda context, topic, message:
+                            self.notifications.append((topic, message)))
+        self.mock.ReplayAll()
+        return self.reconciler.run()
+
+    def test_changed_statuses_are_updated_in_bulk(self):
+        ids = [self._create_instance("server-%d" % i).id for i in range(4)]
+        servers = [FakeServer("server-0", "ACTIVE"),
+                   FakeServer("server-1", "SHUTOFF"),
+                   FakeServer("server-2", "SHUTOFF"),
+                   FakeServer("server-3", "ERROR")]
+        with tests.QueryRecorder() as counter:
+            report = self._run(servers)
+        self.assertEqual(3, report.updated_count)
+        # One executemany for all of them.
+        self.assertEqual(1, len([statement
+                                 for statement in counter.statements
+                                 if statement.startswith("UPDATE")]))
+        statuses = [models.DBInstance.find_by(id=id).server_status
+                    for id in ids]
+        self.assertEqual(["ACTIVE", "SHUTOFF", "SHUTOFF", "ERROR"], statuses)
+
+    def test_drift_is_reported(self):
+        self._create_instance("server-0")
+        gone = self._create_instance("server-gone")
+        self._create_instance(None, server_status=None,
+                              task_status=InstanceTasks.BUILDING)
+        report = self._run([FakeServer("server-0"),
+                            FakeServer("server-orphan")])
+        self.assertEqual(["server-orphan"], report.orphan_servers)
+        self.assertEqual([gone.id], report.missing_servers)
+        self.assertEqual([], report.stuck_tasks)
+        self.assertTrue(report.has_drift)
+        self.assertEqual(2, report.server_count)
+        self.assertEqual(3, report.instance_count)
+        self.assertIsNotNone(report.duration)
+
+    def test_servers_of_instances_being_created_are_not_orphans(self):
+        self._create_instance(None, server_status=None,
+                              task_status=InstanceTasks.BUILDING)
+        server = FakeServer("server-new")
+        server.name = "instance"
+        report = self._run([server])
+        self.assertEqual([], report.orphan_servers)
+
+    def test_reports_are_sent_as_notifications(self):
+        self._create_instance("server-gone")
+        report = self._run([FakeServer("server-orphan")])
+        self.assertEqual(1, len(self.notifications))
+        topic, message = self.notifications[0]
+        self.assertEqual("notifications.warn", topic)
+        self.assertEqual("reddwarf.server_reconcile", message['event_type'])
+        payload = message['payload']
+        self.assertEqual(1, payload['orphan_server_count'])
+        self.assertEqual(1, payload['missing_server_count'])
+        self.assertEqual(report.duration, payload['duration'])
+
+    def test_old_tasks_are_reported_as_stuck(self):
+        db_info = self._create_instance("server-0",
+                                        task_status=InstanceTasks.REBOOTING)
+        two_hours_ago = utils.utcnow() - datetime.timedelta(hours=2)
+        models.DBInstance.find_all(id=db_info.id).update(
+            updated=two_hours_ago)
+        report = self._run([FakeServer("server-0")])
+        self.assertEqual([(db_info.id, InstanceTasks.REBOOTING.db_text)],
+                         report.stuck_tasks)
+
+    def test_sweeps_are_off_by_default(self):
+        self.assertFalse(self.reconciler.is_due())
+
+    def test_sweeps_wait_for_the_interval(self):
+        config.Config.instance['server_reconcile_interval'] = '600'
+        try:
+            self.assertTrue(self.reconciler.is_due())
+            self.reconciler.last_run = reconciler.time.time()
+            self.assertFalse(self.reconciler.is_due())
+        finally:
+            del config.Config.instance['server_reconcile_interval']
@@ -0,0 +1,144 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import webob
+import webob.dec
+
+from reddwarf import tests
+from reddwarf.common import service
+from reddwarf.common import wsgi
+from reddwarf.db import db_api
+from reddwarf.db.sqlalchemy import session
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+
+
+class TestUnitOfWork(tests.BaseTest):
+
+    def setUp(self):
+        super(TestUnitOfWork, self).setUp()
+        self.db_info = models.DBInstance.create(
+            name="instance", flavor_id=1, tenant_id="tenant",
+            task_status=InstanceTasks.NONE)
+        models.InstanceServiceStatus.create(
+            instance_id=self.db_info.id, status=models.ServiceStatuses.NEW)
+
+    def _selects(self, counter):
+        return [statement for statement in counter.statements
+                if statement.lstrip().startswith("SELECT")]
+
+    def _run_task(self):
+        # Roughly what a task does to an instance.
+        db_info = models.DBInstance.find_by(id=self.db_info.id)
+        db_info.name = "renamed"
+        db_info.save()
+        db_info = models.DBInstance.find_by(id=self.db_info.id,
+                                            tenant_id="tenant")
+        db_info.task_status = InstanceTasks.REBOOTING
+        db_info.save()
+        status = models.InstanceServiceStatus.find_by(
+            instance_id=self.db_info.id)
+        status.set_status(models.ServiceStatuses.RUNNING)
+        status.save()
+
+    def test_new_models_are_saved_without_a_select(self):
+        with tests.QueryRecorder() as counter:
+            models.DBInstance.create(name="other", flavor_id=1,
+                                     tenant_id="tenant",
+                                     task_status=InstanceTasks.NONE)
+        self.assertEqual([], self._selects(counter))
+
+    def test_a_unit_of_work_runs_fewer_statements(self):
+        with tests.QueryRecorder() as without_unit:
+            self._run_task()
+        with tests.QueryRecorder() as with_unit:
+            with db_api.unit_of_work():
+                self._run_task()
+        self.assertTrue(len(with_unit.statements) <
+                        len(without_unit.statements))
+        # The second lookup by id and both saves need no SELECT.
+        self.assertEqual(2, len(self._selects(with_unit)))
+
+    def test_lookups_by_id_check_the_other_conditions(self):
+        with db_api.unit_of_work():
+            models.DBInstance.find_by(id=self.db_info.id)
+            self.assertIsNone(models.DBInstance.get_by(id=self.db_info.id,
+                                                       tenant_id="other"))
+
+    def test_queries_see_what_other_green_threads_save(self):
+
+        def rename():
+            db_info = models.DBInstance.find_by(id=self.db_info.id)
+            db_info.name = "renamed"
+            db_info.save()
+
+        with db_api.unit_of_work():
+            models.DBInstance.find_by(id=self.db_info.id)
+            eventlet.spawn(rename).wait()
+            found = models.DBInstance.find_all(tenant_id="tenant").all()
+            self.assertEqual("renamed", found[0].name)
+
+    def test_bulk_updates_reload_the_models(self):
+        with db_api.unit_of_work():
+            db_info = models.DBInstance.find_by(id=self.db_info.id)
+            models.DBInstance.update_all_in('id', [self.db_info.id],
+                                            {'server_status': "SHUTOFF"})
+            self.assertEqual("SHUTOFF", models.DBInstance.find_by(
+                id=self.db_info.id).server_status)
+
+    def test_units_of_work_nest(self):
+        with db_api.unit_of_work():
+            shared = session.get_session()
+            with db_api.unit_of_work():
+                self.assertTrue(session.get_session() is shared)
+            self.assertTrue(session.get_session() is shared)
+        self.assertFalse(session.in_unit_of_work())
+        self.assertFalse(session.get_session() is shared)
+
+    def test_manager_methods_run_in_a_unit_of_work(self):
+
+        class Manager(service.Manager):
+
+            def method(self, context):
+                return session.in_unit_of_work()
+
+        self.assertTrue(Manager().wrapper('method', None))
+
+    def test_requests_run_in_a_unit_of_work(self):
+
+        @webob.dec.wsgify
+        def app(req):
+            return str(session.in_unit_of_work())
+
+        middleware = wsgi.UnitOfWorkMiddleware(app)
+        response = webob.Request.blank("/").get_response(middleware)
+        self.assertEqual("True", response.body)
+
+    def test_streamed_bodies_are_made_in_the_unit_of_work(self):
+
+        def body():
+            yield str(session.in_unit_of_work())
+
+        @webob.dec.wsgify
+        def app(req):
+            return webob.Response(app_iter=body())
+
+        middleware = wsgi.UnitOfWorkMiddleware(app)
+        response = webob.Request.blank("/").get_response(middleware)
+        self.assertEqual("True", "".join(response.app_iter))
+        response.app_iter.close()
+        self.assertFalse(session.in_unit_of_work())
@@ -15,6 +15,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 """ Taken from melange. """
+import datetime
+import json
+
 import routes
 import webob
 import webob.exc
@@ -271,6 +274,71 @@ class TestController(tests.BaseTest):
         self.assertEqual(response.status_int, 404)
 
 
+class VersionedStubController(wsgi.Controller):
+
+    def __init__(self):
+        super(VersionedStubController, self).__init__()
+        self.version = 1
+        self.index_calls = 0
+
+    def index(self, request, format=None):
+        self.index_calls += 1
+        return {'fort': 'knox'}
+
+    def index_version(self, request, format=None):
+        return self.version
+
+
+class VersionedDummyApp(wsgi.Router):
+
+    def __init__(self, controller):
+        mapper = routes.Mapper()
+        mapper.resource("resource", "/resources",
+                        controller=controller.create_resource())
+        super(VersionedDummyApp, self).__init__(mapper)
+
+
+class TestConditionalRequests(tests.BaseTest):
+
+    def setUp(self):
+        super(TestConditionalRequests, self).setUp()
+        self.controller = VersionedStubController()
+        self.app = webtest.TestApp(VersionedDummyApp(self.controller))
+
+    def test_responses_have_an_etag(self):
+        response = self.app.get("/resources")
+        self.assertEqual(200, response.status_int)
+        self.assertIsNotNone(response.headers.get('ETag'))
+
+    def test_matching_etags_are_not_modified(self):
+        etag = self.app.get("/resources").headers['ETag']
+        response = self.app.get("/resources",
+                                headers={'If-None-Match': etag}, status='*')
+        self.assertEqual(304, response.status_int)
+        self.assertEqual(etag, response.headers['ETag'])
+        self.assertEqual("", response.body)
+        self.assertEqual(1, self.controller.index_calls)
+
+    def test_new_versions_are_sent_in_full(self):
+        etag = self.app.get("/resources").headers['ETag']
+        self.controller.version = 2
+        response = self.app.get("/resources",
+                                headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_int)
+        self.assertNotEqual(etag, response.headers['ETag'])
+        self.assertEqual(2, self.controller.index_calls)
+
+    def test_etags_differ_by_content_type(self):
+        json_etag = self.app.get("/resources.json").headers['ETag']
+        xml_etag = self.app.get("/resources.xml").headers['ETag']
+        self.assertNotEqual(json_etag, xml_etag)
+
+    def test_unversioned_actions_have_no_etag(self):
+        self.controller.version = None
+        response = self.app.get("/resources")
+        self.assertIsNone(response.headers.get('ETag'))
+
+
 class TestFault(tests.BaseTest):
 
     def test_fault_wraps_webob_exception(self):
@@ -318,3 +386,81 @@ class TestResult(tests.BaseTest):
     def test_data_returns_xml_specific_input_data(self):
         self.assertEqual(wsgi.Result(self.TestData()).data("application/xml"),
                          {'foos': [{'foo': "bar"}, {'foo2': "bar2"}]})
+
+
+class StreamingStubController(wsgi.Controller):
+
+    def __init__(self, count):
+        super(StreamingStubController, self).__init__()
+        self.count = count
+        self.made = 0
+
+    def _item(self, number):
+        self.made += 1
+        return {'id': number, 'name': "item-%d" % number}
+
+    def index(self, request, format=None):
+        items = (self._item(number) for number in range(self.count))
+        return wsgi.Result({'items': wsgi.StreamedList(items), 'total': 2})
+
+
+class TestStreamedResponses(tests.BaseTest):
+
+    def _data(self, count):
+        created = datetime.datetime(2012, 9, 20, 17, 0, 0, 123)
+        return {
+            'items': [{'id': number, 'name': u"item-\xe9-%d" % number,
+                       'created': created, 'size': 0.5}
+                      for number in range(count)],
+            'links': [{'rel': "next", 'href': "http://localhost/?marker=x"}],
+        }
+
+    def _streamed(self, data):
+        data = data.copy()
+        data['items'] = wsgi.StreamedList(iter(data['items']))
+        return data
+
+    def test_bodies_match_json_dumps(self):
+        serializer = wsgi.ReddwarfJSONDictSerializer()
+        expected_serializer = wsgi.JSONDictSerializer()
+        for count in (0, 1, 2, 3000):
+            data = self._data(count)
+            expected = expected_serializer.serialize(data, 'default')
+            actual = serializer.serialize(self._streamed(data), 'default')
+            self.assertEqual(expected, actual)
+
+    def test_long_lists_are_written_in_chunks(self):
+        serializer = wsgi.ReddwarfJSONDictSerializer()
+        chunks = list(serializer.iterserialize(self._streamed(
+            self._data(3000))))
+        # The dict up to the list, six batches, and the rest.
+        self.assertEqual(3000 / wsgi.STREAM_BATCH_SIZE + 3, len(chunks))
+
+    def test_items_are_made_as_the_response_is_written(self):
+        controller = StreamingStubController(3)
+        mapper = routes.Mapper()
+        mapper.resource("resource", "/resources",
+                        controller=controller.create_resource())
+        response = webob.Request.blank("/resources").get_response(
+            wsgi.Router(mapper))
+        self.assertEqual(0, controller.made)
+        self.assertEqual(None, response.content_length)
+        body = "".join(response.app_iter)
+        self.assertEqual(3, controller.made)
+        self.assertEqual({'items': [{'id': number, 'name': "item-%d" % number}
+                                    for number in range(3)],
+                          'total': 2},
+                         json.loads(body))
+
+    def test_xml_is_given_the_whole_list(self):
+        controller = StreamingStubController(2)
+        mapper = routes.Mapper()
+        mapper.resource("resource", "/resources",
+                        controller=controller.create_resource())
+        app = webtest.TestApp(wsgi.Router(mapper))
+        response = app.get("/resources.xml")
+        self.assertEqual("{%s}items" % wsgi.XMLNS, response.xml.tag)
+        self.assertEqual("2", response.xml.attrib['total'])
+        self.assertEqual(["item-0", "item-1"],
+                         [item.findtext("{%s}name" % wsgi.XMLNS)
+                          for item in response.xml])
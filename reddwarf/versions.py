@@ -17,9 +17,9 @@
 
 import os
 import routes
-from xml.dom import minidom
 
 from reddwarf.common import wsgi
+from reddwarf.common import xmlcodec
 
 
 VERSIONS = {
@@ -77,17 +77,14 @@ class BaseVersion(object):
         return url
 
     def to_xml(self):
-        doc = minidom.Document()
-        version_elem = doc.createElement("version")
-        version_elem.setAttribute("id", self.id)
-        version_elem.setAttribute("status", self.status)
-        version_elem.setAttribute("updated", self.updated)
-        links_elem = doc.createElement("links")
-        link_elem = doc.createElement("link")
-        link_elem.setAttribute("href", self.url())
-        link_elem.setAttribute("rel", "self")
-        links_elem.appendChild(link_elem)
-        version_elem.appendChild(links_elem)
+        version_elem = xmlcodec.Element("version")
+        version_elem.set("id", self.id)
+        version_elem.set("status", self.status)
+        version_elem.set("updated", self.updated)
+        links_elem = xmlcodec.SubElement(version_elem, "links")
+        link_elem = xmlcodec.SubElement(links_elem, "link")
+        link_elem.set("href", self.url())
+        link_elem.set("rel", "self")
         return version_elem
 
 
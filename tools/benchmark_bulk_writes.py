@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times writing instance rows one at a time and in bulk.
+
+It uses the unit test database by default; pass another config file to
+run it against that one's sql_connection, such as a MySQL database:
+
+    python tools/benchmark_bulk_writes.py [config file]
+
+"""
+
+import logging
+import os
+import sys
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'reddwarf', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+# Sets up the _ builtin.
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.db import db_api
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+
+
+ROWS = 500
+
+
+def rows():
+    return [dict(name="instance-%d" % index, flavor_id=1, tenant_id="tenant",
+                 task_status=InstanceTasks.NONE) for index in range(ROWS)]
+
+
+def per_row_ms(func):
+    db_api.clean_db()
+    start = time.time()
+    func()
+    return (time.time() - start) * 1000 / ROWS
+
+
+def create_each():
+    for values in rows():
+        models.DBInstance.create(**values)
+
+
+def create_many():
+    models.DBInstance.create_many(rows())
+
+
+def update_each():
+    for db_info in models.DBInstance.create_many(rows()):
+        db_info.server_status = "ACTIVE"
+        db_info.save()
+
+
+def update_many():
+    created = models.DBInstance.create_many(rows())
+    models.DBInstance.update_many([{'id': db_info.id} for db_info in created],
+                                  [{'server_status': "ACTIVE"}] * ROWS)
+
+
+def main():
+    logging.disable(logging.INFO)
+    config_file = tests.reddwarf_etc_path("reddwarf.conf.test")
+    if len(sys.argv) > 1:
+        config_file = sys.argv[1]
+    conf, app = config.Config.load_paste_app('reddwarfapp',
+                                             {"config_file": config_file},
+                                             None)
+    db_api.configure_db(conf)
+    print "%d rows, ms per row:" % ROWS
+    print "%10s %10s %10s" % ("", "each", "bulk")
+    print "%10s %10.3f %10.3f" % ("create", per_row_ms(create_each),
+                                  per_row_ms(create_many))
+    # The bulk creates are part of both update timings.
+    print "%10s %10.3f %10.3f" % ("update", per_row_ms(update_each),
+                                  per_row_ms(update_many))
+    db_api.clean_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times the config lookups a typical request makes, with and without the
+cache of parsed values. Run it from the root of the source tree:
+
+    python tools/benchmark_config.py
+
+"""
+
+import os
+import sys
+import timeit
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'reddwarf', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+# Sets up the _ builtin.
+from reddwarf import tests
+from reddwarf.common import config
+
+
+REQUESTS = 100000
+
+
+def lookups():
+    """The lookups made while creating and showing an instance."""
+    config.Config.get_bool('reddwarf_dns_support', default=False)
+    config.Config.get_bool('reddwarf_volume_support', default=True)
+    config.Config.get_bool('reddwarf_must_use_volume', default=False)
+    config.Config.get_int('max_accepted_volume_size', default=1)
+    config.Config.get('nova_compute_url', 'http://localhost:8774/v2')
+    config.Config.get('reddwarf_auth_url', 'http://0.0.0.0:5000/v2.0')
+    config.Config.get_bool('use_nova_notifications', default=False)
+    config.Config.get_float('volume_used_timeout', default=2.0)
+
+
+def uncached_lookups():
+    config.Config.clear_cache()
+    lookups()
+
+
+def main():
+    config.Config.load_paste_config(
+        'reddwarfapp',
+        {"config_file": tests.reddwarf_etc_path("reddwarf.conf.test")},
+        None)
+    for name, func in (("uncached", uncached_lookups), ("cached", lookups)):
+        seconds = min(timeit.repeat(func, number=REQUESTS, repeat=3))
+        print "%10s %8.2f us per request" % (name,
+                                             seconds / REQUESTS * 1000000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times concurrent slow queries with and without sql_offload.
+
+Each request runs one query which holds its thread for a while without
+giving the hub back, like a slow MySQL query, against a scratch SQLite
+database. Run it from the root of the source tree:
+
+    python tools/benchmark_db_offload.py
+
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import eventlet
+from eventlet import patcher
+from eventlet import tpool
+from sqlalchemy import event
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'reddwarf', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+# Sets up the _ builtin.
+from reddwarf import tests
+from reddwarf.db.sqlalchemy import offload
+from reddwarf.db.sqlalchemy import session
+
+
+QUERY_TIME = 0.05
+REQUESTS = 32
+POOL_SIZES = (1, 2, 4, 8, 16)
+
+
+def slow(seconds):
+    patcher.original('time').sleep(seconds)
+    return seconds
+
+
+def add_slow(dbapi_connection, connection_record):
+    dbapi_connection.create_function('slow', 1, slow)
+
+
+def throughput(path, pool_size):
+    """Returns the requests per second, with the pool size if offloaded."""
+    options = {'sql_connection': "sqlite:///%s" % path,
+               'sql_offload': str(pool_size is not None),
+               'sql_offload_pool_size': str(pool_size or 0)}
+    tpool.killall()
+    engine = session._create_engine(options)
+    event.listen(engine, 'connect', add_slow)
+    offload.METRICS.reset()
+    start = time.time()
+    pool = eventlet.GreenPool(REQUESTS)
+    for index in range(REQUESTS):
+        pool.spawn(engine.execute, "SELECT slow(%f)" % QUERY_TIME)
+    pool.waitall()
+    elapsed = time.time() - start
+    engine.dispose()
+    return REQUESTS / elapsed, offload.METRICS.snapshot()
+
+
+def main():
+    logging.disable(logging.WARN)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "benchmark.sqlite")
+    try:
+        print "%10s %12s %14s %14s" % ("pool size", "requests/s",
+                                       "avg wait (ms)", "avg exec (ms)")
+        rate, metrics = throughput(path, None)
+        print "%10s %12.1f %14s %14s" % ("off", rate, "-", "-")
+        for size in POOL_SIZES:
+            rate, metrics = throughput(path, size)
+            print "%10d %12.1f %14.1f %14.1f" % (
+                size, rate, metrics['average_wait_time'] * 1000,
+                metrics['average_execution_time'] * 1000)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Times Instances.load for growing tenants with each server_list_strategy.
+
+Nova is faked with a fixed latency per call plus a cost per server sent
+back, so the "list" strategy slows down as the tenant grows while "get"
+stays flat. Run it from the root of the source tree:
+
+    python tools/benchmark_instances_load.py
+
+"""
+
+import logging
+import os
+import sys
+import time
+
+import eventlet
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'reddwarf', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+# Sets up the _ builtin.
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import context
+from reddwarf.db import db_api
+from reddwarf.instance import models
+from reddwarf.instance.tasks import InstanceTasks
+
+
+CALL_LATENCY = 0.02
+PER_SERVER_LATENCY = 0.0005
+TENANT_SIZES = (20, 100, 500, 2000)
+PAGE_SIZE = 20
+RUNS = 3
+
+
+class SlowServer(object):
+
+    def __init__(self, id):
+        self.id = id
+        self.status = "ACTIVE"
+
+
+class SlowServers(object):
+
+    def __init__(self, server_ids):
+        self.servers = dict((id, SlowServer(id)) for id in server_ids)
+
+    def list(self):
+        eventlet.sleep(CALL_LATENCY + PER_SERVER_LATENCY * len(self.servers))
+        return self.servers.values()
+
+    def get(self, id):
+        eventlet.sleep(CALL_LATENCY + PER_SERVER_LATENCY)
+        return self.servers[id]
+
+
+class SlowClient(object):
+
+    def __init__(self, server_ids):
+        self.servers = SlowServers(server_ids)
+
+
+def create_tenant(size):
+    db_api.clean_db()
+    server_ids = []
+    for index in range(size):
+        db_info = models.DBInstance.create(
+            name="instance-%d" % index, flavor_id=1, tenant_id="tenant",
+            compute_instance_id="server-%d" % index,
+            task_status=InstanceTasks.NONE)
+        models.InstanceServiceStatus.create(
+            instance_id=db_info.id, status=models.ServiceStatuses.RUNNING)
+        server_ids.append(db_info.compute_instance_id)
+    client = SlowClient(server_ids)
+    models.create_nova_client = lambda context: client
+
+
+def time_load(strategy):
+    config.Config.instance['server_list_strategy'] = strategy
+    ctx = context.ReddwarfContext(tenant="tenant", limit=PAGE_SIZE,
+                                  marker=None)
+    timings = []
+    for run in range(RUNS):
+        start = time.time()
+        models.Instances.load(ctx)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    logging.disable(logging.INFO)
+    conf, app = config.Config.load_paste_app(
+        'reddwarfapp',
+        {"config_file": tests.reddwarf_etc_path("reddwarf.conf.test")},
+        None)
+    db_api.configure_db(conf)
+    print "%10s %10s %10s" % ("servers", "list (ms)", "get (ms)")
+    for size in TENANT_SIZES:
+        create_tenant(size)
+        print "%10d %10.1f %10.1f" % (size, time_load('list') * 1000,
+                                      time_load('get') * 1000)
+
+
+if __name__ == '__main__':
+    main()
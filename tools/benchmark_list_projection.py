@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compares the mgmt instance list built from mapped models and from records.
+
+The mapped path is how load_mgmt_instances worked before: a DBInstance and
+an InstanceServiceStatus mapped for every instance, wrapped in a
+SimpleMgmtInstance. The record path selects just the columns the view
+needs. Nova is faked. Memory is the size of the objects the garbage
+collector tracks which are new while the loaded instances are held, so it
+leaves out the strings and numbers, which both paths share. Run it from
+the root of the source tree:
+
+    python tools/benchmark_list_projection.py
+
+"""
+
+import gc
+import logging
+import os
+import sys
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'reddwarf', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+# Sets up the _ builtin.
+from reddwarf import tests
+from reddwarf.common import config
+from reddwarf.common import context
+from reddwarf.db import db_api
+from reddwarf.extensions.mgmt.instances import models as mgmt_models
+from reddwarf.extensions.mgmt.instances import views as mgmt_views
+from reddwarf.instance import models
+from reddwarf.instance import views
+from reddwarf.instance.tasks import InstanceTasks
+
+
+ROWS = 5000
+
+
+class FakeServer(object):
+
+    def __init__(self, id):
+        self.id = id
+        self.status = "ACTIVE"
+        self.deleted = False
+        self.deleted_at = None
+        self.host = "host"
+        self.local_id = 1
+        self.name = id
+        self.tenant_id = "tenant"
+
+
+def create_instances():
+    db_api.clean_db()
+    db_infos = models.DBInstance.create_many([
+        {'name': "instance-%d" % index, 'flavor_id': 1,
+         'tenant_id': "tenant-%d" % (index % 50), 'volume_size': 10,
+         'compute_instance_id': "server-%d" % index,
+         'task_status': InstanceTasks.NONE}
+        for index in range(ROWS)])
+    models.InstanceServiceStatus.create_many([
+        {'instance_id': db_info.id, 'status': models.ServiceStatuses.RUNNING}
+        for db_info in db_infos])
+    return [FakeServer("server-%d" % index) for index in range(ROWS)]
+
+
+def load_mapped(ctx, servers):
+    return mgmt_models.MgmtInstances.load_status_from_existing(
+        ctx, models.DBInstance.find_all(deleted=False), servers)
+
+
+def load_records(ctx, servers):
+    rows = models.DBInstance.find_all_values(
+        mgmt_models.MgmtInstanceRecord.COLUMNS, deleted=False)
+    return mgmt_models.MgmtInstances.load_records(ctx, rows, servers)
+
+
+def cpu_per_row(load, ctx, servers):
+    start = time.clock()
+    instances = load(ctx, servers)
+    mgmt_views.MgmtInstancesView(instances, add_volumes=True).data()
+    return (time.clock() - start) / ROWS
+
+
+def memory_per_row(load, ctx, servers):
+    gc.collect()
+    before = set(id(obj) for obj in gc.get_objects())
+    instances = load(ctx, servers)
+    gc.collect()
+    size = sum(sys.getsizeof(obj) for obj in gc.get_objects()
+               if id(obj) not in before and obj is not before)
+    return float(size) / len(instances)
+
+
+def main():
+    logging.disable(logging.ERROR)
+    conf, app = config.Config.load_paste_app(
+        'reddwarfapp',
+        {"config_file": tests.reddwarf_etc_path("reddwarf.conf.test")},
+        None)
+    db_api.configure_db(conf)
+    views.create_links = lambda *args: []
+    servers = create_instances()
+    ctx = context.ReddwarfContext(is_admin=True, limit=None, marker=None)
+    print "%8s %14s %16s" % ("path", "CPU (us/row)", "memory (B/row)")
+    for name, load in (("mapped", load_mapped), ("records", load_records)):
+        # Warm up the mappers and caches first.
+        load(ctx, servers[:10])
+        print "%8s %14.1f %16.0f" % (name,
+                                     cpu_per_row(load, ctx, servers) * 1e6,
+                                     memory_per_row(load, ctx, servers))
+    db_api.clean_db()
+
+
+if __name__ == '__main__':
+    main()
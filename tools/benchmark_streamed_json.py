@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compares a JSON hosts listing written whole and streamed.
+
+Each run is a separate process so its peak resident size is its own. The
+hosts are made as they're listed, as a paginating loader would, so the
+streamed peak stays flat while the whole body grows with the count. The
+response is read the way eventlet.wsgi writes it, a chunk at a time. Run
+it from the root of the source tree:
+
+    python tools/benchmark_streamed_json.py
+
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'reddwarf', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+# Sets up the _ builtin.
+from reddwarf import tests
+from reddwarf.common import wsgi
+from reddwarf.extensions.mgmt.host import views
+
+
+COUNTS = (10000, 100000, 400000)
+
+
+class FakeHost(object):
+
+    def __init__(self, index):
+        self.name = "compute-%07d.example.com" % index
+        self.instance_count = index % 40
+
+
+def run(mode, count):
+    if mode == "streamed":
+        json_serializer = wsgi.ReddwarfJSONDictSerializer()
+    else:
+        json_serializer = wsgi.JSONDictSerializer()
+    serializer = wsgi.ReddwarfResponseSerializer(
+        body_serializers={'application/json': json_serializer})
+    start = time.time()
+    hosts = (FakeHost(index) for index in xrange(count))
+    if mode == "streamed":
+        result = wsgi.Result(views.HostsView(hosts))
+    else:
+        result = wsgi.Result(views.HostsView(hosts).data())
+    response = serializer.serialize(result, 'application/json')
+    first_byte = None
+    size = 0
+    for chunk in response.app_iter:
+        if first_byte is None:
+            first_byte = time.time() - start
+        size += len(chunk)
+    total = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print "%8s %8d %10.1f %10.1f %10.1f %10d" % (mode, count,
+                                                 first_byte * 1e3,
+                                                 total * 1e3, peak, size)
+
+
+def main():
+    if len(sys.argv) == 3:
+        run(sys.argv[1], int(sys.argv[2]))
+        return
+    print "%8s %8s %10s %10s %10s %10s" % ("mode", "hosts", "first (ms)",
+                                           "total (ms)", "peak (MB)",
+                                           "bytes")
+    sys.stdout.flush()
+    for count in COUNTS:
+        for mode in ("whole", "streamed"):
+            subprocess.check_call([sys.executable, sys.argv[0], mode,
+                                   str(count)])
+
+
+if __name__ == '__main__':
+    main()
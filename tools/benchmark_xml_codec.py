@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compares minidom and xmlcodec writing and reading 1000 instance lists.
+
+The minidom side is openstack.common.wsgi's XMLDictSerializer and
+XMLDeserializer, which the API used before, with the whitespace stripping
+ReddwarfXMLDeserializer did first. Both write the same document. Run it
+from the root of the source tree:
+
+    python tools/benchmark_xml_codec.py
+
+"""
+
+import os
+import re
+import sys
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'reddwarf', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+# Sets up the _ builtin.
+from reddwarf import tests
+from reddwarf.common import wsgi
+from reddwarf.openstack.common import wsgi as openstack_wsgi
+
+
+INSTANCES = 1000
+REPEAT = 5
+URL = "http://localhost:8779/v1.0/tenant"
+
+
+def instance(index):
+    id = "5e8f7c1a-0000-4000-8000-%012d" % index
+    return {
+        'id': id,
+        'name': "instance-%d" % index,
+        'status': "ACTIVE",
+        'created': "2012-09-20T17:00:00",
+        'updated': "2012-09-20T17:05:00",
+        'hostname': "host-%d.example.com" % index,
+        'links': [{'rel': "self", 'href': "%s/instances/%s" % (URL, id)}],
+        'flavor': {'id': "1",
+                   'links': [{'rel': "self", 'href': "%s/flavors/1" % URL}]},
+        'volume': {'size': 2, 'used': 0.17},
+        'databases': [{'name': "db%d" % number} for number in range(3)],
+    }
+
+
+def timed(function, *args):
+    best = None
+    for repeat in range(REPEAT):
+        start = time.time()
+        result = function(*args)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def minidom_parse(body):
+    deserializer = openstack_wsgi.XMLDeserializer(
+        {'plurals': wsgi.CUSTOM_PLURALS_METADATA})
+    return deserializer._from_xml(
+        re.sub(r'((?<=>)\s+)*\n*(\s+(?=<))*', '', body))
+
+
+def main():
+    data = {'instances': [instance(index) for index in range(INSTANCES)]}
+    metadata = {'attributes': wsgi.CUSTOM_SERIALIZER_METADATA}
+    minidom = openstack_wsgi.XMLDictSerializer(dict(metadata), wsgi.XMLNS)
+    codec = wsgi.XMLDictSerializer(dict(metadata), wsgi.XMLNS)
+    deserializer = wsgi.ReddwarfXMLDeserializer()
+
+    minidom_write, expected = timed(minidom.default, data)
+    codec_write, body = timed(codec.default, data)
+    assert body == expected, "The documents differ."
+    minidom_read, expected = timed(minidom_parse, body)
+    codec_read, parsed = timed(deserializer.default, body)
+    assert parsed['body'] == expected, "The parsed bodies differ."
+
+    print "%d instances, %d bytes" % (INSTANCES, len(body))
+    print "%8s %12s %12s" % ("", "minidom (ms)", "codec (ms)")
+    print "%8s %12.1f %12.1f" % ("write", minidom_write * 1e3,
+                                 codec_write * 1e3)
+    print "%8s %12.1f %12.1f" % ("read", minidom_read * 1e3,
+                                 codec_read * 1e3)
+
+
+if __name__ == '__main__':
+    main()